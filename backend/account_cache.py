@@ -0,0 +1,140 @@
+"""
+In-process cache of account rows, keyed by user_id and account_id.
+
+A single transfer conversation looks up the same two accounts several times
+(transfer check, execute validation, balance questions, natural-language account
+resolution). Each lookup used to be a full BigQuery job; with this cache repeated
+lookups within the TTL are memory reads.
+
+Entries are grouped per user. Users are evicted least-recently-used once more than
+`max_users` are cached, and a user's snapshot expires `ttl_seconds` after it was
+first loaded. Writes performed by this process (transfers, bill payments) are
+applied to the cached balances directly (write-through), and anything that fails
+mid-way invalidates the user's snapshot.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+ACCOUNT_CACHE_TTL_SECONDS = float(os.getenv("ACCOUNT_CACHE_TTL_SECONDS", "30"))
+ACCOUNT_CACHE_MAX_USERS = int(os.getenv("ACCOUNT_CACHE_MAX_USERS", "1024"))
+
+
+class _UserAccounts:
+    """Cached accounts of one user. `complete` is True when the full account list is known."""
+    __slots__ = ("accounts", "complete", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.accounts = {} # account_id -> account row
+        self.complete = False
+        self.expires_at = expires_at
+
+
+class AccountCache:
+    """Thread-safe TTL + LRU cache of account rows (account_id, account_type, balance, currency, ...)."""
+
+    def __init__(self, max_users: int = ACCOUNT_CACHE_MAX_USERS, ttl_seconds: float = ACCOUNT_CACHE_TTL_SECONDS):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._users = OrderedDict() # user_id -> _UserAccounts, least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _snapshot(self, user_id: str, create: bool = False):
+        """Returns the live snapshot for user_id (refreshing its LRU position). Caller holds the lock."""
+        now = time.monotonic()
+        snapshot = self._users.get(user_id)
+        if snapshot is not None and snapshot.expires_at <= now:
+            del self._users[user_id]
+            snapshot = None
+        if snapshot is None:
+            if not create:
+                return None
+            snapshot = _UserAccounts(now + self.ttl_seconds)
+            self._users[user_id] = snapshot
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return snapshot
+
+    def _record(self, found) -> None:
+        if found is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def get_account(self, user_id: str, account_id: str) -> dict | None:
+        with self._lock:
+            snapshot = self._snapshot(user_id)
+            account = snapshot.accounts.get(account_id) if snapshot else None
+            self._record(account)
+            return dict(account) if account else None
+
+    def get_account_by_type(self, user_id: str, account_type: str) -> dict | None:
+        with self._lock:
+            snapshot = self._snapshot(user_id)
+            account = None
+            if snapshot:
+                account = next((acc for acc in snapshot.accounts.values() if acc.get("account_type") == account_type), None)
+            self._record(account)
+            return dict(account) if account else None
+
+    def get_accounts(self, user_id: str) -> list | None:
+        """Returns all accounts of the user, or None unless the complete list is cached."""
+        with self._lock:
+            snapshot = self._snapshot(user_id)
+            accounts = list(snapshot.accounts.values()) if snapshot and snapshot.complete else None
+            self._record(accounts)
+            return [dict(acc) for acc in accounts] if accounts is not None else None
+
+    def put_account(self, user_id: str, account: dict) -> None:
+        with self._lock:
+            snapshot = self._snapshot(user_id, create=True)
+            merged = dict(snapshot.accounts.get(account["account_id"], {}))
+            merged.update(account)
+            snapshot.accounts[account["account_id"]] = merged
+
+    def put_accounts(self, user_id: str, accounts: list) -> None:
+        """Stores the complete account list of a user, replacing whatever was cached."""
+        with self._lock:
+            self._users.pop(user_id, None)
+            snapshot = self._snapshot(user_id, create=True)
+            snapshot.accounts = {acc["account_id"]: dict(acc) for acc in accounts}
+            snapshot.complete = True
+
+    def apply_balance_delta(self, user_id: str, account_id: str, delta: float) -> bool:
+        """Adjusts a cached balance after a write made by this process. Returns False if not cached."""
+        with self._lock:
+            snapshot = self._snapshot(user_id)
+            account = snapshot.accounts.get(account_id) if snapshot else None
+            if account is None or account.get("balance") is None:
+                return False
+            account["balance"] = float(account["balance"]) + delta
+            return True
+
+    def invalidate(self, user_id: str, account_id: str = None) -> None:
+        """Drops one account (the user's list is then no longer complete) or the whole user."""
+        with self._lock:
+            if account_id is None:
+                self._users.pop(user_id, None)
+                return
+            snapshot = self._users.get(user_id)
+            if snapshot is not None:
+                snapshot.accounts.pop(account_id, None)
+                snapshot.complete = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"users": len(self._users), "hits": self.hits, "misses": self.misses,
+                    "max_users": self.max_users, "ttl_seconds": self.ttl_seconds}
+
+
+# Process-wide instance used by bigquery_functions.
+ACCOUNT_CACHE = AccountCache()
@@ -0,0 +1,151 @@
+"""
+Precomputed per-user matcher behind find_account_by_natural_language.
+
+payBill resolves phrases like "from my primary savings" to an account ID. Each call
+used to fetch the user's accounts again and rebuild lowercase names and word sets
+for every account before scoring them. Account names, nicknames and types almost
+never change, so they are tokenized once per user here:
+
+- every account's lowercase name, nickname and type and their word sets,
+- an inverted index word -> accounts, so only accounts sharing a word with the
+  phrase (or matched by the substring rules) are scored,
+- an LRU of scored phrases, so repeated phrases in a conversation are dict lookups.
+
+Scoring is exactly the previous find_account_by_natural_language scoring;
+`score()` returns the same ranked candidate list it used to build inline.
+Matchers expire after ACCOUNT_MATCHER_TTL_SECONDS and are replaced whenever
+get_accounts_for_user loads a fresh account list.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from user_registry import UserRegistry
+
+ACCOUNT_MATCHER_TTL_SECONDS = float(os.getenv("ACCOUNT_MATCHER_TTL_SECONDS", "300"))
+ACCOUNT_MATCHER_MAX_USERS = int(os.getenv("ACCOUNT_MATCHER_MAX_USERS", "1024"))
+ACCOUNT_MATCHER_PHRASE_CACHE_SIZE = int(os.getenv("ACCOUNT_MATCHER_PHRASE_CACHE_SIZE", "256"))
+
+
+class _AccountTerms:
+    """Lowercased, tokenized fields of one account."""
+    __slots__ = ("account", "name", "type", "nickname", "name_words", "nickname_words")
+
+    def __init__(self, account: dict):
+        self.account = account
+        self.name = (account.get("account_name") or "").lower()
+        self.type = (account.get("account_type") or "").lower()
+        self.nickname = (account.get("account_nickname") or "").lower()
+        self.name_words = frozenset(self.name.split())
+        self.nickname_words = frozenset(self.nickname.split())
+
+
+class AccountMatcher:
+    """Scores natural-language account descriptions against one user's accounts."""
+
+    def __init__(self, accounts: list, phrase_cache_size: int = ACCOUNT_MATCHER_PHRASE_CACHE_SIZE):
+        self._accounts = [_AccountTerms(acc) for acc in accounts]
+        self._word_index = {} # word of a name, nickname or type -> {account position}
+        self._primary = set() # accounts whose name or nickname contains "primary"
+        for position, terms in enumerate(self._accounts):
+            for word in terms.name_words | terms.nickname_words | {terms.type}:
+                self._word_index.setdefault(word, set()).add(position)
+            if "primary" in terms.name or "primary" in terms.nickname:
+                self._primary.add(position)
+        self._phrases = OrderedDict() # lowercase phrase -> ranked matches
+        self._phrase_cache_size = phrase_cache_size
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def _candidates(self, nl_lower: str, nl_words: set) -> list:
+        """Positions of the accounts that can score above zero, in account order."""
+        if not nl_words:
+            return list(range(len(self._accounts)))
+        positions = set()
+        for word in nl_words:
+            positions |= self._word_index.get(word, set())
+        # Type substrings ("savingsaccount") and "primary" are matched outside word boundaries
+        positions |= {position for position, terms in enumerate(self._accounts) if terms.type in nl_lower}
+        if "primary" in nl_words:
+            positions |= self._primary
+        return sorted(positions)
+
+    def _score_account(self, terms: _AccountTerms, nl_lower: str, nl_words: set) -> dict | None:
+        acc = terms.account
+        score = 0
+        match_reasons = []
+
+        # Highest priority: Exact match on nickname
+        if terms.nickname and terms.nickname == nl_lower:
+            score += 200 # Very high score for exact nickname match
+            match_reasons.append("exact_nickname_match")
+        # High priority: All NL words in nickname (if nickname exists)
+        elif terms.nickname and nl_words.issubset(terms.nickname_words):
+            score += 150 * len(nl_words)
+            match_reasons.append("all_nl_words_in_nickname")
+
+        if terms.name == nl_lower:
+            score += 100
+            match_reasons.append("exact_name_match")
+
+        if nl_words.issubset(terms.name_words):
+            score += 50 * len(nl_words)
+            match_reasons.append("all_nl_words_in_name")
+
+        # More granular: check individual word matches in name
+        name_words_present = nl_words.intersection(terms.name_words)
+        if name_words_present:
+            score += 15 * len(name_words_present) # Boost for each common word
+            match_reasons.append(f"name_words_match:{','.join(name_words_present)}")
+
+        if terms.type in nl_words: # e.g. nl_words = {"my", "savings"}, type = "savings"
+            score += 40 # Higher score for direct type keyword match
+            match_reasons.append("type_keyword_match")
+        elif terms.type in nl_lower: # e.g. nl_lower = "my savings account", type = "savings"
+            score += 30
+            match_reasons.append("type_substring_match")
+
+        if "primary" in nl_words and ("primary" in terms.name or ("primary" in terms.nickname if terms.nickname else False)):
+            score += 25 # Specific boost for "primary"
+            match_reasons.append("primary_keyword_name_or_nickname_match")
+
+        if score <= 0:
+            return None
+        return {"account_id": acc["account_id"], "account_name": acc["account_name"], "account_type": acc["account_type"],
+                "account_nickname": acc.get("account_nickname", ""), "score": score, "reasons": match_reasons}
+
+    def score(self, natural_language_string: str) -> list:
+        """Accounts matching the phrase with a positive score, best first. Do not mutate the result."""
+        nl_lower = natural_language_string.lower()
+        with self._lock:
+            cached = self._phrases.get(nl_lower)
+            if cached is not None:
+                self._phrases.move_to_end(nl_lower)
+                return cached
+
+        nl_words = set(nl_lower.split())
+        potential_matches = []
+        for position in self._candidates(nl_lower, nl_words):
+            match = self._score_account(self._accounts[position], nl_lower, nl_words)
+            if match:
+                potential_matches.append(match)
+        potential_matches.sort(key=lambda x: x["score"], reverse=True)
+
+        with self._lock:
+            self._phrases[nl_lower] = potential_matches
+            while len(self._phrases) > self._phrase_cache_size:
+                self._phrases.popitem(last=False)
+        return potential_matches
+
+
+class AccountMatcherRegistry(UserRegistry):
+    """Thread-safe TTL + LRU map of user_id -> AccountMatcher, built from the user's complete account list."""
+
+    def __init__(self, max_users: int = ACCOUNT_MATCHER_MAX_USERS, ttl_seconds: float = ACCOUNT_MATCHER_TTL_SECONDS):
+        super().__init__(AccountMatcher, max_users, ttl_seconds)
+
+
+# Process-wide instance used by bigquery_functions.
+ACCOUNT_MATCHER = AccountMatcherRegistry()
@@ -0,0 +1,238 @@
+"""
+Audio stages between the /listen client websocket and the Gemini Live session.
+
+Upstream (client -> Gemini):
+
+Browsers post microphone PCM in whatever chunk size their audio worklet produces,
+often a few milliseconds per message, and every message used to become its own
+session.send_realtime_input call. AudioFrameCoalescer re-frames the stream:
+
+- incoming chunks are appended to a buffer and cut into frames of AUDIO_FRAME_MS
+  at the input sample rate (16-bit mono PCM),
+- a partial frame is flushed once its first byte has waited AUDIO_FLUSH_DEADLINE_MS,
+  so coalescing never delays speech by more than that,
+- frames go through a bounded queue to a single sender task. If Gemini falls
+  behind by more than AUDIO_SEND_QUEUE_FRAMES frames, the oldest frames are dropped
+  (stale speech is worth less than current speech) and counted,
+- drain() flushes and waits (up to AUDIO_DRAIN_TIMEOUT_MS) until every queued frame
+  has been sent, so a text prompt is not sent ahead of speech that preceded it.
+
+Downstream (Gemini -> client): model audio used to be sent to the client inline in
+the Gemini receive loop, so a slow client stalled tool-call handling, and audio already
+received when the user barged in still played. OutboundAudioQueue buffers it for a
+dedicated sender task, caps buffered bytes at AUDIO_OUTBOUND_MAX_BYTES (oldest audio is
+dropped past that) and purge() discards everything not yet sent on an interrupt.
+
+Per-session counters are available from stats(); AUDIO_INPUT_TOTALS and
+AUDIO_OUTPUT_TOTALS aggregate them for /api/metrics.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+AUDIO_FRAME_MS = float(os.getenv("AUDIO_FRAME_MS", "40"))
+AUDIO_FLUSH_DEADLINE_MS = float(os.getenv("AUDIO_FLUSH_DEADLINE_MS", "60"))
+AUDIO_SEND_QUEUE_FRAMES = int(os.getenv("AUDIO_SEND_QUEUE_FRAMES", "50"))
+AUDIO_DRAIN_TIMEOUT_MS = float(os.getenv("AUDIO_DRAIN_TIMEOUT_MS", "1000"))
+# ~10 s of 24 kHz 16-bit model audio
+AUDIO_OUTBOUND_MAX_BYTES = int(os.getenv("AUDIO_OUTBOUND_MAX_BYTES", str(24000 * 2 * 10)))
+PCM_SAMPLE_WIDTH_BYTES = 2 # 16-bit mono PCM
+
+# Process-wide counters over all sessions (updated on the event loop thread only)
+AUDIO_INPUT_TOTALS = {"sessions": 0, "active_sessions": 0, "queue_depth": 0, "chunks_in": 0, "bytes_in": 0, "frames_sent": 0,
+                      "frames_dropped": 0, "max_queue_depth": 0}
+AUDIO_OUTPUT_TOTALS = {"sessions": 0, "active_sessions": 0, "buffered_bytes": 0, "chunks_sent": 0, "bytes_sent": 0,
+                       "bytes_dropped": 0, "purges": 0, "bytes_purged": 0}
+
+
+class AudioFrameCoalescer:
+    """Buffers PCM chunks into fixed-duration frames and sends them from one task."""
+
+    def __init__(self, send, sample_rate: int, frame_ms: float = AUDIO_FRAME_MS,
+                 flush_deadline_ms: float = AUDIO_FLUSH_DEADLINE_MS, max_queue_frames: int = AUDIO_SEND_QUEUE_FRAMES):
+        self._send = send # async callable(frame_bytes)
+        bytes_per_ms = sample_rate * PCM_SAMPLE_WIDTH_BYTES / 1000.0
+        # Frame size rounded down to whole samples; 0 disables coalescing (chunks pass through)
+        self.frame_bytes = int(bytes_per_ms * frame_ms) // PCM_SAMPLE_WIDTH_BYTES * PCM_SAMPLE_WIDTH_BYTES
+        self.flush_deadline_s = flush_deadline_ms / 1000.0
+        self._buffer = bytearray()
+        self._deadline_handle = None
+        self._queue = asyncio.Queue(maxsize=max_queue_frames)
+        self.chunks_in = 0
+        self.bytes_in = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.max_queue_depth = 0
+        self.send_ms_total = 0.0
+        AUDIO_INPUT_TOTALS["sessions"] += 1
+        AUDIO_INPUT_TOTALS["active_sessions"] += 1
+
+    # --- Input side (event loop) ---
+    def feed(self, chunk: bytes) -> None:
+        """Adds a client chunk; complete frames are queued immediately."""
+        if not chunk:
+            return
+        self.chunks_in += 1
+        self.bytes_in += len(chunk)
+        AUDIO_INPUT_TOTALS["chunks_in"] += 1
+        AUDIO_INPUT_TOTALS["bytes_in"] += len(chunk)
+        if self.frame_bytes <= 0:
+            self._enqueue(bytes(chunk))
+            return
+        self._buffer += chunk
+        while len(self._buffer) >= self.frame_bytes:
+            self._enqueue(bytes(self._buffer[:self.frame_bytes]))
+            del self._buffer[:self.frame_bytes]
+        if self._buffer:
+            if self._deadline_handle is None:
+                self._deadline_handle = asyncio.get_running_loop().call_later(self.flush_deadline_s, self.flush)
+        elif self._deadline_handle is not None:
+            self._deadline_handle.cancel()
+            self._deadline_handle = None
+
+    def flush(self) -> None:
+        """Queues whatever is buffered (whole samples only) as a short frame."""
+        if self._deadline_handle is not None:
+            self._deadline_handle.cancel()
+            self._deadline_handle = None
+        usable = len(self._buffer) // PCM_SAMPLE_WIDTH_BYTES * PCM_SAMPLE_WIDTH_BYTES
+        if usable:
+            self._enqueue(bytes(self._buffer[:usable]))
+            del self._buffer[:usable]
+
+    async def drain(self, timeout_ms: float = AUDIO_DRAIN_TIMEOUT_MS) -> bool:
+        """Flushes, then waits until the sender has sent every queued frame. False on timeout."""
+        self.flush()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout_ms / 1000.0)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"[drain] {self._queue.qsize()} audio frame(s) still queued after {timeout_ms:.0f} ms.")
+            return False
+
+    def _enqueue(self, frame: bytes) -> None:
+        if self._queue.full():
+            self._queue.get_nowait() # Drop the oldest frame: Gemini is behind, keep latency bounded
+            self._queue.task_done()
+            self.frames_dropped += 1
+            AUDIO_INPUT_TOTALS["frames_dropped"] += 1
+            AUDIO_INPUT_TOTALS["queue_depth"] -= 1
+        self._queue.put_nowait(frame)
+        AUDIO_INPUT_TOTALS["queue_depth"] += 1
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+            AUDIO_INPUT_TOTALS["max_queue_depth"] = max(AUDIO_INPUT_TOTALS["max_queue_depth"], depth)
+
+    # --- Sender task ---
+    async def run(self) -> None:
+        """Sends queued frames in order until cancelled. Send errors propagate and end the task."""
+        try:
+            while True:
+                frame = await self._queue.get()
+                AUDIO_INPUT_TOTALS["queue_depth"] -= 1
+                started = time.perf_counter()
+                try:
+                    await self._send(frame)
+                finally:
+                    self._queue.task_done() # Counted for drain() even if the send failed
+                self.send_ms_total += (time.perf_counter() - started) * 1000.0
+                self.frames_sent += 1
+                AUDIO_INPUT_TOTALS["frames_sent"] += 1
+        finally:
+            if self._deadline_handle is not None:
+                self._deadline_handle.cancel()
+                self._deadline_handle = None
+            AUDIO_INPUT_TOTALS["queue_depth"] -= self._queue.qsize() # Unsent frames are discarded with the session
+            while not self._queue.empty(): # Release drain() waiters
+                self._queue.get_nowait()
+                self._queue.task_done()
+            AUDIO_INPUT_TOTALS["active_sessions"] -= 1
+            logger.info(f"[run] Audio input stage stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {"chunks_in": self.chunks_in, "bytes_in": self.bytes_in, "frames_sent": self.frames_sent,
+                "frames_dropped": self.frames_dropped, "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth, "frame_bytes": self.frame_bytes,
+                "avg_send_ms": round(self.send_ms_total / self.frames_sent, 3) if self.frames_sent else None}
+
+
+class OutboundAudioQueue:
+    """Byte-capped FIFO of model audio for the client, drained by one sender task."""
+
+    def __init__(self, send, max_bytes: int = AUDIO_OUTBOUND_MAX_BYTES):
+        self._send = send # async callable(chunk_bytes)
+        self.max_bytes = max_bytes
+        self._chunks = deque()
+        self._ready = asyncio.Event()
+        self.buffered_bytes = 0
+        self.max_buffered_bytes = 0
+        self.chunks_sent = 0
+        self.bytes_sent = 0
+        self.bytes_dropped = 0
+        self.purges = 0
+        self.bytes_purged = 0
+        AUDIO_OUTPUT_TOTALS["sessions"] += 1
+        AUDIO_OUTPUT_TOTALS["active_sessions"] += 1
+
+    def put(self, chunk: bytes) -> None:
+        """Queues a chunk without waiting; drops the oldest audio beyond max_bytes."""
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        self._add_buffered(len(chunk))
+        while self.buffered_bytes > self.max_bytes and len(self._chunks) > 1:
+            dropped = len(self._chunks.popleft()) # Client is too slow; keep the newest audio
+            self._add_buffered(-dropped)
+            self.bytes_dropped += dropped
+            AUDIO_OUTPUT_TOTALS["bytes_dropped"] += dropped
+        if self.buffered_bytes > self.max_buffered_bytes:
+            self.max_buffered_bytes = self.buffered_bytes
+        self._ready.set()
+
+    def purge(self) -> int:
+        """Discards all audio not yet handed to the websocket (barge-in). Returns the bytes discarded."""
+        purged = self.buffered_bytes
+        self._chunks.clear()
+        self._add_buffered(-purged)
+        self._ready.clear()
+        self.purges += 1
+        self.bytes_purged += purged
+        AUDIO_OUTPUT_TOTALS["purges"] += 1
+        AUDIO_OUTPUT_TOTALS["bytes_purged"] += purged
+        return purged
+
+    def _add_buffered(self, delta: int) -> None:
+        self.buffered_bytes += delta
+        AUDIO_OUTPUT_TOTALS["buffered_bytes"] += delta
+
+    async def run(self) -> None:
+        """Sends queued chunks in order until cancelled. Send errors propagate and end the task."""
+        try:
+            while True:
+                if not self._chunks:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                chunk = self._chunks.popleft()
+                self._add_buffered(-len(chunk))
+                await self._send(chunk)
+                self.chunks_sent += 1
+                self.bytes_sent += len(chunk)
+                AUDIO_OUTPUT_TOTALS["chunks_sent"] += 1
+                AUDIO_OUTPUT_TOTALS["bytes_sent"] += len(chunk)
+        finally:
+            self._add_buffered(-self.buffered_bytes) # Unsent audio is discarded with the session
+            self._chunks.clear()
+            AUDIO_OUTPUT_TOTALS["active_sessions"] -= 1
+            logger.info(f"[run] Audio output stage stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {"buffered_bytes": self.buffered_bytes, "buffered_chunks": len(self._chunks),
+                "max_buffered_bytes": self.max_buffered_bytes, "chunks_sent": self.chunks_sent,
+                "bytes_sent": self.bytes_sent, "bytes_dropped": self.bytes_dropped,
+                "purges": self.purges, "bytes_purged": self.bytes_purged}
@@ -0,0 +1,204 @@
+"""
+Storage interface for accounts, transactions and billers.
+
+bigquery_functions keeps the business rules (validation, status codes, logging,
+caching) and delegates every read and write to a BankRepository. Two backends exist:
+
+- BigQueryRepository (bigquery_repository.py): the production tables in BigQuery.
+- SQLiteRepository (sqlite_repository.py): an embedded SQLite database, file-backed
+  or in-memory, for a low-latency hot tier and for running the whole voice pipeline
+  locally with sub-millisecond data access.
+
+The backend is chosen with the BANK_STORAGE_BACKEND environment variable
+("bigquery" by default, or "sqlite").
+
+Conventions shared by all backends:
+- Reads return plain dicts (or lists of dicts) and None when nothing matches.
+  Account rows carry account_id, account_type, balance (float) and currency;
+  list_accounts additionally returns account_nickname.
+- Unexpected backend failures propagate as exceptions.
+- A write whose job reports errors raises StatementFailed.
+- Guarded writes reject invalid requests by raising GuardViolation, with a status that
+  matches what the validated code paths in bigquery_functions return.
+- The SQL text of the last statement issued by the current thread is available as
+  `last_query`, and how long it took and how it was executed as `last_latency_ms`
+  and `last_query_mode`, for structured logging.
+"""
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+BANK_STORAGE_BACKEND = os.getenv("BANK_STORAGE_BACKEND", "bigquery").lower()
+
+
+class GuardViolation(Exception):
+    """Raised by guarded writes when validation inside the write rejects the request."""
+
+    def __init__(self, status: str, detail: str = None):
+        super().__init__(f"{status}: {detail}" if detail else status)
+        self.status = status
+        self.detail = detail
+
+
+class StatementFailed(Exception):
+    """Raised when a write finished but the backend reported errors for it."""
+
+    def __init__(self, errors):
+        super().__init__(f"Statement failed: {errors}")
+        self.errors = errors
+
+
+class BankRepository(ABC):
+    """Data access for the banking tools. See the module docstring for the conventions."""
+
+    name = "abstract"
+
+    def __init__(self):
+        self._thread_state = threading.local()
+
+    @property
+    def last_query(self) -> str | None:
+        """SQL text of the last statement issued by the calling thread."""
+        return getattr(self._thread_state, "query", None)
+
+    @property
+    def last_latency_ms(self) -> float | None:
+        """Wall time of the last statement (or transaction) run by the calling thread."""
+        return getattr(self._thread_state, "latency_ms", None)
+
+    @property
+    def last_query_mode(self) -> str | None:
+        """How the last statement was executed, e.g. "short_query", "job" or "sqlite"."""
+        return getattr(self._thread_state, "query_mode", None)
+
+    def _remember_query(self, query_str: str) -> str:
+        self._thread_state.query = query_str
+        return query_str
+
+    @contextmanager
+    def _timed(self, query_mode: str):
+        """Records the wall time of the enclosed block as the calling thread's last latency."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._thread_state.latency_ms = round((time.perf_counter() - started) * 1000.0, 2)
+            self._thread_state.query_mode = query_mode
+
+    # --- Health ---
+    @abstractmethod
+    def ping(self):
+        """Runs a trivial query and returns its single value."""
+
+    # --- Accounts ---
+    @abstractmethod
+    def get_account_by_type(self, user_id: str, account_type: str) -> dict | None:
+        """First account of the given type owned by the user."""
+
+    @abstractmethod
+    def get_account_by_id(self, user_id: str, account_id: str) -> dict | None:
+        """Account with the given ID if it is owned by the user."""
+
+    @abstractmethod
+    def get_accounts(self, user_id: str, account_types: list, account_ids: list) -> list:
+        """All accounts of the user matching any of the given types or IDs, ordered by account_id."""
+
+    @abstractmethod
+    def list_accounts(self, user_id: str) -> list:
+        """All accounts of the user, including account_nickname."""
+
+    # --- Transactions ---
+    @abstractmethod
+    def list_transactions(self, account_id: str, limit: int) -> list:
+        """Most recent transactions of an account, newest first."""
+
+    @abstractmethod
+    def list_transactions_page(self, account_id: str, page_size: int, after: tuple = None,
+                               start_ts: str = None, end_ts: str = None,
+                               min_amount: float = None, max_amount: float = None) -> list:
+        """
+        One keyset page of an account's transactions, ordered by (date, transaction_id) descending.
+        `after` is the (date, transaction_id) of the last row of the previous page. start_ts is
+        inclusive and end_ts exclusive (ISO 8601 strings); min_amount / max_amount bound the
+        absolute amount, so debits and credits are filtered alike.
+        """
+
+    @abstractmethod
+    def transfer_funds(self, user_id: str, from_account_id: str, to_account_id: str, amount: float,
+                       currency: str, memo: str, transaction_base_id: str, timestamp: str) -> None:
+        """Atomically moves funds between two accounts and records debit/credit transactions."""
+
+    @abstractmethod
+    def transfer_funds_guarded(self, user_id: str, from_account_id: str, to_account_id: str, amount: float,
+                               currency: str, memo: str, transaction_base_id: str, timestamp: str) -> dict:
+        """
+        Like transfer_funds, but ownership, currency and balance are validated as part of the
+        same atomic write. Raises GuardViolation with ERROR_FROM_ACCOUNT_INVALID,
+        ERROR_TO_ACCOUNT_INVALID, ERROR_CURRENCY_MISMATCH (detail "<from>/<to>") or
+        ERROR_INSUFFICIENT_FUNDS (detail: balance, when known).
+        Returns {"from_balance", "from_account_type", "to_balance", "to_account_type"} after the transfer.
+        """
+
+    # --- Billers ---
+    @abstractmethod
+    def find_billers(self, user_id: str, bill_type: str, payee_nickname: str = None) -> list:
+        """Billers of the given type (and nickname): biller_id, biller_name, due_amount, due_date, default_payment_account_id."""
+
+    @abstractmethod
+    def get_biller_name(self, user_id: str, biller_id: str) -> str | None:
+        """Name of a biller registered by the user."""
+
+    @abstractmethod
+    def pay_bill(self, user_id: str, biller_id: str, from_account_id: str, amount: float, currency: str,
+                 description: str, memo: str, transaction_id: str, timestamp: str) -> None:
+        """Atomically debits the account, records the payment and resets the biller's due amount."""
+
+    @abstractmethod
+    def pay_bill_guarded(self, user_id: str, biller_id: str, from_account_id: str, amount: float,
+                         memo: str, transaction_id: str, timestamp: str) -> dict:
+        """
+        Like pay_bill, but account, balance and biller are validated and the biller name is looked
+        up as part of the same atomic write. Raises GuardViolation with ERROR_ACCOUNT_NOT_FOUND,
+        INSUFFICIENT_FUNDS (detail "<balance>/<currency>", when known) or ERROR_BILLER_NOT_FOUND.
+        Returns {"biller_name", "currency", "balance_after", "account_type"}.
+        """
+
+    @abstractmethod
+    def find_active_biller(self, user_id: str, biller_type: str, account_number: str) -> str | None:
+        """ID of an ACTIVE biller with the same type and account number, if any."""
+
+    @abstractmethod
+    def insert_biller(self, biller: dict) -> None:
+        """
+        Inserts a new ACTIVE biller. Keys: biller_id, user_id, biller_name, biller_type, account_number,
+        payee_nickname, default_payment_account_id, due_amount, due_date (date or None), timestamp.
+        """
+
+    @abstractmethod
+    def update_biller(self, user_id: str, biller_id: str, updates: dict, timestamp) -> int | None:
+        """
+        Applies already validated updates (keys as accepted by update_biller_details, due_date as a date).
+        Returns the number of affected rows, when the backend reports it.
+        """
+
+    @abstractmethod
+    def list_billers(self, user_id: str) -> list:
+        """All billers of the user, ordered by name and nickname."""
+
+
+def create_repository(backend: str = None) -> BankRepository | None:
+    """
+    Builds the configured storage backend. Returns None when the backend cannot be
+    initialised; callers report ERROR_CLIENT_NOT_INITIALIZED in that case.
+    """
+    # Re-read the variable so values loaded from .env after this module was imported apply
+    backend = (backend or os.getenv("BANK_STORAGE_BACKEND", BANK_STORAGE_BACKEND)).lower()
+    if backend == "sqlite":
+        from sqlite_repository import SQLiteRepository
+        return SQLiteRepository()
+    if backend == "bigquery":
+        from bigquery_repository import BigQueryRepository
+        return BigQueryRepository.from_environment()
+    raise ValueError(f"Unknown BANK_STORAGE_BACKEND '{backend}'. Expected 'bigquery' or 'sqlite'.")
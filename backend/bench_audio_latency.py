@@ -0,0 +1,94 @@
+"""
+Benchmark: audio forward latency while N tool calls run concurrently.
+
+An "audio forwarder" coroutine wakes up every --frame-ms to forward a frame, the way
+handle_client_input_and_forward does for microphone chunks. While it runs, N tool
+calls each execute a simulated BigQuery job (a blocking sleep of --query-ms).
+
+  before: the tool calls the blocking helper directly inside the coroutine
+          (what the gemini_tools wrappers used to do).
+  after:  the tool awaits bigquery_async.run_blocking(...), i.e. the job runs on the
+          BigQuery worker pool and the event loop stays free.
+
+For each mode the script reports how late frames were forwarded (p50/p95/max) and
+the wall time until all tool calls finished.
+
+Usage:
+    python bench_audio_latency.py --concurrency 1 4 16 --query-ms 300
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import bigquery_async
+
+
+def _simulated_bq_job(duration_s: float):
+    """Stands in for client.query(...).result(): blocks the calling thread."""
+    time.sleep(duration_s)
+    return {"status": "SUCCESS"}
+
+
+async def _tool_call_before(duration_s: float):
+    return _simulated_bq_job(duration_s)
+
+
+async def _tool_call_after(duration_s: float):
+    return await bigquery_async.run_blocking(_simulated_bq_job, duration_s)
+
+
+async def _audio_forwarder(frame_s: float, stop: asyncio.Event, lateness_ms: list):
+    next_tick = time.perf_counter() + frame_s
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+        now = time.perf_counter()
+        lateness_ms.append((now - next_tick) * 1000.0)
+        next_tick += frame_s
+        if next_tick < now: # Frames that could not be sent in time are skipped, not replayed
+            next_tick = now + frame_s
+
+
+async def _run_once(mode: str, concurrency: int, query_s: float, frame_s: float) -> dict:
+    tool_call = _tool_call_before if mode == "before" else _tool_call_after
+    stop = asyncio.Event()
+    lateness_ms = []
+    forwarder = asyncio.create_task(_audio_forwarder(frame_s, stop, lateness_ms))
+    await asyncio.sleep(frame_s * 3) # Let the forwarder settle
+
+    started = time.perf_counter()
+    await asyncio.gather(*(tool_call(query_s) for _ in range(concurrency)))
+    tools_wall_ms = (time.perf_counter() - started) * 1000.0
+
+    await asyncio.sleep(frame_s * 3)
+    stop.set()
+    await forwarder
+
+    lateness_ms.sort()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "frames": len(lateness_ms),
+        "p50_ms": statistics.median(lateness_ms),
+        "p95_ms": lateness_ms[int(len(lateness_ms) * 0.95) - 1],
+        "max_ms": lateness_ms[-1],
+        "tools_wall_ms": tools_wall_ms,
+    }
+
+
+async def main(args):
+    print(f"Simulated query: {args.query_ms} ms, audio frame: {args.frame_ms} ms, BQ workers: {bigquery_async.BQ_MAX_WORKERS}")
+    print(f"{'mode':<8}{'N':>4}{'frames':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'tools wall ms':>16}")
+    for concurrency in args.concurrency:
+        for mode in ("before", "after"):
+            r = await _run_once(mode, concurrency, args.query_ms / 1000.0, args.frame_ms / 1000.0)
+            print(f"{r['mode']:<8}{r['concurrency']:>4}{r['frames']:>8}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['max_ms']:>10.1f}{r['tools_wall_ms']:>16.1f}")
+    bigquery_async.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--query-ms", type=float, default=300.0)
+    parser.add_argument("--frame-ms", type=float, default=20.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,189 @@
+"""
+Benchmark: per-session overhead of the /listen forwarding loops.
+
+Simulates N concurrent sessions with in-memory stand-ins for the client websocket and
+the Gemini Live session, and runs the two forwarding directions the way
+websocket_endpoint does:
+
+  before: the client loop wraps websocket.receive() in wait_for(timeout=0.2) to poll a
+          shared `active_processing` flag, the Gemini loop sleeps 0.1 s after an idle
+          receive() round, and the session waits for *both* tasks (gather).
+  after:  both loops only await real I/O; the session ends when either task finishes
+          and the other one is cancelled (asyncio.wait FIRST_COMPLETED).
+
+Reported per mode:
+  fwd p50/p95  - client message -> send_realtime_input latency while audio streams
+  idle CPU     - process CPU time per session per second while nobody talks
+  wakeups/s    - loop iterations per session per second while idle
+  shutdown     - client disconnect -> both tasks finished (Gemini stays silent)
+
+Usage:
+    python bench_session_loop.py --sessions 1 10 100 --idle-seconds 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+_CLOSED = object()
+
+
+class FakeWebSocket:
+    """Client side: messages are put on a queue; _CLOSED simulates a disconnect."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+
+    async def receive(self):
+        item = await self.incoming.get()
+        if item is _CLOSED:
+            raise ConnectionError("client disconnected")
+        return item
+
+    async def send(self, data):
+        pass
+
+
+class FakeLiveSession:
+    """Gemini side: records when audio arrives; receive() yields one turn from a queue."""
+
+    def __init__(self):
+        self.outgoing = asyncio.Queue()
+        self.latencies_ms = []
+
+    async def send_realtime_input(self, audio):
+        self.latencies_ms.append((time.perf_counter() - audio) * 1000.0)
+
+    async def receive(self):
+        while True:
+            message = await self.outgoing.get()
+            yield message
+            if message == "turn_complete":
+                return
+
+
+async def run_before(websocket, session, counters):
+    active = True
+
+    async def forward():
+        nonlocal active
+        try:
+            while active:
+                try:
+                    data = await asyncio.wait_for(websocket.receive(), timeout=0.2)
+                    await session.send_realtime_input(data)
+                except asyncio.TimeoutError:
+                    counters["wakeups"] += 1
+                    if not active:
+                        break
+                    continue
+        except Exception:
+            pass
+        finally:
+            active = False
+
+    async def receive():
+        nonlocal active
+        try:
+            while active:
+                had_activity = False
+                async for response in session.receive():
+                    had_activity = True
+                    await websocket.send(response)
+                counters["wakeups"] += 1
+                if not had_activity and active:
+                    await asyncio.sleep(0.1)
+        finally:
+            active = False
+
+    await asyncio.gather(asyncio.create_task(forward()), asyncio.create_task(receive()))
+
+
+async def run_after(websocket, session, counters):
+    async def forward():
+        try:
+            while True:
+                data = await websocket.receive()
+                await session.send_realtime_input(data)
+        except Exception:
+            return
+
+    async def receive():
+        while True:
+            had_activity = False
+            async for response in session.receive():
+                had_activity = True
+                await websocket.send(response)
+            counters["wakeups"] += 1
+            if not had_activity:
+                return
+
+    tasks = {asyncio.create_task(forward()), asyncio.create_task(receive())}
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _run_mode(mode: str, sessions: int, idle_s: float, frames: int, frame_s: float) -> dict:
+    runner = run_before if mode == "before" else run_after
+    pairs = [(FakeWebSocket(), FakeLiveSession()) for _ in range(sessions)]
+    counters = {"wakeups": 0}
+    session_tasks = [asyncio.create_task(runner(ws, live, counters)) for ws, live in pairs]
+    await asyncio.sleep(0.05)
+
+    # Streaming: every session sends `frames` audio chunks (the payload is the send time)
+    for _ in range(frames):
+        for ws, _live in pairs:
+            ws.incoming.put_nowait(time.perf_counter())
+        await asyncio.sleep(frame_s)
+    latencies = sorted(ms for _ws, live in pairs for ms in live.latencies_ms)
+
+    # Idle: nobody talks, Gemini is silent
+    counters["wakeups"] = 0
+    cpu_started = time.process_time()
+    await asyncio.sleep(idle_s)
+    idle_cpu_ms = (time.process_time() - cpu_started) * 1000.0
+    idle_wakeups = counters["wakeups"]
+
+    # Shutdown: all clients disconnect while Gemini stays silent
+    started = time.perf_counter()
+    for ws, _live in pairs:
+        ws.incoming.put_nowait(_CLOSED)
+    _done, pending = await asyncio.wait(session_tasks, timeout=2.0)
+    shutdown_ms = (time.perf_counter() - started) * 1000.0
+    for task in pending: # "before" never finishes while Gemini is silent
+        task.cancel()
+    await asyncio.gather(*session_tasks, return_exceptions=True)
+
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "fwd_p50_ms": statistics.median(latencies),
+        "fwd_p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "idle_cpu_ms_per_session_s": idle_cpu_ms / sessions / idle_s,
+        "wakeups_per_session_s": idle_wakeups / sessions / idle_s,
+        "shutdown_ms": shutdown_ms,
+        "stuck_sessions": len(pending),
+    }
+
+
+async def main(args):
+    print(f"Idle window: {args.idle_seconds} s, {args.frames} audio frames every {args.frame_ms} ms per session")
+    print(f"{'mode':<8}{'N':>5}{'fwd p50 ms':>12}{'fwd p95 ms':>12}{'idle CPU ms/s':>15}{'wakeups/s':>11}{'shutdown ms':>13}{'stuck':>7}")
+    for sessions in args.sessions:
+        for mode in ("before", "after"):
+            r = await _run_mode(mode, sessions, args.idle_seconds, args.frames, args.frame_ms / 1000.0)
+            print(f"{r['mode']:<8}{r['sessions']:>5}{r['fwd_p50_ms']:>12.3f}{r['fwd_p95_ms']:>12.3f}"
+                  f"{r['idle_cpu_ms_per_session_s']:>15.3f}{r['wakeups_per_session_s']:>11.1f}{r['shutdown_ms']:>13.1f}{r['stuck_sessions']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--frame-ms", type=float, default=20.0)
+    asyncio.run(main(parser.parse_args()))
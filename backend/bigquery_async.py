@@ -0,0 +1,73 @@
+"""
+Awaitable variants of the bigquery_functions helpers.
+
+The google-cloud-bigquery client only offers a blocking API: `client.query(...)`
+performs the jobs.insert round trip and `.result()` polls the job until it finishes.
+Calling those helpers directly from an `async def` tool freezes the Quart event loop,
+and with it audio forwarding for every live websocket session on the worker.
+
+Every helper is therefore submitted to a dedicated, bounded worker pool and the
+calling coroutine only awaits the resulting future. The pool is separate from the
+event loop's default executor so a burst of slow jobs cannot starve other users of
+`asyncio.to_thread` (e.g. the FAQ search).
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import bigquery_functions # Use absolute import
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of BigQuery calls in flight per worker process.
+BQ_MAX_WORKERS = int(os.getenv("BQ_MAX_WORKERS", "16"))
+
+_bq_executor = ThreadPoolExecutor(max_workers=BQ_MAX_WORKERS, thread_name_prefix="bq-worker")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking callable on the BigQuery worker pool and awaits its result.
+    Context variables are propagated the same way asyncio.to_thread does.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(_bq_executor, call)
+
+
+def _awaitable(func_name: str):
+    """Builds an async wrapper that dispatches bigquery_functions.<func_name> to the worker pool."""
+    sync_func = getattr(bigquery_functions, func_name)
+
+    @functools.wraps(sync_func)
+    async def wrapper(*args, **kwargs):
+        # Resolve at call time so the wrapper always follows the module attribute.
+        return await run_blocking(getattr(bigquery_functions, func_name), *args, **kwargs)
+
+    return wrapper
+
+
+test_bigquery_connection = _awaitable("test_bigquery_connection")
+get_account_balance = _awaitable("get_account_balance")
+get_transaction_history = _awaitable("get_transaction_history")
+get_transaction_history_page = _awaitable("get_transaction_history_page")
+initiate_fund_transfer_check = _awaitable("initiate_fund_transfer_check")
+execute_fund_transfer = _awaitable("execute_fund_transfer")
+get_bill_details = _awaitable("get_bill_details")
+pay_bill = _awaitable("pay_bill")
+register_biller = _awaitable("register_biller")
+update_biller_details = _awaitable("update_biller_details")
+remove_biller = _awaitable("remove_biller")
+list_registered_billers = _awaitable("list_registered_billers")
+get_accounts_for_user = _awaitable("get_accounts_for_user")
+find_account_by_natural_language = _awaitable("find_account_by_natural_language")
+
+
+def shutdown(wait: bool = True):
+    """Stops the BigQuery worker pool. Intended for application shutdown hooks."""
+    logger.info(f"[shutdown] Stopping BigQuery worker pool (wait={wait}).")
+    _bq_executor.shutdown(wait=wait)
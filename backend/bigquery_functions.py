@@ -1,12 +1,17 @@
 import os
-from google.cloud import bigquery
 import datetime
 import uuid
 import logging
 import sys # Added to redirect logger to stdout
 import json # For structured logging of parameters and results
+import base64 # Opaque transaction history cursors
 from dotenv import load_dotenv
-from google.oauth2 import service_account
+from account_cache import ACCOUNT_CACHE # In-process account snapshot cache
+from biller_index import BILLER_INDEX # In-process biller name index
+from account_matcher import ACCOUNT_MATCHER # Precomputed natural-language account matcher
+from log_store import RingLogStore # Bounded in-memory log buffer
+from event_bus import EVENT_BUS # Structured log events (store, console, ...)
+from bank_repository import create_repository, GuardViolation, StatementFailed # Storage backends
 
 
 
@@ -26,50 +31,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__) # Use a specific logger for this module
 
-# Global store for logs
-GLOBAL_LOG_STORE = []
+# Global store for logs (newest LOG_STORE_CAPACITY entries): BigQuery interactions and tool events
+GLOBAL_LOG_STORE = RingLogStore("BQ_INTERACTION")
+EVENT_BUS.subscribe(GLOBAL_LOG_STORE.append)
  
-CREDENTIALS_PATH = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-GOOGLE_CLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
-
-# Initialize BigQuery Client
-# Ensure GOOGLE_APPLICATION_CREDENTIALS environment variable is set.
-# For local development, you might set it like this:
-# os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "path/to/your/service-account-file.json"
-# In a deployed environment (e.g., Google Cloud Run/Functions), this is often handled automatically.
-try:
-    # client = bigquery.Client(project=GOOGLE_CLOUD_PROJECT, credentials=service_account.Credentials.from_service_account_file(CREDENTIALS_PATH))
-    client = bigquery.Client(project="account-pocs")
-    # Attempt a simple query to verify connection and credentials
-    # This also helps in resolving the project ID if not explicitly set
-    if client.project:
-         logger.info(f"\033[92mBigQuery client initialized successfully for project: {client.project}.\033[0m")
-    else: # Should not happen if client init is successful without error
-         logger.warning("BigQuery client initialized, but project ID could not be determined automatically.")
-    # client.query("SELECT 1").result() # Optional: verify with a query
-except Exception as e:
-    logger.error(f"Failed to initialize BigQuery client: {e}", exc_info=True) # Added exc_info=True
-    # Fallback or raise an error if the client is essential for the module to load
-    client = None
+# Storage backend (BigQuery by default, see bank_repository.BANK_STORAGE_BACKEND).
+# None when the backend could not be initialised, e.g. missing BigQuery credentials.
+repository = create_repository()
 
 # Placeholder for User ID - replace with actual authentication mechanism later
 USER_ID = "user_krishnan_001"
 
-# Determine Project ID and Dataset ID
-# Use GOOGLE_CLOUD_PROJECT env var if set, otherwise try to get from initialized client
-PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
-if not PROJECT_ID and client:
-    PROJECT_ID = client.project
-if not PROJECT_ID:
-    logger.warning("GOOGLE_CLOUD_PROJECT environment variable not set and client.project is unavailable. Using placeholder 'your-gcp-project-id'. Table references might be incorrect.")
-    PROJECT_ID = "your-gcp-project-id" # Fallback placeholder
+# "guarded": validation runs inside the single transfer script (one BigQuery job).
+# "validated": accounts are read and validated first, then the DML script runs.
+FUND_TRANSFER_MODE = os.getenv("FUND_TRANSFER_MODE", "guarded").lower()
+# Same choice for bill payments: one scripted job vs. account/biller reads followed by the DML script.
+BILL_PAYMENT_MODE = os.getenv("BILL_PAYMENT_MODE", "guarded").lower()
 
-DATASET_ID = "bank_voice_assistant_dataset" # Assuming the dataset name from bigquery_setup.sql
+# Largest page get_transaction_history_page returns, whatever the caller asks for
+TRANSACTION_PAGE_SIZE_MAX = int(os.getenv("TRANSACTION_PAGE_SIZE_MAX", "100"))
 
 # --- Structured Logging Helper ---
-def log_bq_interaction(func_name: str, params: dict, query: str = None, status: str = "N/A", result_summary: str = None, error_message: str = None):
-    """Helper function for structured logging of BigQuery interactions."""
+def log_bq_interaction(func_name: str, params: dict, query: str = None, status: str = "N/A", result_summary: str = None, error_message: str = None, latency_ms: float = None):
+    """
+    Helper function for structured logging of BigQuery interactions.
+    When `query` is the statement the repository just ran on this thread, its latency and
+    execution mode (short_query, job, sqlite) are added unless latency_ms is given.
+    """
     log_entry = {
+        "log_type": "BQ_INTERACTION",
         "operation": func_name,
         "parameters": params,
         "query": query if query else "N/A",
@@ -79,26 +69,15 @@ def log_bq_interaction(func_name: str, params: dict, query: str = None, status:
         log_entry["result_summary"] = result_summary
     if error_message:
         log_entry["error_message"] = error_message
+    if latency_ms is None and query and repository and query == repository.last_query:
+        latency_ms = repository.last_latency_ms
+        log_entry["query_mode"] = repository.last_query_mode
+    if latency_ms is not None:
+        log_entry["latency_ms"] = latency_ms
     
-    # Using logger.info for all structured logs for simplicity,
+    # Subscribers store it for /api/logs and print it (serialized off this thread);
     # the 'status' field within the JSON will indicate success/failure.
-    # Alternatively, use logger.error for failed statuses.
-    
-    # Store the log entry in the global list
-    GLOBAL_LOG_STORE.append(log_entry)
-
-    if "ERROR" in status.upper() or "FAIL" in status.upper():
-        logger.error(json.dumps(log_entry)) # Error logs remain default color
-    else:
-        logger.info(f"\033[92m{json.dumps(log_entry)}\033[0m") # Successful BQ interactions in green
-
-# Helper to construct full table IDs
-def _table_ref(table_name: str) -> str:
-    if PROJECT_ID == "your-gcp-project-id": # Check if using placeholder
-        # This is a less safe fallback if project ID couldn't be determined
-        logger.warning(f"Using fallback table reference for {table_name} as PROJECT_ID is a placeholder.")
-        return f"`{DATASET_ID}.{table_name}`"
-    return f"`{PROJECT_ID}.{DATASET_ID}.{table_name}`"
+    EVENT_BUS.publish(log_entry)
 
 def test_bigquery_connection():
     """
@@ -111,25 +90,19 @@ def test_bigquery_connection():
     query_str = "SELECT 1 AS test_column"
     logger.info(f"[{func_name}] Attempting to test BigQuery connection.")
 
-    if not client:
+    if not repository:
         log_message = "BigQuery client is not initialized. Cannot perform connection test."
         logger.error(f"[{func_name}] {log_message}")
         # Manual log for consistency if needed
-        GLOBAL_LOG_STORE.append({
-            "operation": func_name, "parameters": params, "query": query_str,
+        EVENT_BUS.publish({
+            "log_type": "BQ_INTERACTION", "operation": func_name, "parameters": params, "query": query_str,
             "status": "ERROR_CLIENT_NOT_INITIALIZED", "error_message": log_message
         })
         return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": log_message}
 
     try:
         logger.info(f"\033[92m[{func_name}] Executing test query: {query_str}\033[0m")
-        query_job = client.query(query_str)
-        results = query_job.result()  # Waits for the job to complete.
-        
-        data_val = None
-        for row in results:
-            data_val = row.test_column # Access the aliased column
-            break
+        data_val = repository.ping() # Waits for the query to complete.
 
         result_summary = f"Test query successful. Result: {data_val}"
         logger.info(f"\033[92m[{func_name}] {result_summary}\033[0m")
@@ -139,7 +112,7 @@ def test_bigquery_connection():
         error_message = f"BigQuery connection test failed: {str(e)}"
         # Log with full traceback here
         logger.error(f"[{func_name}] {error_message}", exc_info=True)
-        log_bq_interaction(func_name, params, query_str, status="ERROR_QUERY_FAILED", error_message=error_message)
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=error_message)
         return {"status": "ERROR_QUERY_FAILED", "message": error_message}
 
 def _get_account_details(account_type: str, user_id: str) -> dict:
@@ -149,38 +122,22 @@ def _get_account_details(account_type: str, user_id: str) -> dict:
     func_name = "_get_account_details"
     params = {"account_type": account_type, "user_id": user_id}
     query_str = None
+
+    cached = ACCOUNT_CACHE.get_account_by_type(user_id, account_type)
+    if cached:
+        log_bq_interaction(func_name, params, status="SUCCESS", result_summary=f"Account found in cache: {cached['account_id']}")
+        return {"status": "SUCCESS", "account_id": cached["account_id"], "balance": cached["balance"], "currency": cached["currency"], "account_type": account_type}
     
-    if not client:
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}
 
-    accounts_table = _table_ref("Accounts")
-    query_str = f"""
-        SELECT account_id, balance, currency
-        FROM {accounts_table}
-        WHERE user_id = @user_id AND account_type = @account_type
-        LIMIT 1
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-            bigquery.ScalarQueryParameter("account_type", "STRING", account_type),
-        ]
-    )
     try:
-        query_job = client.query(query_str, job_config=job_config)
-        results = query_job.result()
-        row_data = None
-        for row in results: # Should be at most one row due to LIMIT 1
-            row_data = {
-                "account_id": row.account_id,
-                "balance": float(row.balance),
-                "currency": row.currency,
-                "account_type": account_type
-            }
-            break # Found the account
-        
+        row_data = repository.get_account_by_type(user_id, account_type)
+        query_str = repository.last_query
+
         if row_data:
+            ACCOUNT_CACHE.put_account(user_id, row_data)
             log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=f"Account found: {row_data['account_id']}")
             return {"status": "SUCCESS", **row_data}
         else:
@@ -188,11 +145,63 @@ def _get_account_details(account_type: str, user_id: str) -> dict:
             return {"status": "ERROR_ACCOUNT_NOT_FOUND", "message": f"Account type '{account_type}' not found for user '{user_id}'."}
     except Exception as e:
         logger.error(f"Exception details in {func_name}: {str(e)}", exc_info=True) # Added exc_info=True
-        log_bq_interaction(func_name, params, query_str, status="ERROR_QUERY_FAILED", error_message=str(e))
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=str(e))
         # The original logging.error is now covered by log_bq_interaction if status is error
         return {"status": "ERROR_QUERY_FAILED", "message": str(e)}
 
 
+def _get_accounts_batch(user_id: str, account_types: list = None, account_ids: list = None) -> dict:
+    """
+    Helper to resolve several accounts of one user at once, by account_type and/or account_id.
+    Keys that are not cached are fetched in a single query using IN UNNEST(@keys).
+    Returns {"status": "SUCCESS", "by_type": {account_type: row}, "by_id": {account_id: row}};
+    keys without a matching account are simply absent from the maps.
+    """
+    func_name = "_get_accounts_batch"
+    account_types = list(dict.fromkeys(account_types or []))
+    account_ids = list(dict.fromkeys(account_ids or []))
+    params = {"user_id": user_id, "account_types": account_types, "account_ids": account_ids}
+    query_str = None
+
+    by_type, by_id = {}, {}
+    for account_type in account_types:
+        cached = ACCOUNT_CACHE.get_account_by_type(user_id, account_type)
+        if cached:
+            by_type[account_type] = cached
+    for account_id in account_ids:
+        cached = ACCOUNT_CACHE.get_account(user_id, account_id)
+        if cached:
+            by_id[account_id] = cached
+
+    missing_types = [t for t in account_types if t not in by_type]
+    missing_ids = [i for i in account_ids if i not in by_id]
+    if not missing_types and not missing_ids:
+        log_bq_interaction(func_name, params, status="SUCCESS", result_summary=f"Resolved {len(by_type) + len(by_id)} account key(s) from cache.")
+        return {"status": "SUCCESS", "by_type": by_type, "by_id": by_id}
+
+    if not repository:
+        log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
+        return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}
+
+    try:
+        rows = repository.get_accounts(user_id, missing_types, missing_ids)
+        query_str = repository.last_query
+        for row_data in rows:
+            ACCOUNT_CACHE.put_account(user_id, row_data)
+            # Same first-match semantics as _get_account_details' LIMIT 1
+            if row_data["account_type"] in missing_types and row_data["account_type"] not in by_type:
+                by_type[row_data["account_type"]] = row_data
+            if row_data["account_id"] in missing_ids:
+                by_id[row_data["account_id"]] = row_data
+
+        log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=f"Resolved {len(by_type)}/{len(account_types)} account type(s) and {len(by_id)}/{len(account_ids)} account ID(s).")
+        return {"status": "SUCCESS", "by_type": by_type, "by_id": by_id}
+    except Exception as e:
+        logger.error(f"Exception details in {func_name}: {str(e)}", exc_info=True)
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=str(e))
+        return {"status": "ERROR_QUERY_FAILED", "message": str(e)}
+
+
 def get_account_balance(account_type: str) -> dict:
     """
     Queries the Accounts table for the balance of a specific account type for the USER_ID.
@@ -219,7 +228,7 @@ def get_transaction_history(account_type: str, limit: int = 5) -> list:
     params = {"account_type": account_type, "limit": limit, "user_id": USER_ID}
     query_str = None
 
-    if not client:
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return [{"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}]
 
@@ -231,34 +240,12 @@ def get_transaction_history(account_type: str, limit: int = 5) -> list:
         return [account_details]
 
     account_id = account_details["account_id"]
-    transactions_table = _table_ref("Transactions")
-
-    query_str = f"""
-        SELECT transaction_id, date, description, amount, currency, type
-        FROM {transactions_table}
-        WHERE account_id = @account_id
-        ORDER BY date DESC
-        LIMIT @limit
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("account_id", "STRING", account_id),
-            bigquery.ScalarQueryParameter("limit", "INT64", limit),
-        ]
-    )
+
     try:
-        query_job = client.query(query_str, job_config=job_config)
-        results = query_job.result()
-        transactions_data = []
-        for row in results:
-            transactions_data.append({
-                "transaction_id": row.transaction_id,
-                "date": row.date.isoformat() if isinstance(row.date, (datetime.datetime, datetime.date)) else str(row.date),
-                "description": row.description,
-                "amount": float(row.amount),
-                "currency": row.currency,
-                "type": row.type
-            })
+        transactions_data = repository.list_transactions(account_id, limit)
+        query_str = repository.last_query
+        for txn in transactions_data:
+            txn["date"] = txn["date"].isoformat() if isinstance(txn["date"], (datetime.datetime, datetime.date)) else str(txn["date"])
         
         if not transactions_data:
             log_bq_interaction(func_name, params, query_str, status="NO_TRANSACTIONS_FOUND", result_summary=f"No transactions found for account {account_id}.")
@@ -268,10 +255,139 @@ def get_transaction_history(account_type: str, limit: int = 5) -> list:
         return transactions_data
     except Exception as e:
         logger.error(f"Exception details in {func_name}: {str(e)}", exc_info=True) # Added exc_info=True
-        log_bq_interaction(func_name, params, query_str, status="ERROR_QUERY_FAILED", error_message=str(e))
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=str(e))
         return [{"status": "ERROR_QUERY_FAILED", "message": str(e)}]
 
 
+def encode_transaction_cursor(row: dict) -> str:
+    """Opaque cursor pointing just past `row` in (date, transaction_id) DESC order."""
+    payload = json.dumps({"d": row["date"], "t": row["transaction_id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_transaction_cursor(cursor: str) -> tuple:
+    """Returns (date, transaction_id) from a cursor; raises ValueError if it is malformed."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(payload["d"]), str(payload["t"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def _parse_day_bound(value: str, inclusive_end: bool = False) -> str | None:
+    """'YYYY-MM-DD' -> ISO timestamp at UTC midnight (the following midnight for an inclusive end day)."""
+    if not value:
+        return None
+    day = datetime.datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+    if inclusive_end:
+        day += datetime.timedelta(days=1)
+    return day.isoformat()
+
+
+def get_transaction_history_page(account_type: str, page_size: int = 5, cursor: str = None,
+                                 start_date: str = None, end_date: str = None,
+                                 min_amount: float = None, max_amount: float = None) -> dict:
+    """
+    Fetches one page of transaction history for the given account_type of the default USER_ID,
+    newest first. Pagination is keyset-based on (date, transaction_id), so a page costs the same
+    wherever it is in the history.
+
+    Args:
+        page_size: Rows per page, capped at TRANSACTION_PAGE_SIZE_MAX.
+        cursor: `next_cursor` of the previous page; omit for the first page.
+        start_date / end_date: Inclusive 'YYYY-MM-DD' bounds (UTC).
+        min_amount / max_amount: Bounds on the absolute transaction amount.
+
+    Returns:
+        {"status": "SUCCESS", "account_id": ..., "transactions": [...], "next_cursor": str or None}
+        ("NO_TRANSACTIONS_FOUND" when the first page is empty) or an error dict.
+    """
+    func_name = "get_transaction_history_page"
+    params = {"account_type": account_type, "page_size": page_size, "cursor": cursor, "start_date": start_date,
+              "end_date": end_date, "min_amount": min_amount, "max_amount": max_amount, "user_id": USER_ID}
+
+    if not repository:
+        log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
+        return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}
+
+    if not isinstance(page_size, int) or page_size <= 0:
+        log_bq_interaction(func_name, params, status="ERROR_INVALID_PAGE_SIZE", error_message="page_size must be a positive integer.")
+        return {"status": "ERROR_INVALID_PAGE_SIZE", "message": "page_size must be a positive integer."}
+    page_size = min(page_size, TRANSACTION_PAGE_SIZE_MAX)
+
+    after = None
+    if cursor:
+        try:
+            after = decode_transaction_cursor(cursor)
+        except ValueError as e:
+            log_bq_interaction(func_name, params, status="ERROR_INVALID_CURSOR", error_message=str(e))
+            return {"status": "ERROR_INVALID_CURSOR", "message": "The pagination cursor is invalid. Start again without a cursor."}
+
+    try:
+        start_ts = _parse_day_bound(start_date)
+        end_ts = _parse_day_bound(end_date, inclusive_end=True)
+    except ValueError:
+        log_bq_interaction(func_name, params, status="ERROR_INVALID_DATE_FORMAT", error_message="Invalid start_date/end_date format. Please use YYYY-MM-DD.")
+        return {"status": "ERROR_INVALID_DATE_FORMAT", "message": "Invalid start_date/end_date format. Please use YYYY-MM-DD."}
+
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        log_bq_interaction(func_name, params, status="ERROR_INVALID_AMOUNT_RANGE", error_message="min_amount is greater than max_amount.")
+        return {"status": "ERROR_INVALID_AMOUNT_RANGE", "message": "min_amount must not be greater than max_amount."}
+
+    # _get_account_details already logs its interaction
+    account_details = _get_account_details(account_type, USER_ID)
+    if account_details["status"] != "SUCCESS":
+        log_bq_interaction(func_name, params, status=account_details["status"], error_message=f"Failed to get account details for {account_type}: {account_details.get('message')}")
+        return account_details
+
+    account_id = account_details["account_id"]
+    try:
+        # One extra row tells whether another page exists without a second query
+        rows = repository.list_transactions_page(account_id, page_size + 1, after=after, start_ts=start_ts, end_ts=end_ts,
+                                                 min_amount=min_amount, max_amount=max_amount)
+        query_str = repository.last_query
+        has_more = len(rows) > page_size
+        transactions_data = rows[:page_size]
+        for txn in transactions_data:
+            txn["date"] = txn["date"].isoformat() if isinstance(txn["date"], (datetime.datetime, datetime.date)) else str(txn["date"])
+        next_cursor = encode_transaction_cursor(transactions_data[-1]) if has_more else None
+
+        if not transactions_data and not cursor:
+            log_bq_interaction(func_name, params, query_str, status="NO_TRANSACTIONS_FOUND", result_summary=f"No transactions found for account {account_id}.")
+            return {"status": "NO_TRANSACTIONS_FOUND", "account_id": account_id, "transactions": [], "next_cursor": None,
+                    "message": f"No transactions found for account {account_id} (type: {account_type})."}
+
+        log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=f"Retrieved {len(transactions_data)} transaction(s), more available: {has_more}.")
+        return {"status": "SUCCESS", "account_id": account_id, "transactions": transactions_data, "next_cursor": next_cursor}
+    except Exception as e:
+        logger.error(f"Exception details in {func_name}: {str(e)}", exc_info=True)
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=str(e))
+        return {"status": "ERROR_QUERY_FAILED", "message": str(e)}
+
+
+def iter_transaction_history(account_type: str, page_size: int = 50, max_rows: int = None, **filters):
+    """
+    Yields transactions of account_type newest first, fetching one keyset page at a time so
+    only a single page is held in memory. Accepts the filters of get_transaction_history_page.
+    If a page fails, its error dict is yielded as the last item.
+    """
+    cursor = None
+    yielded = 0
+    while True:
+        page = get_transaction_history_page(account_type, page_size=page_size, cursor=cursor, **filters)
+        if page["status"] not in ("SUCCESS", "NO_TRANSACTIONS_FOUND"):
+            yield page
+            return
+        for txn in page["transactions"]:
+            if max_rows is not None and yielded >= max_rows:
+                return
+            yield txn
+            yielded += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            return
+
+
 def initiate_fund_transfer_check(from_account_type: str, to_account_type: str, amount: float) -> dict:
     """
     Checks if a fund transfer is possible between two account types for the USER_ID.
@@ -283,18 +399,25 @@ def initiate_fund_transfer_check(from_account_type: str, to_account_type: str, a
         log_bq_interaction(func_name, params, status="ERROR_INVALID_AMOUNT", error_message="Transfer amount must be a positive number.")
         return {"status": "ERROR_INVALID_AMOUNT", "message": "Transfer amount must be a positive number."}
 
-    # _get_account_details logs its own interactions
-    from_account_details = _get_account_details(from_account_type, USER_ID)
-    if from_account_details["status"] != "SUCCESS":
-        err_msg = f"From account ('{from_account_type}'): {from_account_details.get('message', 'Error fetching details.')}"
-        log_bq_interaction(func_name, params, status=from_account_details["status"], error_message=err_msg)
-        return {"status": from_account_details["status"], "message": err_msg}
-
-    to_account_details = _get_account_details(to_account_type, USER_ID)
-    if to_account_details["status"] != "SUCCESS":
-        err_msg = f"To account ('{to_account_type}'): {to_account_details.get('message', 'Error fetching details.')}"
-        log_bq_interaction(func_name, params, status=to_account_details["status"], error_message=err_msg)
-        return {"status": to_account_details["status"], "message": err_msg}
+    # Both accounts are resolved in one lookup; _get_accounts_batch logs its own interactions
+    accounts = _get_accounts_batch(USER_ID, account_types=[from_account_type, to_account_type])
+    if accounts["status"] != "SUCCESS":
+        # The lookup itself failed; neither account is to blame
+        err_msg = accounts.get("message", "Error fetching account details.")
+        log_bq_interaction(func_name, params, status=accounts["status"], error_message=err_msg)
+        return {"status": accounts["status"], "message": err_msg}
+
+    from_account_details = accounts["by_type"].get(from_account_type)
+    if not from_account_details:
+        err_msg = f"From account ('{from_account_type}'): Account type '{from_account_type}' not found for user '{USER_ID}'."
+        log_bq_interaction(func_name, params, status="ERROR_ACCOUNT_NOT_FOUND", error_message=err_msg)
+        return {"status": "ERROR_ACCOUNT_NOT_FOUND", "message": err_msg}
+
+    to_account_details = accounts["by_type"].get(to_account_type)
+    if not to_account_details:
+        err_msg = f"To account ('{to_account_type}'): Account type '{to_account_type}' not found for user '{USER_ID}'."
+        log_bq_interaction(func_name, params, status="ERROR_ACCOUNT_NOT_FOUND", error_message=err_msg)
+        return {"status": "ERROR_ACCOUNT_NOT_FOUND", "message": err_msg}
 
     from_account_id = from_account_details["account_id"]
     from_balance = from_account_details["balance"]
@@ -329,12 +452,14 @@ def execute_fund_transfer(from_account_id: str, to_account_id: str, amount: floa
     """
     Executes a fund transfer by updating account balances and recording transactions in BigQuery.
     Operations are performed within a multi-statement transaction for atomicity.
+    With FUND_TRANSFER_MODE="guarded" (default) validation happens inside that same script,
+    see _execute_fund_transfer_guarded; otherwise the accounts are validated with a read first.
     """
     func_name = "execute_fund_transfer"
     params = {"from_account_id": from_account_id, "to_account_id": to_account_id, "amount": amount, "currency": currency, "memo": memo, "user_id": USER_ID}
     query_str = None # Will hold the multi-statement query
 
-    if not client:
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}
 
@@ -346,16 +471,25 @@ def execute_fund_transfer(from_account_id: str, to_account_id: str, amount: floa
         log_bq_interaction(func_name, params, status="ERROR_SAME_ACCOUNT", error_message="Cannot execute transfer to the same account ID.")
         return {"status": "ERROR_SAME_ACCOUNT", "message": "Cannot transfer funds to the same account."}
 
-    # Fetch account details for validation
-    from_account_details = _get_account_balance_by_id(from_account_id, USER_ID)
-    if from_account_details["status"] != "SUCCESS":
-        err_msg = f"Sender account '{from_account_id}' not found or error: {from_account_details.get('message')}"
+    if FUND_TRANSFER_MODE == "guarded":
+        return _execute_fund_transfer_guarded(from_account_id, to_account_id, amount, currency, memo)
+
+    # Fetch both accounts for validation in a single lookup
+    accounts = _get_accounts_batch(USER_ID, account_ids=[from_account_id, to_account_id])
+    if accounts["status"] != "SUCCESS":
+        err_msg = f"Could not look up the transfer accounts: {accounts.get('message', 'Error fetching account details.')}"
+        log_bq_interaction(func_name, params, status=accounts["status"], error_message=err_msg)
+        return {"status": accounts["status"], "message": err_msg}
+
+    from_account_details = accounts["by_id"].get(from_account_id)
+    if not from_account_details:
+        err_msg = f"Sender account '{from_account_id}' not found or error: Account ID '{from_account_id}' not found for user '{USER_ID}'."
         log_bq_interaction(func_name, params, status="ERROR_FROM_ACCOUNT_INVALID", error_message=err_msg)
         return {"status": "ERROR_FROM_ACCOUNT_INVALID", "message": err_msg}
 
-    to_account_details = _get_account_balance_by_id(to_account_id, USER_ID)
-    if to_account_details["status"] != "SUCCESS":
-        err_msg = f"Recipient account '{to_account_id}' not found or error: {to_account_details.get('message')}"
+    to_account_details = accounts["by_id"].get(to_account_id)
+    if not to_account_details:
+        err_msg = f"Recipient account '{to_account_id}' not found or error: Account ID '{to_account_id}' not found for user '{USER_ID}'."
         log_bq_interaction(func_name, params, status="ERROR_TO_ACCOUNT_INVALID", error_message=err_msg)
         return {"status": "ERROR_TO_ACCOUNT_INVALID", "message": err_msg}
 
@@ -376,73 +510,61 @@ def execute_fund_transfer(from_account_id: str, to_account_id: str, amount: floa
         }
 
     transaction_base_id = f"txn_{uuid.uuid4().hex}"
-    debit_transaction_id = f"{transaction_base_id}_D"
-    credit_transaction_id = f"{transaction_base_id}_C"
     current_timestamp_str = datetime.datetime.now(datetime.timezone.utc).isoformat()
 
-    accounts_table = _table_ref("Accounts")
-    transactions_table = _table_ref("Transactions")
-
-    # Multi-statement transaction
-    # Note: Parameterization within a single multi-statement string sent to client.query()
-    # can be tricky. For complex cases, consider stored procedures or multiple client.query calls
-    # managed by application logic if BEGIN/COMMIT isn't directly parameterizable as one string.
-    # However, for this structure, we'll build the DML string.
-    # Ensure values are properly escaped or use query parameters if supported by the client library for multi-statement.
-    # For direct DML string construction, ensure numeric types are not quoted, strings are.
-    # BigQuery's standard SQL client.query() with @params should handle this.
-
-    query_str = f"""
-    BEGIN TRANSACTION;
-
-    -- Decrement sender's balance
-    UPDATE {accounts_table}
-    SET balance = balance - @amount
-    WHERE account_id = @from_account_id AND user_id = @user_id;
+    try:
+        logger.info(f"[{func_name}] Executing fund transfer transaction for user {USER_ID} from {from_account_id} to {to_account_id} for {amount} {currency}.")
+        repository.transfer_funds(USER_ID, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, current_timestamp_str)
+        query_str = repository.last_query
 
-    -- Increment recipient's balance
-    UPDATE {accounts_table}
-    SET balance = balance + @amount
-    WHERE account_id = @to_account_id AND user_id = @user_id;
+        # Write-through: keep cached balances in step with the committed transfer
+        ACCOUNT_CACHE.apply_balance_delta(USER_ID, from_account_id, -amount)
+        ACCOUNT_CACHE.apply_balance_delta(USER_ID, to_account_id, amount)
 
-    -- Insert debit transaction for sender
-    INSERT INTO {transactions_table} (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
-    VALUES (@debit_transaction_id, @from_account_id, @user_id, @timestamp, @debit_description, -@amount, @currency, 'transfer_debit', @memo);
+        success_msg = f"Fund transfer of {amount} {currency} from {from_account_id} to {to_account_id} completed successfully. Transaction ID: {transaction_base_id}"
+        log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=success_msg)
+        return {
+            "status": "SUCCESS",
+            "transaction_id": transaction_base_id,
+            "message": success_msg
+        }
+    except StatementFailed as e:
+        ACCOUNT_CACHE.invalidate(USER_ID)
+        error_detail = f"BigQuery transaction failed: {e.errors}"
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_TRANSACTION_FAILED", error_message=error_detail)
+        return {"status": "ERROR_TRANSACTION_FAILED", "message": "Fund transfer failed during BigQuery execution.", "details": e.errors}
+    except Exception as e:
+        error_message = f"Exception during fund transfer: {str(e)}"
+        logger.error(f"[{func_name}] {error_message}", exc_info=True)
+        ACCOUNT_CACHE.invalidate(USER_ID) # Outcome unknown, reload balances on next read
+        # The repository has already rolled back the transaction
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_EXCEPTION", error_message=error_message)
+        return {"status": "ERROR_EXCEPTION", "message": "An internal error occurred during fund transfer.", "details": str(e)}
 
-    -- Insert credit transaction for recipient
-    INSERT INTO {transactions_table} (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
-    VALUES (@credit_transaction_id, @to_account_id, @user_id, @timestamp, @credit_description, @amount, @currency, 'transfer_credit', @memo);
 
-    COMMIT TRANSACTION;
+def _execute_fund_transfer_guarded(from_account_id: str, to_account_id: str, amount: float, currency: str, memo: str) -> dict:
     """
+    Executes a fund transfer as a single BigQuery script without separate validation reads.
+    Ownership, currency and balance checks run inside the script and abort it with a
+    GUARD_VIOLATION error that is mapped back to the statuses of the validated path.
+    The debit is additionally guarded on the balance so a concurrent withdrawal cannot overdraw.
+    """
+    func_name = "execute_fund_transfer"
+    params = {"from_account_id": from_account_id, "to_account_id": to_account_id, "amount": amount, "currency": currency, "memo": memo, "user_id": USER_ID, "mode": "guarded"}
 
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("amount", "FLOAT64", amount),
-            bigquery.ScalarQueryParameter("from_account_id", "STRING", from_account_id),
-            bigquery.ScalarQueryParameter("to_account_id", "STRING", to_account_id),
-            bigquery.ScalarQueryParameter("user_id", "STRING", USER_ID),
-            bigquery.ScalarQueryParameter("debit_transaction_id", "STRING", debit_transaction_id),
-            bigquery.ScalarQueryParameter("credit_transaction_id", "STRING", credit_transaction_id),
-            bigquery.ScalarQueryParameter("timestamp", "TIMESTAMP", current_timestamp_str),
-            bigquery.ScalarQueryParameter("debit_description", "STRING", f"Transfer to account {to_account_id}"),
-            bigquery.ScalarQueryParameter("credit_description", "STRING", f"Transfer from account {from_account_id}"),
-            bigquery.ScalarQueryParameter("currency", "STRING", currency),
-            bigquery.ScalarQueryParameter("memo", "STRING", memo),
-        ]
-    )
+    transaction_base_id = f"txn_{uuid.uuid4().hex}"
+    current_timestamp_str = datetime.datetime.now(datetime.timezone.utc).isoformat()
 
     try:
-        logger.info(f"[{func_name}] Executing fund transfer transaction for user {USER_ID} from {from_account_id} to {to_account_id} for {amount} {currency}.")
-        query_job = client.query(query_str, job_config=job_config)
-        query_job.result()  # Wait for the transaction to complete
+        logger.info(f"[{func_name}] Executing guarded fund transfer script for user {USER_ID} from {from_account_id} to {to_account_id} for {amount} {currency}.")
+        balances = repository.transfer_funds_guarded(USER_ID, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, current_timestamp_str)
+        query_str = repository.last_query
 
-        if query_job.errors:
-            # This block might not be reached if errors cause an exception handled by the except block.
-            # However, it's good practice to check job.errors if result() doesn't raise.
-            error_detail = f"BigQuery transaction failed: {query_job.errors}"
-            log_bq_interaction(func_name, params, query_str, status="ERROR_TRANSACTION_FAILED", error_message=error_detail)
-            return {"status": "ERROR_TRANSACTION_FAILED", "message": "Fund transfer failed during BigQuery execution.", "details": query_job.errors}
+        if balances is not None:
+            ACCOUNT_CACHE.put_account(USER_ID, {"account_id": from_account_id, "account_type": balances["from_account_type"], "balance": balances["from_balance"], "currency": currency})
+            ACCOUNT_CACHE.put_account(USER_ID, {"account_id": to_account_id, "account_type": balances["to_account_type"], "balance": balances["to_balance"], "currency": currency})
+        else:
+            ACCOUNT_CACHE.invalidate(USER_ID)
 
         success_msg = f"Fund transfer of {amount} {currency} from {from_account_id} to {to_account_id} completed successfully. Transaction ID: {transaction_base_id}"
         log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=success_msg)
@@ -451,17 +573,50 @@ def execute_fund_transfer(from_account_id: str, to_account_id: str, amount: floa
             "transaction_id": transaction_base_id,
             "message": success_msg
         }
+    except GuardViolation as violation:
+        # The script rejected the transfer before anything was committed
+        status, detail = violation.status, violation.detail
+        if status == "ERROR_FROM_ACCOUNT_INVALID":
+            err_msg = f"Sender account '{from_account_id}' not found or error: Account ID '{from_account_id}' not found for user '{USER_ID}'."
+            response = {"status": status, "message": err_msg}
+        elif status == "ERROR_TO_ACCOUNT_INVALID":
+            err_msg = f"Recipient account '{to_account_id}' not found or error: Account ID '{to_account_id}' not found for user '{USER_ID}'."
+            response = {"status": status, "message": err_msg}
+        elif status == "ERROR_CURRENCY_MISMATCH":
+            from_currency, _, to_currency = (detail or "").partition("/")
+            err_msg = (f"Currency mismatch. Transfer currency: {currency}, "
+                       f"Sender account ({from_account_id}) currency: {from_currency or 'unknown'}, "
+                       f"Recipient account ({to_account_id}) currency: {to_currency or 'unknown'}.")
+            response = {"status": status, "message": err_msg}
+        elif status == "ERROR_INSUFFICIENT_FUNDS":
+            # Balance is only known when the pre-check (not the guarded UPDATE) fired
+            try:
+                current_balance = float(detail) if detail else None
+            except ValueError:
+                current_balance = None
+            ACCOUNT_CACHE.invalidate(USER_ID, from_account_id)
+            err_msg = f"Insufficient funds in sender account '{from_account_id}'. Has: {current_balance if current_balance is not None else 'less than requested'} {currency}, Needs: {amount} {currency}"
+            response = {
+                "status": status, "current_balance": current_balance,
+                "requested_amount": amount, "currency": currency,
+                "from_account_id": from_account_id, "to_account_id": to_account_id, "message": err_msg
+            }
+        else:
+            err_msg = f"Fund transfer rejected: {status}"
+            response = {"status": status, "message": err_msg}
+
+        log_bq_interaction(func_name, params, repository.last_query, status=status, error_message=err_msg)
+        return response
+    except StatementFailed as e:
+        ACCOUNT_CACHE.invalidate(USER_ID)
+        error_detail = f"BigQuery transaction failed: {e.errors}"
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_TRANSACTION_FAILED", error_message=error_detail)
+        return {"status": "ERROR_TRANSACTION_FAILED", "message": "Fund transfer failed during BigQuery execution.", "details": e.errors}
     except Exception as e:
         error_message = f"Exception during fund transfer: {str(e)}"
         logger.error(f"[{func_name}] {error_message}", exc_info=True)
-        # Attempt to rollback if possible, though BigQuery auto-rolls back on error in a transaction
-        try:
-            client.query("ROLLBACK TRANSACTION;").result() # May error if no transaction active
-            logger.info(f"[{func_name}] Attempted ROLLBACK TRANSACTION due to error.")
-        except Exception as rb_e:
-            logger.warning(f"[{func_name}] Error during explicit ROLLBACK attempt: {rb_e}")
-
-        log_bq_interaction(func_name, params, query_str, status="ERROR_EXCEPTION", error_message=error_message)
+        ACCOUNT_CACHE.invalidate(USER_ID) # Outcome unknown, reload balances on next read
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_EXCEPTION", error_message=error_message)
         return {"status": "ERROR_EXCEPTION", "message": "An internal error occurred during fund transfer.", "details": str(e)}
 
 
@@ -473,65 +628,43 @@ def get_bill_details(bill_type: str, payee_nickname: str = None) -> dict:
     params = {"bill_type": bill_type, "payee_nickname": payee_nickname, "user_id": USER_ID}
     query_str = None
 
-    if not client:
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}
 
-    billers_table = _table_ref("RegisteredBillers")
-    query_params_list = [
-        bigquery.ScalarQueryParameter("user_id", "STRING", USER_ID),
-        bigquery.ScalarQueryParameter("bill_type", "STRING", bill_type),
-    ]
-    
-    where_conditions = ["user_id = @user_id", "bill_type = @bill_type"]
-    
-    if payee_nickname:
-        where_conditions.append("payee_nickname = @payee_nickname")
-        query_params_list.append(bigquery.ScalarQueryParameter("payee_nickname", "STRING", payee_nickname))
-        
-    query_str = f"""
-        SELECT biller_id, biller_name, last_due_amount as due_amount, last_due_date as due_date, default_payment_account_id
-        FROM {billers_table}
-        WHERE {" AND ".join(where_conditions)}
-    """
-    job_config = bigquery.QueryJobConfig(query_parameters=query_params_list)
-    
     try:
-        query_job = client.query(query_str, job_config=job_config)
-        results = list(query_job.result())
-        
+        results = repository.find_billers(USER_ID, bill_type, payee_nickname)
+        query_str = repository.last_query
+
+        def _biller_summary(row: dict) -> dict:
+            return {
+                "biller_id": row["biller_id"], "biller_name": row["biller_name"],
+                "due_amount": float(row["due_amount"]) if row["due_amount"] is not None else None,
+                "due_date": row["due_date"].isoformat() if isinstance(row["due_date"], (datetime.datetime, datetime.date)) else str(row["due_date"]),
+                "default_payment_account_id": row["default_payment_account_id"]
+            }
+
         if not results:
             msg = f"Biller for type '{bill_type}'" + (f" with nickname '{payee_nickname}'" if payee_nickname else "") + f" not found for user '{USER_ID}'."
             log_bq_interaction(func_name, params, query_str, status="ERROR_BILLER_NOT_FOUND", error_message=msg)
             return {"status": "ERROR_BILLER_NOT_FOUND", "message": msg}
             
         if len(results) > 1:
-            biller_names = [row.biller_name for row in results]
-            billers_summary = [{"biller_id": r.biller_id, "biller_name": r.biller_name} for r in results]
+            biller_names = [row["biller_name"] for row in results]
             msg = f"Multiple billers found for type '{bill_type}'" + (f" with nickname '{payee_nickname}'" if payee_nickname else "") + f". Please specify. Found: {', '.join(biller_names)} for user '{USER_ID}'."
             log_bq_interaction(func_name, params, query_str, status="AMBIGUOUS_BILLER_FOUND", result_summary=f"Found {len(results)} billers.", error_message=msg) # error_message used for detailed user-facing message
             return {
                 "status": "AMBIGUOUS_BILLER_FOUND", "message": msg,
-                "billers": [{
-                    "biller_id": row.biller_id, "biller_name": row.biller_name,
-                    "due_amount": float(row.due_amount) if row.due_amount is not None else None,
-                    "due_date": row.due_date.isoformat() if isinstance(row.due_date, (datetime.datetime, datetime.date)) else str(row.due_date),
-                    "default_payment_account_id": row.default_payment_account_id
-                } for row in results]
+                "billers": [_biller_summary(row) for row in results]
             }
 
         row = results[0]
-        result_data = {
-            "biller_id": row.biller_id, "biller_name": row.biller_name,
-            "due_amount": float(row.due_amount) if row.due_amount is not None else None,
-            "due_date": row.due_date.isoformat() if isinstance(row.due_date, (datetime.datetime, datetime.date)) else str(row.due_date),
-            "default_payment_account_id": row.default_payment_account_id
-        }
-        log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=f"Biller found: {row.biller_id} - {row.biller_name}")
+        result_data = _biller_summary(row)
+        log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=f"Biller found: {row['biller_id']} - {row['biller_name']}")
         return {"status": "SUCCESS", **result_data}
     except Exception as e:
         logger.error(f"Exception details in {func_name}: {str(e)}", exc_info=True) # Added exc_info=True
-        log_bq_interaction(func_name, params, query_str, status="ERROR_QUERY_FAILED", error_message=str(e))
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=str(e))
         return {"status": "ERROR_QUERY_FAILED", "message": str(e)}
 
 
@@ -541,29 +674,13 @@ def _get_payee_name(payee_id: str, user_id: str) -> str | None:
     params = {"payee_id": payee_id, "user_id": user_id}
     query_str = None
 
-    if not client:
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available for _get_payee_name.")
         return None # Function expects str or None
     
-    billers_table = _table_ref("RegisteredBillers")
-    query_str = f"""
-        SELECT biller_name
-        FROM {billers_table}
-        WHERE biller_id = @payee_id AND user_id = @user_id
-        LIMIT 1
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("payee_id", "STRING", payee_id),
-            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-        ]
-    )
     try:
-        query_job = client.query(query_str, job_config=job_config)
-        payee_name_found = None
-        for row in query_job.result():
-            payee_name_found = row.biller_name
-            break
+        payee_name_found = repository.get_biller_name(user_id, payee_id)
+        query_str = repository.last_query
         
         if payee_name_found:
             log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=f"Biller name found: {payee_name_found}")
@@ -574,7 +691,7 @@ def _get_payee_name(payee_id: str, user_id: str) -> str | None:
             return None
     except Exception as e:
         logger.error(f"Exception details in {func_name}: {str(e)}", exc_info=True) # Added exc_info=True
-        log_bq_interaction(func_name, params, query_str, status="ERROR_QUERY_FAILED", error_message=str(e))
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=str(e))
         return None
 
 
@@ -584,29 +701,22 @@ def _get_account_balance_by_id(account_id: str, user_id: str) -> dict:
     params = {"account_id": account_id, "user_id": user_id}
     query_str = None
 
-    if not client:
+    cached = ACCOUNT_CACHE.get_account(user_id, account_id)
+    if cached:
+        log_bq_interaction(func_name, params, status="SUCCESS", result_summary=f"Balance found in cache for account {account_id}.")
+        return {"status": "SUCCESS", "balance": cached["balance"], "currency": cached["currency"]}
+
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}
 
-    accounts_table = _table_ref("Accounts")
-    query_str = f"""
-        SELECT balance, currency
-        FROM {accounts_table}
-        WHERE account_id = @account_id AND user_id = @user_id
-        LIMIT 1
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("account_id", "STRING", account_id),
-            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-        ]
-    )
     try:
-        query_job = client.query(query_str, job_config=job_config)
+        account = repository.get_account_by_id(user_id, account_id)
+        query_str = repository.last_query
         row_data = None
-        for row in query_job.result():
-            row_data = {"balance": float(row.balance), "currency": row.currency}
-            break
+        if account:
+            row_data = {"balance": account["balance"], "currency": account["currency"]}
+            ACCOUNT_CACHE.put_account(user_id, account)
         
         if row_data:
             log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=f"Balance found for account {account_id}.")
@@ -617,7 +727,7 @@ def _get_account_balance_by_id(account_id: str, user_id: str) -> dict:
             return {"status": "ERROR_ACCOUNT_NOT_FOUND", "message": msg}
     except Exception as e:
         logger.error(f"Exception details in {func_name}: {str(e)}", exc_info=True) # Added exc_info=True
-        log_bq_interaction(func_name, params, query_str, status="ERROR_QUERY_FAILED", error_message=str(e))
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=str(e))
         return {"status": "ERROR_QUERY_FAILED", "message": str(e)}
 
 
@@ -631,13 +741,16 @@ def pay_bill(payee_id: str, amount: float, from_account_id: str, user_id: str =
         amount: The amount to pay.
         from_account_id: The account ID from which to deduct the payment.
         user_id: The ID of the user making the payment. Defaults to the global USER_ID.
+
+    With BILL_PAYMENT_MODE="guarded" (default) the whole payment runs as one scripted job,
+    see _pay_bill_guarded.
     """
     func_name = "pay_bill"
     user_id = user_id or USER_ID
     params = {"payee_id": payee_id, "amount": amount, "from_account_id": from_account_id, "user_id": user_id}
     query_str = None
 
-    if not client:
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}
 
@@ -645,6 +758,9 @@ def pay_bill(payee_id: str, amount: float, from_account_id: str, user_id: str =
         log_bq_interaction(func_name, params, status="ERROR_INVALID_AMOUNT", error_message="Payment amount must be a positive number.")
         return {"status": "ERROR_INVALID_AMOUNT", "message": "Payment amount must be a positive number."}
 
+    if BILL_PAYMENT_MODE == "guarded":
+        return _pay_bill_guarded(payee_id, amount, from_account_id, user_id)
+
     # Validate source account and check balance
     balance_details = _get_account_balance_by_id(from_account_id, user_id)
     if balance_details["status"] != "SUCCESS":
@@ -676,57 +792,72 @@ def pay_bill(payee_id: str, amount: float, from_account_id: str, user_id: str =
     current_timestamp_iso = current_timestamp.isoformat()
     bill_txn_id = f"txn_bill_{uuid.uuid4().hex}"
 
-    accounts_table = _table_ref("Accounts")
-    transactions_table = _table_ref("Transactions")
-    registered_billers_table = _table_ref("RegisteredBillers")
-
-    query_str = f"""
-    BEGIN TRANSACTION;
+    try:
+        logger.info(f"[{func_name}] Executing bill payment transaction for user {user_id}, payee {payee_id}, amount {amount} {currency} from account {from_account_id}.")
+        repository.pay_bill(user_id, payee_id, from_account_id, amount, currency,
+                            description=f"Bill Payment to {payee_name} (Biller ID: {payee_id})",
+                            memo=f"Payment for bill {payee_id}",
+                            transaction_id=bill_txn_id, timestamp=current_timestamp_iso)
+        query_str = repository.last_query
 
-    -- Deduct amount from source account
-    UPDATE {accounts_table}
-    SET balance = balance - @amount
-    WHERE account_id = @from_account_id AND user_id = @user_id;
+        ACCOUNT_CACHE.apply_balance_delta(user_id, from_account_id, -amount) # Write-through
 
-    -- Record the bill payment transaction
-    INSERT INTO {transactions_table}
-        (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
-    VALUES
-        (@bill_txn_id, @from_account_id, @user_id, @timestamp, @description, -@amount, @currency, 'bill_payment', @memo);
+        success_msg = f"Bill payment of {amount} {currency} to {payee_name} (Biller ID: {payee_id}) from account {from_account_id} was successful. Confirmation: {confirmation_number}."
+        log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=success_msg)
+        return {
+            "status": "SUCCESS",
+            "confirmation_number": confirmation_number,
+            "transaction_id": bill_txn_id,
+            "biller_name": payee_name, # payee_name variable holds the biller_name
+            "amount_paid": float(amount),
+            "currency": currency,
+            "from_account_id": from_account_id,
+            "message": success_msg
+        }
+    except StatementFailed as e:
+        ACCOUNT_CACHE.invalidate(user_id)
+        error_detail = f"BigQuery transaction for bill payment failed: {e.errors}"
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_TRANSACTION_FAILED", error_message=error_detail)
+        return {"status": "ERROR_TRANSACTION_FAILED", "message": "Bill payment failed during BigQuery execution.", "details": e.errors}
+    except Exception as e:
+        error_message = f"Exception during bill payment transaction: {str(e)}"
+        logger.error(f"[{func_name}] {error_message}", exc_info=True)
+        ACCOUNT_CACHE.invalidate(user_id) # Outcome unknown, reload balances on next read
+        # The transaction is rolled back on error by the storage backend
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_EXCEPTION", error_message=error_message)
+        return {"status": "ERROR_EXCEPTION", "message": "An internal error occurred during bill payment.", "details": str(e)}
 
-    -- Update the bill's last_due_amount to 0 and set last_due_date to today's date
-    UPDATE {registered_billers_table}
-    SET last_due_amount = 0,
-        last_due_date = DATE(@timestamp)
-    WHERE biller_id = @payee_id AND user_id = @user_id;
 
-    COMMIT TRANSACTION;
+def _pay_bill_guarded(payee_id: str, amount: float, from_account_id: str, user_id: str) -> dict:
     """
+    Pays a bill in a single BigQuery script: account and balance validation, biller name lookup,
+    debit, transaction insert and due reset all run in one job, and the final SELECT returns
+    the data needed for the confirmation. Validation failures abort the script with a
+    GUARD_VIOLATION error that is mapped back to the statuses of the validated path.
+    """
+    func_name = "pay_bill"
+    params = {"payee_id": payee_id, "amount": amount, "from_account_id": from_account_id, "user_id": user_id, "mode": "guarded"}
 
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("amount", "FLOAT64", amount),
-            bigquery.ScalarQueryParameter("from_account_id", "STRING", from_account_id),
-            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-            bigquery.ScalarQueryParameter("bill_txn_id", "STRING", bill_txn_id),
-            bigquery.ScalarQueryParameter("timestamp", "TIMESTAMP", current_timestamp_iso),
-            bigquery.ScalarQueryParameter("description", "STRING", f"Bill Payment to {payee_name} (Biller ID: {payee_id})"),
-            bigquery.ScalarQueryParameter("currency", "STRING", currency),
-            bigquery.ScalarQueryParameter("memo", "STRING", f"Payment for bill {payee_id}"),
-            bigquery.ScalarQueryParameter("confirmation_number", "STRING", confirmation_number),
-            bigquery.ScalarQueryParameter("payee_id", "STRING", payee_id), # This @payee_id maps to biller_id in the WHERE clause
-        ]
-    )
+    confirmation_number = f"BP{uuid.uuid4().hex[:10].upper()}"
+    current_timestamp_iso = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    bill_txn_id = f"txn_bill_{uuid.uuid4().hex}"
 
     try:
-        logger.info(f"[{func_name}] Executing bill payment transaction for user {user_id}, payee {payee_id}, amount {amount} {currency} from account {from_account_id}.")
-        query_job = client.query(query_str, job_config=job_config)
-        query_job.result()  # Wait for the transaction to complete
-
-        if query_job.errors:
-            error_detail = f"BigQuery transaction for bill payment failed: {query_job.errors}"
+        logger.info(f"[{func_name}] Executing guarded bill payment script for user {user_id}, payee {payee_id}, amount {amount} from account {from_account_id}.")
+        confirmation = repository.pay_bill_guarded(user_id, payee_id, from_account_id, amount,
+                                                   memo=f"Payment for bill {payee_id}",
+                                                   transaction_id=bill_txn_id, timestamp=current_timestamp_iso)
+        query_str = repository.last_query
+
+        if confirmation is None:
+            ACCOUNT_CACHE.invalidate(user_id)
+            error_detail = "BigQuery transaction for bill payment failed: no confirmation row returned."
             log_bq_interaction(func_name, params, query_str, status="ERROR_TRANSACTION_FAILED", error_message=error_detail)
-            return {"status": "ERROR_TRANSACTION_FAILED", "message": "Bill payment failed during BigQuery execution.", "details": query_job.errors}
+            return {"status": "ERROR_TRANSACTION_FAILED", "message": "Bill payment failed during BigQuery execution.", "details": None}
+
+        payee_name = confirmation["biller_name"]
+        currency = confirmation["currency"]
+        ACCOUNT_CACHE.put_account(user_id, {"account_id": from_account_id, "account_type": confirmation["account_type"], "balance": confirmation["balance_after"], "currency": currency})
 
         success_msg = f"Bill payment of {amount} {currency} to {payee_name} (Biller ID: {payee_id}) from account {from_account_id} was successful. Confirmation: {confirmation_number}."
         log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=success_msg)
@@ -734,19 +865,54 @@ def pay_bill(payee_id: str, amount: float, from_account_id: str, user_id: str =
             "status": "SUCCESS",
             "confirmation_number": confirmation_number,
             "transaction_id": bill_txn_id,
-            "biller_name": payee_name, # payee_name variable holds the biller_name
+            "biller_name": payee_name,
             "amount_paid": float(amount),
             "currency": currency,
             "from_account_id": from_account_id,
             "message": success_msg
         }
+    except GuardViolation as violation:
+        # The script rejected the payment before anything was committed
+        status, detail = violation.status, violation.detail
+        if status == "ERROR_ACCOUNT_NOT_FOUND":
+            err_msg = f"Error with payment account '{from_account_id}': Account ID '{from_account_id}' not found for user '{user_id}'."
+            response = {"status": status, "message": err_msg}
+        elif status == "INSUFFICIENT_FUNDS":
+            # Balance is only known when the pre-check (not the guarded UPDATE) fired
+            balance_str, _, currency = (detail or "").partition("/")
+            try:
+                current_balance = float(balance_str) if balance_str else None
+            except ValueError:
+                current_balance = None
+            ACCOUNT_CACHE.invalidate(user_id, from_account_id)
+            err_msg = f"Insufficient funds in account {from_account_id}. Has: {current_balance if current_balance is not None else 'less than requested'} {currency}, Needs: {amount} {currency}"
+            response = {
+                "status": status, "current_balance": current_balance,
+                "requested_amount": amount, "currency": currency or None,
+                "from_account_id": from_account_id, "payee_id": payee_id, "message": err_msg
+            }
+        elif status == "ERROR_BILLER_NOT_FOUND":
+            err_msg = f"Biller with ID '{payee_id}' not found for user '{user_id}'."
+            response = {"status": status, "message": err_msg}
+        else:
+            err_msg = f"Bill payment rejected: {status}"
+            response = {"status": status, "message": err_msg}
+
+        log_bq_interaction(func_name, params, repository.last_query, status=status, error_message=err_msg)
+        return response
+    except StatementFailed as e:
+        ACCOUNT_CACHE.invalidate(user_id)
+        error_detail = f"BigQuery transaction for bill payment failed: {e.errors}"
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_TRANSACTION_FAILED", error_message=error_detail)
+        return {"status": "ERROR_TRANSACTION_FAILED", "message": "Bill payment failed during BigQuery execution.", "details": e.errors}
     except Exception as e:
         error_message = f"Exception during bill payment transaction: {str(e)}"
         logger.error(f"[{func_name}] {error_message}", exc_info=True)
-        # BigQuery automatically rolls back transactions on error for multi-statement queries
-        log_bq_interaction(func_name, params, query_str, status="ERROR_EXCEPTION", error_message=error_message)
+        ACCOUNT_CACHE.invalidate(user_id) # Outcome unknown, reload balances on next read
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_EXCEPTION", error_message=error_message)
         return {"status": "ERROR_EXCEPTION", "message": "An internal error occurred during bill payment.", "details": str(e)}
 
+
 def register_biller(user_id: str, biller_name: str, biller_type: str, account_number: str, payee_nickname: str = None, default_payment_account_id: str = None, due_amount: float = None, due_date: str = None) -> dict:
     """
     Registers a new biller for a given user in the RegisteredBillers table.
@@ -762,7 +928,7 @@ def register_biller(user_id: str, biller_name: str, biller_type: str, account_nu
     query_str_check = None
     query_str_insert = None
 
-    if not client:
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}
 
@@ -770,35 +936,17 @@ def register_biller(user_id: str, biller_name: str, biller_type: str, account_nu
         log_bq_interaction(func_name, params, status="ERROR_MISSING_PARAMETERS", error_message="User ID, Biller Name, Biller Type, and Account Number are required.")
         return {"status": "ERROR_MISSING_PARAMETERS", "message": "User ID, Biller Name, Biller Type, and Account Number are required."}
 
-    billers_table = _table_ref("RegisteredBillers")
-    
     # Check for existing active biller
-    query_str_check = f"""
-        SELECT biller_id FROM {billers_table}
-        WHERE user_id = @user_id
-          AND biller_type = @biller_type
-          AND account_number = @account_number
-          AND status = 'ACTIVE'
-        LIMIT 1
-    """
-    job_config_check = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-            bigquery.ScalarQueryParameter("biller_type", "STRING", biller_type),
-            bigquery.ScalarQueryParameter("account_number", "STRING", account_number),
-        ]
-    )
     try:
-        query_job_check = client.query(query_str_check, job_config=job_config_check)
-        results_check = list(query_job_check.result())
-        if results_check:
-            existing_biller_id = results_check[0].biller_id
+        existing_biller_id = repository.find_active_biller(user_id, biller_type, account_number)
+        query_str_check = repository.last_query
+        if existing_biller_id:
             error_message = f"An active biller with the same type and account number already exists for this user (Biller ID: {existing_biller_id})."
             log_bq_interaction(func_name, params, query_str_check, status="ERROR_DUPLICATE_BILLER", error_message=error_message)
             return {"status": "ERROR_DUPLICATE_BILLER", "message": error_message, "biller_id": existing_biller_id}
     except Exception as e_check:
         logger.error(f"Exception during biller check in {func_name}: {str(e_check)}", exc_info=True)
-        log_bq_interaction(func_name, params, query_str_check, status="ERROR_QUERY_FAILED", error_message=f"Biller check failed: {str(e_check)}")
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=f"Biller check failed: {str(e_check)}")
         return {"status": "ERROR_QUERY_FAILED", "message": f"Failed to check for existing biller: {str(e_check)}"}
 
     biller_id_generated = f"biller_reg_{uuid.uuid4().hex}"
@@ -813,46 +961,27 @@ def register_biller(user_id: str, biller_name: str, biller_type: str, account_nu
             log_bq_interaction(func_name, params, status="ERROR_INVALID_DATE_FORMAT", error_message="Invalid due_date format. Please use YYYY-MM-DD.")
             return {"status": "ERROR_INVALID_DATE_FORMAT", "message": "Invalid due_date format. Please use YYYY-MM-DD."}
 
-    query_str_insert = f"""
-        INSERT INTO {billers_table} (
-            biller_id, user_id, biller_name, biller_type, account_number,
-            payee_nickname, default_payment_account_id, status,
-            due_amount, due_date, registration_ts, last_updated_ts
-        ) VALUES (
-            @biller_id, @user_id, @biller_name, @biller_type, @account_number,
-            @payee_nickname, @default_payment_account_id, 'ACTIVE',
-            @due_amount, @due_date, @current_ts, @current_ts
-        )
-    """
-    job_config_insert = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("biller_id", "STRING", biller_id_generated),
-            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-            bigquery.ScalarQueryParameter("biller_name", "STRING", biller_name),
-            bigquery.ScalarQueryParameter("biller_type", "STRING", biller_type),
-            bigquery.ScalarQueryParameter("account_number", "STRING", account_number),
-            bigquery.ScalarQueryParameter("payee_nickname", "STRING", payee_nickname),
-            bigquery.ScalarQueryParameter("default_payment_account_id", "STRING", default_payment_account_id),
-            bigquery.ScalarQueryParameter("due_amount", "FLOAT64", due_amount),
-            bigquery.ScalarQueryParameter("due_date", "DATE", parsed_due_date),
-            bigquery.ScalarQueryParameter("current_ts", "TIMESTAMP", current_ts),
-        ]
-    )
     try:
-        query_job_insert = client.query(query_str_insert, job_config=job_config_insert)
-        query_job_insert.result()  # Wait for completion
-
-        if query_job_insert.errors:
-            error_detail = f"BigQuery insert failed: {query_job_insert.errors}"
-            log_bq_interaction(func_name, params, query_str_insert, status="ERROR_INSERT_FAILED", error_message=error_detail)
-            return {"status": "ERROR_INSERT_FAILED", "message": "Biller registration failed during BigQuery execution.", "details": query_job_insert.errors}
+        repository.insert_biller({
+            "biller_id": biller_id_generated, "user_id": user_id, "biller_name": biller_name,
+            "biller_type": biller_type, "account_number": account_number, "payee_nickname": payee_nickname,
+            "default_payment_account_id": default_payment_account_id,
+            "due_amount": due_amount, "due_date": parsed_due_date, "timestamp": current_ts
+        })
+        query_str_insert = repository.last_query
+        BILLER_INDEX.invalidate(user_id)
 
         success_msg = f"Biller '{biller_name}' registered successfully with ID {biller_id_generated}."
         log_bq_interaction(func_name, params, query_str_insert, status="SUCCESS", result_summary=success_msg)
         return {"status": "SUCCESS", "message": success_msg, "biller_id": biller_id_generated}
+    except StatementFailed as e_insert:
+        error_detail = f"BigQuery insert failed: {e_insert.errors}"
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_INSERT_FAILED", error_message=error_detail)
+        return {"status": "ERROR_INSERT_FAILED", "message": "Biller registration failed during BigQuery execution.", "details": e_insert.errors}
     except Exception as e_insert:
+        BILLER_INDEX.invalidate(user_id) # Outcome unknown, rebuild on next lookup
         logger.error(f"Exception during biller insert in {func_name}: {str(e_insert)}", exc_info=True)
-        log_bq_interaction(func_name, params, query_str_insert, status="ERROR_EXCEPTION", error_message=str(e_insert))
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_EXCEPTION", error_message=str(e_insert))
         return {"status": "ERROR_EXCEPTION", "message": f"An internal error occurred during biller registration: {str(e_insert)}"}
 
 def update_biller_details(user_id: str, payee_id: str, updates: dict) -> dict:
@@ -866,7 +995,7 @@ def update_biller_details(user_id: str, payee_id: str, updates: dict) -> dict:
     params = {"user_id": user_id, "payee_id": payee_id, "updates": updates}
     query_str = None
 
-    if not client:
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}
 
@@ -874,20 +1003,16 @@ def update_biller_details(user_id: str, payee_id: str, updates: dict) -> dict:
         log_bq_interaction(func_name, params, status="ERROR_NO_UPDATES_PROVIDED", error_message="No updates provided.")
         return {"status": "ERROR_NO_UPDATES_PROVIDED", "message": "No updates provided to apply."}
 
-    billers_table = _table_ref("RegisteredBillers")
-    set_clauses = []
-    query_params_list = []
+    valid_updates = {}
     
     allowed_fields = {
-        "biller_name": "STRING", "biller_type": "STRING", "account_number": "STRING",
-        "payee_nickname": "STRING", "default_payment_account_id": "STRING", 
-        "status": "STRING", "due_amount": "FLOAT64", "due_date": "DATE"
+        "biller_name", "biller_type", "account_number",
+        "payee_nickname", "default_payment_account_id", 
+        "status", "due_amount", "due_date"
     }
 
     for field, value in updates.items():
         if field in allowed_fields:
-            set_clauses.append(f"{field} = @{field}")
-            param_type = allowed_fields[field]
             # Handle date parsing for due_date
             if field == "due_date" and value is not None:
                 try:
@@ -896,52 +1021,42 @@ def update_biller_details(user_id: str, payee_id: str, updates: dict) -> dict:
                     log_bq_interaction(func_name, params, status="ERROR_INVALID_DATE_FORMAT", error_message=f"Invalid due_date format for field '{field}'. Use YYYY-MM-DD.")
                     return {"status": "ERROR_INVALID_DATE_FORMAT", "message": f"Invalid due_date format for field '{field}'. Use YYYY-MM-DD."}
             
-            query_params_list.append(bigquery.ScalarQueryParameter(field, param_type, value))
+            valid_updates[field] = value
         else:
             logger.warning(f"[{func_name}] Unknown field '{field}' in updates, skipping.")
 
-    if not set_clauses:
+    if not valid_updates:
         log_bq_interaction(func_name, params, status="ERROR_NO_VALID_UPDATES", error_message="No valid fields to update.")
         return {"status": "ERROR_NO_VALID_UPDATES", "message": "No valid fields provided for update."}
 
-    set_clauses.append("last_updated_ts = @current_ts")
-    query_params_list.append(bigquery.ScalarQueryParameter("current_ts", "TIMESTAMP", datetime.datetime.now(datetime.timezone.utc)))
-    query_params_list.append(bigquery.ScalarQueryParameter("user_id", "STRING", user_id))
-    query_params_list.append(bigquery.ScalarQueryParameter("payee_id", "STRING", payee_id))
-
-    query_str = f"""
-        UPDATE {billers_table}
-        SET {', '.join(set_clauses)}
-        WHERE user_id = @user_id AND biller_id = @payee_id
-    """
-    job_config = bigquery.QueryJobConfig(query_parameters=query_params_list)
-
     try:
-        logger.info(f"[{func_name}] Attempting to update biller {payee_id} for user {user_id} with query: {query_str} and params: {updates}")
-        query_job = client.query(query_str, job_config=job_config)
-        query_job.result()  # Wait for completion
-
-        if query_job.errors:
-            error_detail = f"BigQuery update failed: {query_job.errors}"
-            log_bq_interaction(func_name, params, query_str, status="ERROR_UPDATE_FAILED", error_message=error_detail)
-            return {"status": "ERROR_UPDATE_FAILED", "message": "Biller update failed during BigQuery execution.", "details": query_job.errors}
+        logger.info(f"[{func_name}] Attempting to update biller {payee_id} for user {user_id} with params: {updates}")
+        affected_rows = repository.update_biller(user_id, payee_id, valid_updates, datetime.datetime.now(datetime.timezone.utc))
+        query_str = repository.last_query
         
         # Check if any rows were actually updated
-        if query_job.num_dml_affected_rows is not None and query_job.num_dml_affected_rows > 0:
+        if affected_rows is not None and affected_rows > 0:
+            BILLER_INDEX.invalidate(user_id)
             success_msg = f"Biller '{payee_id}' updated successfully for user '{user_id}'."
             log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=success_msg)
-            return {"status": "SUCCESS", "message": success_msg, "payee_id": payee_id, "updated_rows": query_job.num_dml_affected_rows}
+            return {"status": "SUCCESS", "message": success_msg, "payee_id": payee_id, "updated_rows": affected_rows}
         else:
             # This could mean the biller_id/user_id combination was not found, or values were the same
             not_found_msg = f"Biller '{payee_id}' not found for user '{user_id}', or no changes applied."
             log_bq_interaction(func_name, params, query_str, status="WARNING_NO_ROWS_UPDATED", result_summary=not_found_msg)
             return {"status": "WARNING_NO_ROWS_UPDATED", "message": not_found_msg, "payee_id": payee_id}
 
+    except StatementFailed as e:
+        error_detail = f"BigQuery update failed: {e.errors}"
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_UPDATE_FAILED", error_message=error_detail)
+        return {"status": "ERROR_UPDATE_FAILED", "message": "Biller update failed during BigQuery execution.", "details": e.errors}
     except Exception as e:
+        BILLER_INDEX.invalidate(user_id) # Outcome unknown, rebuild on next lookup
         logger.error(f"Exception during biller update in {func_name}: {str(e)}", exc_info=True)
-        log_bq_interaction(func_name, params, query_str, status="ERROR_EXCEPTION", error_message=str(e))
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_EXCEPTION", error_message=str(e))
         return {"status": "ERROR_EXCEPTION", "message": f"An internal error occurred during biller update: {str(e)}"}
 
+
 def remove_biller(user_id: str, payee_id: str) -> dict:
     """
     Removes a biller for a user by marking its status as 'INACTIVE'.
@@ -972,50 +1087,29 @@ def list_registered_billers(user_id: str) -> dict:
     params = {"user_id": user_id} # Removed status_filter
     query_str = None
 
-    if not client:
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return {"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available.", "billers": []}
 
-    billers_table = _table_ref("RegisteredBillers")
-    # Only user_id is needed for filtering
-    query_params_list = [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
-    
-    # WHERE clause now only filters by user_id
-    where_clauses = ["rb.user_id = @user_id"]
-
-    query_str = f"""
-        SELECT rb.biller_id,
-               rb.biller_name,
-               rb.bill_type AS biller_type,
-               rb.account_number_at_biller AS account_number,
-               rb.biller_nickname AS payee_nickname,
-               rb.default_payment_account_id,
-               rb.last_due_amount AS due_amount,
-               rb.last_due_date AS due_date
-        FROM {billers_table} AS rb
-        WHERE {" AND ".join(where_clauses)}
-        ORDER BY rb.biller_name, rb.biller_nickname
-    """
-    job_config = bigquery.QueryJobConfig(query_parameters=query_params_list)
-    
     try:
-        query_job = client.query(query_str, job_config=job_config)
-        results = list(query_job.result())
+        results = repository.list_billers(user_id)
+        query_str = repository.last_query
         
         billers_data = []
         for row in results:
             billers_data.append({
-                "biller_id": row.biller_id,
-                "biller_name": row.biller_name,
-                "biller_type": row.biller_type, # Aliased from bill_type
-                "account_number": row.account_number, # Aliased from account_number_at_biller
-                "payee_nickname": row.payee_nickname, # Aliased from biller_nickname
-                "default_payment_account_id": row.default_payment_account_id,
-                "due_amount": float(row.due_amount) if row.due_amount is not None else None, # Aliased from last_due_amount
-                "due_date": row.due_date.isoformat() if isinstance(row.due_date, (datetime.date, datetime.datetime)) else str(row.due_date), # Aliased from last_due_date
+                "biller_id": row["biller_id"],
+                "biller_name": row["biller_name"],
+                "biller_type": row["biller_type"], # Aliased from bill_type
+                "account_number": row["account_number"], # Aliased from account_number_at_biller
+                "payee_nickname": row["payee_nickname"], # Aliased from biller_nickname
+                "default_payment_account_id": row["default_payment_account_id"],
+                "due_amount": float(row["due_amount"]) if row["due_amount"] is not None else None, # Aliased from last_due_amount
+                "due_date": row["due_date"].isoformat() if isinstance(row["due_date"], (datetime.date, datetime.datetime)) else str(row["due_date"]), # Aliased from last_due_date
                 # Removed status, registration_ts, last_updated_ts
             })
         
+        BILLER_INDEX.put(user_id, billers_data) # Fresh complete list, reindex names
         if not billers_data:
             msg = f"No billers found for user '{user_id}'." # Updated message
             log_bq_interaction(func_name, params, query_str, status="NO_BILLERS_FOUND", result_summary=msg)
@@ -1025,7 +1119,7 @@ def list_registered_billers(user_id: str) -> dict:
         return {"status": "SUCCESS", "billers": billers_data}
     except Exception as e:
         logger.error(f"Exception in {func_name}: {str(e)}", exc_info=True)
-        log_bq_interaction(func_name, params, query_str, status="ERROR_QUERY_FAILED", error_message=str(e))
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=str(e))
         return {"status": "ERROR_QUERY_FAILED", "message": str(e), "billers": []}
 
 
@@ -1038,45 +1132,32 @@ def get_accounts_for_user(user_id: str) -> list:
     params = {"user_id": user_id}
     query_str = None
 
-    if not client:
+    cached_accounts = ACCOUNT_CACHE.get_accounts(user_id)
+    if cached_accounts:
+        log_bq_interaction(func_name, params, status="SUCCESS", result_summary=f"Retrieved {len(cached_accounts)} account(s) for user {user_id} from cache.")
+        return [{**acc, "account_name": acc["account_type"]} for acc in cached_accounts]
+
+    if not repository:
         log_bq_interaction(func_name, params, status="ERROR_CLIENT_NOT_INITIALIZED", error_message="BigQuery client not available.")
         return [{"status": "ERROR_CLIENT_NOT_INITIALIZED", "message": "BigQuery client not available."}]
 
-    accounts_table = _table_ref("Accounts")
-    query_str = f"""
-        SELECT account_id, account_type, balance, currency, account_nickname
-        FROM {accounts_table}
-        WHERE user_id = @user_id
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
-        ]
-    )
     try:
-        query_job = client.query(query_str, job_config=job_config)
-        results = query_job.result()
-        accounts_data = []
-        for row in results:
-            accounts_data.append({
-                "account_id": row.account_id,
-                "account_name": row.account_type, # Use account_type as the source for 'account_name' field
-                "account_type": row.account_type,
-                "balance": float(row.balance) if row.balance is not None else 0.0,
-                "currency": row.currency,
-                "account_nickname": row.account_nickname
-            })
+        accounts_data = [{**acc, "account_name": acc["account_type"]} # Use account_type as the source for 'account_name' field
+                         for acc in repository.list_accounts(user_id)]
+        query_str = repository.last_query
         
         if not accounts_data:
             log_bq_interaction(func_name, params, query_str, status="NO_ACCOUNTS_FOUND", result_summary=f"No accounts found for user {user_id}.")
             # Return as a list with a status dict, consistent with error returns
             return [{"status": "NO_ACCOUNTS_FOUND", "message": f"No accounts found for user {user_id}."}]
         
+        ACCOUNT_CACHE.put_accounts(user_id, [{k: v for k, v in acc.items() if k != "account_name"} for acc in accounts_data])
+        ACCOUNT_MATCHER.put(user_id, accounts_data)
         log_bq_interaction(func_name, params, query_str, status="SUCCESS", result_summary=f"Retrieved {len(accounts_data)} account(s) for user {user_id}.")
         return accounts_data # Success: return list of account dicts
     except Exception as e:
         logger.error(f"Exception details in {func_name}: {str(e)}", exc_info=True)
-        log_bq_interaction(func_name, params, query_str, status="ERROR_QUERY_FAILED", error_message=str(e))
+        log_bq_interaction(func_name, params, repository.last_query, status="ERROR_QUERY_FAILED", error_message=str(e))
         return [{"status": "ERROR_QUERY_FAILED", "message": str(e)}]
 
 
@@ -1088,80 +1169,34 @@ def find_account_by_natural_language(user_id: str, natural_language_string: str)
     func_name = "find_account_by_natural_language"
     params = {"user_id": user_id, "natural_language_string": natural_language_string}
     
-    user_accounts_result = get_accounts_for_user(user_id)
-
-    if not isinstance(user_accounts_result, list) or not user_accounts_result:
-        log_bq_interaction(func_name, params, status="ERROR_UNEXPECTED_ACCOUNTS_RESPONSE", error_message="Unexpected response from get_accounts_for_user.")
-        return {"status": "ERROR_UNEXPECTED_ACCOUNTS_RESPONSE", "message": "Failed to retrieve user accounts."}
-
-    first_item = user_accounts_result[0]
-    if isinstance(first_item, dict) and "status" in first_item and first_item["status"] != "SUCCESS":
-        # This means get_accounts_for_user returned an error status (e.g., ERROR_CLIENT_NOT_INITIALIZED, NO_ACCOUNTS_FOUND, ERROR_QUERY_FAILED)
-        # NO_ACCOUNTS_FOUND is a valid case where we can't find a match.
-        if first_item["status"] == "NO_ACCOUNTS_FOUND":
-             log_bq_interaction(func_name, params, status="ERROR_ACCOUNT_NOT_FOUND", error_message=f"No accounts exist for user '{user_id}' to match against '{natural_language_string}'.")
-             return {"status": "ERROR_ACCOUNT_NOT_FOUND", "message": f"No accounts exist for user '{user_id}' to perform a match."}
-        
-        log_bq_interaction(func_name, params, status=first_item["status"], error_message=f"Could not retrieve accounts for matching: {first_item.get('message')}")
-        return first_item
-
-    user_accounts = user_accounts_result
-
-    nl_lower = natural_language_string.lower()
-    nl_words = set(nl_lower.split())
-
-    potential_matches = []
-
-    for acc in user_accounts:
-        acc_name_lower = acc.get("account_name", "").lower()
-        acc_type_lower = acc.get("account_type", "").lower()
-        acc_nickname_lower = acc.get("account_nickname", "").lower() # Get account nickname
-        score = 0
-        match_reasons = []
-
-        # Highest priority: Exact match on nickname
-        if acc_nickname_lower and acc_nickname_lower == nl_lower:
-            score += 200 # Very high score for exact nickname match
-            match_reasons.append("exact_nickname_match")
-        # High priority: All NL words in nickname (if nickname exists)
-        elif acc_nickname_lower and nl_words.issubset(set(acc_nickname_lower.split())):
-            score += 150 * len(nl_words)
-            match_reasons.append("all_nl_words_in_nickname")
-
-        if acc_name_lower == nl_lower:
-            score += 100
-            match_reasons.append("exact_name_match")
-
-        if nl_words.issubset(set(acc_name_lower.split())):
-            score += 50 * len(nl_words)
-            match_reasons.append("all_nl_words_in_name")
+    # Names and types rarely change: score against the precomputed matcher when there is one
+    matcher = ACCOUNT_MATCHER.get(user_id)
+    if matcher is None:
+        user_accounts_result = get_accounts_for_user(user_id)
+
+        if not isinstance(user_accounts_result, list) or not user_accounts_result:
+            log_bq_interaction(func_name, params, status="ERROR_UNEXPECTED_ACCOUNTS_RESPONSE", error_message="Unexpected response from get_accounts_for_user.")
+            return {"status": "ERROR_UNEXPECTED_ACCOUNTS_RESPONSE", "message": "Failed to retrieve user accounts."}
+
+        first_item = user_accounts_result[0]
+        if isinstance(first_item, dict) and "status" in first_item and first_item["status"] != "SUCCESS":
+            # This means get_accounts_for_user returned an error status (e.g., ERROR_CLIENT_NOT_INITIALIZED, NO_ACCOUNTS_FOUND, ERROR_QUERY_FAILED)
+            # NO_ACCOUNTS_FOUND is a valid case where we can't find a match.
+            if first_item["status"] == "NO_ACCOUNTS_FOUND":
+                 log_bq_interaction(func_name, params, status="ERROR_ACCOUNT_NOT_FOUND", error_message=f"No accounts exist for user '{user_id}' to match against '{natural_language_string}'.")
+                 return {"status": "ERROR_ACCOUNT_NOT_FOUND", "message": f"No accounts exist for user '{user_id}' to perform a match."}
         
-        # More granular: check individual word matches in name
-        name_words_present = nl_words.intersection(set(acc_name_lower.split()))
-        if name_words_present:
-            score += 15 * len(name_words_present) # Boost for each common word
-            match_reasons.append(f"name_words_match:{','.join(name_words_present)}")
-
-
-        if acc_type_lower in nl_words: # e.g. nl_words = {"my", "savings"}, acc_type_lower = "savings"
-            score += 40 # Higher score for direct type keyword match
-            match_reasons.append("type_keyword_match")
-        elif acc_type_lower in nl_lower: # e.g. nl_lower = "my savings account", acc_type_lower = "savings"
-            score += 30
-            match_reasons.append("type_substring_match")
-        
-        if "primary" in nl_words and ("primary" in acc_name_lower or ("primary" in acc_nickname_lower if acc_nickname_lower else False)):
-            score += 25 # Specific boost for "primary"
-            match_reasons.append("primary_keyword_name_or_nickname_match")
-        
-        if score > 0:
-            potential_matches.append({"account_id": acc["account_id"], "account_name": acc["account_name"], "account_type": acc["account_type"], "account_nickname": acc.get("account_nickname", ""), "score": score, "reasons": match_reasons})
+            log_bq_interaction(func_name, params, status=first_item["status"], error_message=f"Could not retrieve accounts for matching: {first_item.get('message')}")
+            return first_item
+
+        matcher = ACCOUNT_MATCHER.put(user_id, user_accounts_result)
+
+    potential_matches = matcher.score(natural_language_string) # Ranked best first
 
     if not potential_matches:
         log_bq_interaction(func_name, params, status="ERROR_ACCOUNT_NOT_FOUND", error_message=f"No matching account found for '{natural_language_string}'.")
         return {"status": "ERROR_ACCOUNT_NOT_FOUND", "message": f"Could not find an account matching '{natural_language_string}'."}
 
-    potential_matches.sort(key=lambda x: x["score"], reverse=True)
     best_match = potential_matches[0]
 
     # If only one match, or top score is significantly higher
@@ -1190,11 +1225,14 @@ def find_account_by_natural_language(user_id: str, natural_language_string: str)
 
 # Example usage (for testing purposes, can be removed or commented out)
 if __name__ == "__main__":
-    if not client:
+    if not repository:
         logger.error("BigQuery client not initialized. Cannot run examples.") # Use logger
     else:
         # Use logger for example outputs
-        logger.info(f"Using Project ID: {PROJECT_ID}, Dataset ID: {DATASET_ID}")
+        if hasattr(repository, "project_id"): # BigQuery backend
+            logger.info(f"Using Project ID: {repository.project_id}, Dataset ID: {repository.dataset_id}")
+        else:
+            logger.info(f"Using {type(repository).__name__}")
         logger.info(f"Using User ID: {USER_ID}\n")
 
         logger.info("--- Test BigQuery Connection ---")
@@ -0,0 +1,631 @@
+"""
+BigQuery implementation of the BankRepository interface.
+
+Small reads (point lookups, short lists) go through the short-query path:
+`client.query_and_wait` on a client created with JOB_CREATION_OPTIONAL lets BigQuery
+answer them from a single jobs.query call without creating and polling a job. A read
+that does not finish within that call becomes a job, and query_and_wait keeps polling
+that same job; the statement is never re-run. Writes and scripts always run as
+regular jobs.
+"""
+import os
+import re
+import logging
+
+from google.cloud import bigquery
+
+from bank_repository import BankRepository, GuardViolation, StatementFailed
+
+logger = logging.getLogger(__name__)
+
+DATASET_ID = "bank_voice_assistant_dataset" # Assuming the dataset name from bigquery_setup.sql
+
+# Set BQ_SHORT_QUERY_MODE=false to run every read as a regular query job.
+BQ_SHORT_QUERY_MODE = os.getenv("BQ_SHORT_QUERY_MODE", "true").lower() in ("1", "true", "yes")
+
+# Guarded scripts abort with RAISE/ASSERT messages of the form
+# "GUARD_VIOLATION:<STATUS>[:<detail>]", where <STATUS> is one of the statuses
+# the validated code paths return (e.g. ERROR_INSUFFICIENT_FUNDS).
+_GUARD_VIOLATION_PATTERN = re.compile(r"GUARD_VIOLATION:([A-Z_]+)(?::([^\s'\"]*))?")
+
+
+def _parse_guard_violation(error: Exception) -> tuple | None:
+    """Extracts (status, detail) from a guarded script failure, or None for any other error."""
+    match = _GUARD_VIOLATION_PATTERN.search(str(error))
+    if not match:
+        return None
+    return match.group(1), match.group(2)
+
+
+class BigQueryRepository(BankRepository):
+    """Reads and writes the Accounts, Transactions and RegisteredBillers tables in BigQuery."""
+
+    name = "bigquery"
+
+    def __init__(self, client: bigquery.Client, project_id: str, dataset_id: str = DATASET_ID,
+                 short_query_mode: bool = BQ_SHORT_QUERY_MODE):
+        super().__init__()
+        self.client = client
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.short_query_mode = short_query_mode
+
+    @classmethod
+    def from_environment(cls):
+        """Creates the BigQuery client. Returns None if it cannot be initialised."""
+        # Ensure GOOGLE_APPLICATION_CREDENTIALS environment variable is set.
+        # In a deployed environment (e.g., Google Cloud Run/Functions), this is often handled automatically.
+        try:
+            client = bigquery.Client(
+                project="account-pocs",
+                # Lets jobs.query answer short reads without creating a job
+                default_job_creation_mode="JOB_CREATION_OPTIONAL" if BQ_SHORT_QUERY_MODE else None,
+            )
+            if client.project:
+                logger.info(f"\033[92mBigQuery client initialized successfully for project: {client.project}.\033[0m")
+            else: # Should not happen if client init is successful without error
+                logger.warning("BigQuery client initialized, but project ID could not be determined automatically.")
+        except Exception as e:
+            logger.error(f"Failed to initialize BigQuery client: {e}", exc_info=True)
+            return None
+
+        # Use GOOGLE_CLOUD_PROJECT env var if set, otherwise the project resolved by the client
+        project_id = os.getenv("GOOGLE_CLOUD_PROJECT") or client.project
+        if not project_id:
+            logger.warning("GOOGLE_CLOUD_PROJECT environment variable not set and client.project is unavailable. Using placeholder 'your-gcp-project-id'. Table references might be incorrect.")
+            project_id = "your-gcp-project-id" # Fallback placeholder
+        return cls(client, project_id)
+
+    # Helper to construct full table IDs
+    def _table_ref(self, table_name: str) -> str:
+        if self.project_id == "your-gcp-project-id": # Check if using placeholder
+            # This is a less safe fallback if project ID couldn't be determined
+            logger.warning(f"Using fallback table reference for {table_name} as PROJECT_ID is a placeholder.")
+            return f"`{self.dataset_id}.{table_name}`"
+        return f"`{self.project_id}.{self.dataset_id}.{table_name}`"
+
+    def _query(self, query_str: str, query_parameters: list = None) -> bigquery.QueryJob:
+        """Starts a query job for the given SQL; callers wait on .result()."""
+        self._remember_query(query_str)
+        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters or [])
+        return self.client.query(query_str, job_config=job_config)
+
+    def _read(self, query_str: str, query_parameters: list = None) -> list:
+        """Runs a small read query and returns all of its rows, preferring the short-query path."""
+        if self.short_query_mode:
+            self._remember_query(query_str)
+            job_config = bigquery.QueryJobConfig(query_parameters=query_parameters or [])
+            with self._timed("short_query"):
+                # No wait_timeout: it would cancel a slow read; without it the read's own job is polled to completion
+                rows = self.client.query_and_wait(query_str, job_config=job_config)
+                result = list(rows)
+            if rows.job_id is not None:
+                # jobs.query did not answer in time and the read fell back to a job
+                self._thread_state.query_mode = "job"
+            return result
+        with self._timed("job"):
+            return list(self._query(query_str, query_parameters).result())
+
+    def _run_dml(self, query_str: str, query_parameters: list) -> bigquery.QueryJob:
+        """Runs a DML statement or script to completion, raising StatementFailed on job errors."""
+        with self._timed("job"):
+            query_job = self._query(query_str, query_parameters)
+            query_job.result() # Wait for completion
+        if query_job.errors:
+            # result() usually raises instead, but check job.errors in case it doesn't.
+            raise StatementFailed(query_job.errors)
+        return query_job
+
+    def _run_guarded(self, query_str: str, query_parameters: list):
+        """Runs a guarded script and returns the first row of its final SELECT."""
+        try:
+            with self._timed("job"):
+                query_job = self._query(query_str, query_parameters)
+                row = next(iter(query_job.result()), None)
+        except Exception as e:
+            violation = _parse_guard_violation(e)
+            if violation is None:
+                raise
+            raise GuardViolation(*violation) from e
+        if query_job.errors:
+            raise StatementFailed(query_job.errors)
+        return row
+
+    # --- Health ---
+    def ping(self):
+        # Using a very simple query that doesn't rely on specific tables
+        results = self._read("SELECT 1 AS test_column")
+        for row in results:
+            return row.test_column
+        return None
+
+    # --- Accounts ---
+    def get_account_by_type(self, user_id: str, account_type: str) -> dict | None:
+        query_str = f"""
+            SELECT account_id, balance, currency
+            FROM {self._table_ref("Accounts")}
+            WHERE user_id = @user_id AND account_type = @account_type
+            LIMIT 1
+        """
+        results = self._read(query_str, [
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("account_type", "STRING", account_type),
+        ])
+        for row in results: # Should be at most one row due to LIMIT 1
+            return {"account_id": row.account_id, "balance": float(row.balance), "currency": row.currency, "account_type": account_type}
+        return None
+
+    def get_account_by_id(self, user_id: str, account_id: str) -> dict | None:
+        query_str = f"""
+            SELECT balance, currency, account_type
+            FROM {self._table_ref("Accounts")}
+            WHERE account_id = @account_id AND user_id = @user_id
+            LIMIT 1
+        """
+        results = self._read(query_str, [
+            bigquery.ScalarQueryParameter("account_id", "STRING", account_id),
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+        ])
+        for row in results:
+            return {"account_id": account_id, "account_type": row.account_type, "balance": float(row.balance), "currency": row.currency}
+        return None
+
+    def get_accounts(self, user_id: str, account_types: list, account_ids: list) -> list:
+        query_str = f"""
+            SELECT account_id, account_type, balance, currency
+            FROM {self._table_ref("Accounts")}
+            WHERE user_id = @user_id
+              AND (account_type IN UNNEST(@account_types) OR account_id IN UNNEST(@account_ids))
+            ORDER BY account_id
+        """
+        results = self._read(query_str, [
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ArrayQueryParameter("account_types", "STRING", list(account_types)),
+            bigquery.ArrayQueryParameter("account_ids", "STRING", list(account_ids)),
+        ])
+        return [{"account_id": row.account_id, "account_type": row.account_type, "balance": float(row.balance), "currency": row.currency}
+                for row in results]
+
+    def list_accounts(self, user_id: str) -> list:
+        query_str = f"""
+            SELECT account_id, account_type, balance, currency, account_nickname
+            FROM {self._table_ref("Accounts")}
+            WHERE user_id = @user_id
+        """
+        results = self._read(query_str, [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)])
+        return [{
+            "account_id": row.account_id,
+            "account_type": row.account_type,
+            "balance": float(row.balance) if row.balance is not None else 0.0,
+            "currency": row.currency,
+            "account_nickname": row.account_nickname
+        } for row in results]
+
+    # --- Transactions ---
+    def list_transactions(self, account_id: str, limit: int) -> list:
+        query_str = f"""
+            SELECT transaction_id, date, description, amount, currency, type
+            FROM {self._table_ref("Transactions")}
+            WHERE account_id = @account_id
+            ORDER BY date DESC
+            LIMIT @limit
+        """
+        results = self._read(query_str, [
+            bigquery.ScalarQueryParameter("account_id", "STRING", account_id),
+            bigquery.ScalarQueryParameter("limit", "INT64", limit),
+        ])
+        return [{
+            "transaction_id": row.transaction_id,
+            "date": row.date,
+            "description": row.description,
+            "amount": float(row.amount),
+            "currency": row.currency,
+            "type": row.type
+        } for row in results]
+
+    def list_transactions_page(self, account_id, page_size, after=None, start_ts=None, end_ts=None,
+                               min_amount=None, max_amount=None) -> list:
+        where_conditions = ["account_id = @account_id"]
+        query_parameters = [
+            bigquery.ScalarQueryParameter("account_id", "STRING", account_id),
+            bigquery.ScalarQueryParameter("page_size", "INT64", page_size),
+        ]
+        if after:
+            # Keyset: strictly after the last row of the previous page in (date, transaction_id) DESC order
+            where_conditions.append("(date < @after_date OR (date = @after_date AND transaction_id < @after_id))")
+            query_parameters.append(bigquery.ScalarQueryParameter("after_date", "TIMESTAMP", after[0]))
+            query_parameters.append(bigquery.ScalarQueryParameter("after_id", "STRING", after[1]))
+        if start_ts:
+            where_conditions.append("date >= @start_ts")
+            query_parameters.append(bigquery.ScalarQueryParameter("start_ts", "TIMESTAMP", start_ts))
+        if end_ts:
+            where_conditions.append("date < @end_ts")
+            query_parameters.append(bigquery.ScalarQueryParameter("end_ts", "TIMESTAMP", end_ts))
+        if min_amount is not None:
+            where_conditions.append("ABS(amount) >= @min_amount")
+            query_parameters.append(bigquery.ScalarQueryParameter("min_amount", "FLOAT64", min_amount))
+        if max_amount is not None:
+            where_conditions.append("ABS(amount) <= @max_amount")
+            query_parameters.append(bigquery.ScalarQueryParameter("max_amount", "FLOAT64", max_amount))
+
+        query_str = f"""
+            SELECT transaction_id, date, description, amount, currency, type
+            FROM {self._table_ref("Transactions")}
+            WHERE {" AND ".join(where_conditions)}
+            ORDER BY date DESC, transaction_id DESC
+            LIMIT @page_size
+        """
+        results = self._read(query_str, query_parameters)
+        return [{
+            "transaction_id": row.transaction_id,
+            "date": row.date,
+            "description": row.description,
+            "amount": float(row.amount),
+            "currency": row.currency,
+            "type": row.type
+        } for row in results]
+
+    def _transfer_parameters(self, user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp) -> list:
+        return [
+            bigquery.ScalarQueryParameter("amount", "FLOAT64", amount),
+            bigquery.ScalarQueryParameter("from_account_id", "STRING", from_account_id),
+            bigquery.ScalarQueryParameter("to_account_id", "STRING", to_account_id),
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("debit_transaction_id", "STRING", f"{transaction_base_id}_D"),
+            bigquery.ScalarQueryParameter("credit_transaction_id", "STRING", f"{transaction_base_id}_C"),
+            bigquery.ScalarQueryParameter("timestamp", "TIMESTAMP", timestamp),
+            bigquery.ScalarQueryParameter("debit_description", "STRING", f"Transfer to account {to_account_id}"),
+            bigquery.ScalarQueryParameter("credit_description", "STRING", f"Transfer from account {from_account_id}"),
+            bigquery.ScalarQueryParameter("currency", "STRING", currency),
+            bigquery.ScalarQueryParameter("memo", "STRING", memo),
+        ]
+
+    def transfer_funds(self, user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp) -> None:
+        accounts_table = self._table_ref("Accounts")
+        transactions_table = self._table_ref("Transactions")
+
+        # Multi-statement transaction; BigQuery's client.query() with @params handles the parameters.
+        query_str = f"""
+        BEGIN TRANSACTION;
+
+        -- Decrement sender's balance
+        UPDATE {accounts_table}
+        SET balance = balance - @amount
+        WHERE account_id = @from_account_id AND user_id = @user_id;
+
+        -- Increment recipient's balance
+        UPDATE {accounts_table}
+        SET balance = balance + @amount
+        WHERE account_id = @to_account_id AND user_id = @user_id;
+
+        -- Insert debit transaction for sender
+        INSERT INTO {transactions_table} (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
+        VALUES (@debit_transaction_id, @from_account_id, @user_id, @timestamp, @debit_description, -@amount, @currency, 'transfer_debit', @memo);
+
+        -- Insert credit transaction for recipient
+        INSERT INTO {transactions_table} (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
+        VALUES (@credit_transaction_id, @to_account_id, @user_id, @timestamp, @credit_description, @amount, @currency, 'transfer_credit', @memo);
+
+        COMMIT TRANSACTION;
+        """
+        parameters = self._transfer_parameters(user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp)
+        try:
+            self._run_dml(query_str, parameters)
+        except Exception:
+            # Attempt to rollback if possible, though BigQuery auto-rolls back on error in a transaction
+            try:
+                self.client.query("ROLLBACK TRANSACTION;").result() # May error if no transaction active
+                logger.info("[transfer_funds] Attempted ROLLBACK TRANSACTION due to error.")
+            except Exception as rb_e:
+                logger.warning(f"[transfer_funds] Error during explicit ROLLBACK attempt: {rb_e}")
+            self._remember_query(query_str)
+            raise
+
+    def transfer_funds_guarded(self, user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp) -> dict:
+        accounts_table = self._table_ref("Accounts")
+        transactions_table = self._table_ref("Transactions")
+
+        query_str = f"""
+        DECLARE from_account DEFAULT (
+            SELECT AS STRUCT balance, currency, account_type FROM {accounts_table}
+            WHERE account_id = @from_account_id AND user_id = @user_id);
+        DECLARE to_account DEFAULT (
+            SELECT AS STRUCT balance, currency, account_type FROM {accounts_table}
+            WHERE account_id = @to_account_id AND user_id = @user_id);
+
+        IF from_account IS NULL THEN
+            RAISE USING MESSAGE = 'GUARD_VIOLATION:ERROR_FROM_ACCOUNT_INVALID';
+        END IF;
+        IF to_account IS NULL THEN
+            RAISE USING MESSAGE = 'GUARD_VIOLATION:ERROR_TO_ACCOUNT_INVALID';
+        END IF;
+        IF from_account.currency != @currency OR to_account.currency != @currency THEN
+            RAISE USING MESSAGE = FORMAT('GUARD_VIOLATION:ERROR_CURRENCY_MISMATCH:%s/%s', from_account.currency, to_account.currency);
+        END IF;
+        IF from_account.balance < @amount THEN
+            RAISE USING MESSAGE = FORMAT('GUARD_VIOLATION:ERROR_INSUFFICIENT_FUNDS:%t', from_account.balance);
+        END IF;
+
+        BEGIN
+            BEGIN TRANSACTION;
+
+            -- Decrement sender's balance, only if it still covers the amount
+            UPDATE {accounts_table}
+            SET balance = balance - @amount
+            WHERE account_id = @from_account_id AND user_id = @user_id AND balance >= @amount;
+            ASSERT @@row_count = 1 AS 'GUARD_VIOLATION:ERROR_INSUFFICIENT_FUNDS';
+
+            -- Increment recipient's balance
+            UPDATE {accounts_table}
+            SET balance = balance + @amount
+            WHERE account_id = @to_account_id AND user_id = @user_id;
+            ASSERT @@row_count = 1 AS 'GUARD_VIOLATION:ERROR_TO_ACCOUNT_INVALID';
+
+            -- Insert debit transaction for sender
+            INSERT INTO {transactions_table} (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
+            VALUES (@debit_transaction_id, @from_account_id, @user_id, @timestamp, @debit_description, -@amount, @currency, 'transfer_debit', @memo);
+
+            -- Insert credit transaction for recipient
+            INSERT INTO {transactions_table} (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
+            VALUES (@credit_transaction_id, @to_account_id, @user_id, @timestamp, @credit_description, @amount, @currency, 'transfer_credit', @memo);
+
+            COMMIT TRANSACTION;
+        EXCEPTION WHEN ERROR THEN
+            ROLLBACK TRANSACTION;
+            RAISE USING MESSAGE = @@error.message;
+        END;
+
+        -- Balances re-read after the commit, used to refresh the account cache
+        SELECT
+            (SELECT balance FROM {accounts_table} WHERE account_id = @from_account_id AND user_id = @user_id) AS from_balance,
+            from_account.account_type AS from_account_type,
+            (SELECT balance FROM {accounts_table} WHERE account_id = @to_account_id AND user_id = @user_id) AS to_balance,
+            to_account.account_type AS to_account_type;
+        """
+        parameters = self._transfer_parameters(user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp)
+        row = self._run_guarded(query_str, parameters)
+        if row is None:
+            return None
+        return {"from_balance": float(row.from_balance), "from_account_type": row.from_account_type,
+                "to_balance": float(row.to_balance), "to_account_type": row.to_account_type}
+
+    # --- Billers ---
+    def find_billers(self, user_id: str, bill_type: str, payee_nickname: str = None) -> list:
+        query_parameters = [
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("bill_type", "STRING", bill_type),
+        ]
+        where_conditions = ["user_id = @user_id", "bill_type = @bill_type"]
+        if payee_nickname:
+            where_conditions.append("payee_nickname = @payee_nickname")
+            query_parameters.append(bigquery.ScalarQueryParameter("payee_nickname", "STRING", payee_nickname))
+
+        query_str = f"""
+            SELECT biller_id, biller_name, last_due_amount as due_amount, last_due_date as due_date, default_payment_account_id
+            FROM {self._table_ref("RegisteredBillers")}
+            WHERE {" AND ".join(where_conditions)}
+        """
+        results = self._read(query_str, query_parameters)
+        return [{
+            "biller_id": row.biller_id, "biller_name": row.biller_name,
+            "due_amount": row.due_amount, "due_date": row.due_date,
+            "default_payment_account_id": row.default_payment_account_id
+        } for row in results]
+
+    def get_biller_name(self, user_id: str, biller_id: str) -> str | None:
+        query_str = f"""
+            SELECT biller_name
+            FROM {self._table_ref("RegisteredBillers")}
+            WHERE biller_id = @payee_id AND user_id = @user_id
+            LIMIT 1
+        """
+        results = self._read(query_str, [
+            bigquery.ScalarQueryParameter("payee_id", "STRING", biller_id),
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+        ])
+        for row in results:
+            return row.biller_name
+        return None
+
+    def pay_bill(self, user_id, biller_id, from_account_id, amount, currency, description, memo, transaction_id, timestamp) -> None:
+        query_str = f"""
+        BEGIN TRANSACTION;
+
+        -- Deduct amount from source account
+        UPDATE {self._table_ref("Accounts")}
+        SET balance = balance - @amount
+        WHERE account_id = @from_account_id AND user_id = @user_id;
+
+        -- Record the bill payment transaction
+        INSERT INTO {self._table_ref("Transactions")}
+            (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
+        VALUES
+            (@bill_txn_id, @from_account_id, @user_id, @timestamp, @description, -@amount, @currency, 'bill_payment', @memo);
+
+        -- Update the bill's last_due_amount to 0 and set last_due_date to today's date
+        UPDATE {self._table_ref("RegisteredBillers")}
+        SET last_due_amount = 0,
+            last_due_date = DATE(@timestamp)
+        WHERE biller_id = @payee_id AND user_id = @user_id;
+
+        COMMIT TRANSACTION;
+        """
+        # BigQuery automatically rolls back transactions on error for multi-statement queries
+        self._run_dml(query_str, [
+            bigquery.ScalarQueryParameter("amount", "FLOAT64", amount),
+            bigquery.ScalarQueryParameter("from_account_id", "STRING", from_account_id),
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("bill_txn_id", "STRING", transaction_id),
+            bigquery.ScalarQueryParameter("timestamp", "TIMESTAMP", timestamp),
+            bigquery.ScalarQueryParameter("description", "STRING", description),
+            bigquery.ScalarQueryParameter("currency", "STRING", currency),
+            bigquery.ScalarQueryParameter("memo", "STRING", memo),
+            bigquery.ScalarQueryParameter("payee_id", "STRING", biller_id), # This @payee_id maps to biller_id in the WHERE clause
+        ])
+
+    def pay_bill_guarded(self, user_id, biller_id, from_account_id, amount, memo, transaction_id, timestamp) -> dict:
+        accounts_table = self._table_ref("Accounts")
+        transactions_table = self._table_ref("Transactions")
+        registered_billers_table = self._table_ref("RegisteredBillers")
+
+        query_str = f"""
+        DECLARE from_account DEFAULT (
+            SELECT AS STRUCT balance, currency, account_type FROM {accounts_table}
+            WHERE account_id = @from_account_id AND user_id = @user_id);
+        DECLARE biller_display_name DEFAULT (
+            SELECT biller_name FROM {registered_billers_table}
+            WHERE biller_id = @payee_id AND user_id = @user_id
+            LIMIT 1);
+
+        IF from_account IS NULL THEN
+            RAISE USING MESSAGE = 'GUARD_VIOLATION:ERROR_ACCOUNT_NOT_FOUND';
+        END IF;
+        IF from_account.balance < @amount THEN
+            RAISE USING MESSAGE = FORMAT('GUARD_VIOLATION:INSUFFICIENT_FUNDS:%t/%s', from_account.balance, from_account.currency);
+        END IF;
+        IF biller_display_name IS NULL THEN
+            RAISE USING MESSAGE = 'GUARD_VIOLATION:ERROR_BILLER_NOT_FOUND';
+        END IF;
+
+        BEGIN
+            BEGIN TRANSACTION;
+
+            -- Deduct amount from source account, only if it still covers the amount
+            UPDATE {accounts_table}
+            SET balance = balance - @amount
+            WHERE account_id = @from_account_id AND user_id = @user_id AND balance >= @amount;
+            ASSERT @@row_count = 1 AS 'GUARD_VIOLATION:INSUFFICIENT_FUNDS';
+
+            -- Record the bill payment transaction
+            INSERT INTO {transactions_table}
+                (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
+            VALUES
+                (@bill_txn_id, @from_account_id, @user_id, @timestamp,
+                 CONCAT('Bill Payment to ', biller_display_name, ' (Biller ID: ', @payee_id, ')'),
+                 -@amount, from_account.currency, 'bill_payment', @memo);
+
+            -- Update the bill's last_due_amount to 0 and set last_due_date to today's date
+            UPDATE {registered_billers_table}
+            SET last_due_amount = 0,
+                last_due_date = DATE(@timestamp)
+            WHERE biller_id = @payee_id AND user_id = @user_id;
+
+            COMMIT TRANSACTION;
+        EXCEPTION WHEN ERROR THEN
+            ROLLBACK TRANSACTION;
+            RAISE USING MESSAGE = @@error.message;
+        END;
+
+        -- Confirmation data; the balance is re-read after the commit and used to refresh the account cache
+        SELECT biller_display_name AS biller_name, from_account.currency AS currency,
+               (SELECT balance FROM {accounts_table} WHERE account_id = @from_account_id AND user_id = @user_id) AS balance_after,
+               from_account.account_type AS account_type;
+        """
+        row = self._run_guarded(query_str, [
+            bigquery.ScalarQueryParameter("amount", "FLOAT64", amount),
+            bigquery.ScalarQueryParameter("from_account_id", "STRING", from_account_id),
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("bill_txn_id", "STRING", transaction_id),
+            bigquery.ScalarQueryParameter("timestamp", "TIMESTAMP", timestamp),
+            bigquery.ScalarQueryParameter("memo", "STRING", memo),
+            bigquery.ScalarQueryParameter("payee_id", "STRING", biller_id), # This @payee_id maps to biller_id
+        ])
+        if row is None:
+            return None
+        return {"biller_name": row.biller_name, "currency": row.currency,
+                "balance_after": float(row.balance_after), "account_type": row.account_type}
+
+    def find_active_biller(self, user_id: str, biller_type: str, account_number: str) -> str | None:
+        query_str = f"""
+            SELECT biller_id FROM {self._table_ref("RegisteredBillers")}
+            WHERE user_id = @user_id
+              AND biller_type = @biller_type
+              AND account_number = @account_number
+              AND status = 'ACTIVE'
+            LIMIT 1
+        """
+        results = self._read(query_str, [
+            bigquery.ScalarQueryParameter("user_id", "STRING", user_id),
+            bigquery.ScalarQueryParameter("biller_type", "STRING", biller_type),
+            bigquery.ScalarQueryParameter("account_number", "STRING", account_number),
+        ])
+        for row in results:
+            return row.biller_id
+        return None
+
+    def insert_biller(self, biller: dict) -> None:
+        query_str = f"""
+            INSERT INTO {self._table_ref("RegisteredBillers")} (
+                biller_id, user_id, biller_name, biller_type, account_number,
+                payee_nickname, default_payment_account_id, status,
+                due_amount, due_date, registration_ts, last_updated_ts
+            ) VALUES (
+                @biller_id, @user_id, @biller_name, @biller_type, @account_number,
+                @payee_nickname, @default_payment_account_id, 'ACTIVE',
+                @due_amount, @due_date, @current_ts, @current_ts
+            )
+        """
+        self._run_dml(query_str, [
+            bigquery.ScalarQueryParameter("biller_id", "STRING", biller["biller_id"]),
+            bigquery.ScalarQueryParameter("user_id", "STRING", biller["user_id"]),
+            bigquery.ScalarQueryParameter("biller_name", "STRING", biller["biller_name"]),
+            bigquery.ScalarQueryParameter("biller_type", "STRING", biller["biller_type"]),
+            bigquery.ScalarQueryParameter("account_number", "STRING", biller["account_number"]),
+            bigquery.ScalarQueryParameter("payee_nickname", "STRING", biller.get("payee_nickname")),
+            bigquery.ScalarQueryParameter("default_payment_account_id", "STRING", biller.get("default_payment_account_id")),
+            bigquery.ScalarQueryParameter("due_amount", "FLOAT64", biller.get("due_amount")),
+            bigquery.ScalarQueryParameter("due_date", "DATE", biller.get("due_date")),
+            bigquery.ScalarQueryParameter("current_ts", "TIMESTAMP", biller["timestamp"]),
+        ])
+
+    # BigQuery parameter types of the fields update_biller_details accepts
+    _BILLER_UPDATE_TYPES = {
+        "biller_name": "STRING", "biller_type": "STRING", "account_number": "STRING",
+        "payee_nickname": "STRING", "default_payment_account_id": "STRING",
+        "status": "STRING", "due_amount": "FLOAT64", "due_date": "DATE"
+    }
+
+    def update_biller(self, user_id: str, biller_id: str, updates: dict, timestamp) -> int | None:
+        set_clauses = []
+        query_parameters = []
+        for field, value in updates.items():
+            set_clauses.append(f"{field} = @{field}")
+            query_parameters.append(bigquery.ScalarQueryParameter(field, self._BILLER_UPDATE_TYPES[field], value))
+        set_clauses.append("last_updated_ts = @current_ts")
+        query_parameters.append(bigquery.ScalarQueryParameter("current_ts", "TIMESTAMP", timestamp))
+        query_parameters.append(bigquery.ScalarQueryParameter("user_id", "STRING", user_id))
+        query_parameters.append(bigquery.ScalarQueryParameter("payee_id", "STRING", biller_id))
+
+        query_str = f"""
+            UPDATE {self._table_ref("RegisteredBillers")}
+            SET {', '.join(set_clauses)}
+            WHERE user_id = @user_id AND biller_id = @payee_id
+        """
+        query_job = self._run_dml(query_str, query_parameters)
+        return query_job.num_dml_affected_rows
+
+    def list_billers(self, user_id: str) -> list:
+        query_str = f"""
+            SELECT rb.biller_id,
+                   rb.biller_name,
+                   rb.bill_type AS biller_type,
+                   rb.account_number_at_biller AS account_number,
+                   rb.biller_nickname AS payee_nickname,
+                   rb.default_payment_account_id,
+                   rb.last_due_amount AS due_amount,
+                   rb.last_due_date AS due_date
+            FROM {self._table_ref("RegisteredBillers")} AS rb
+            WHERE rb.user_id = @user_id
+            ORDER BY rb.biller_name, rb.biller_nickname
+        """
+        results = self._read(query_str, [bigquery.ScalarQueryParameter("user_id", "STRING", user_id)])
+        return [{
+            "biller_id": row.biller_id,
+            "biller_name": row.biller_name,
+            "biller_type": row.biller_type,
+            "account_number": row.account_number,
+            "payee_nickname": row.payee_nickname,
+            "default_payment_account_id": row.default_payment_account_id,
+            "due_amount": row.due_amount,
+            "due_date": row.due_date,
+        } for row in results]
@@ -0,0 +1,230 @@
+"""
+In-memory index of a user's registered billers for resolving spoken biller names.
+
+payBill accepts a biller name ("pay my Edison bill") and resolve_biller_by_name used
+to run list_registered_billers (a full BigQuery query) on every call and then scan
+the rows with lowercase substring checks. Billers change rarely, so each user's
+billers are now indexed once and name resolution is a memory lookup:
+
+1. exact    - normalized biller name or nickname equals the query
+2. partial  - the query is contained in a name or nickname (the previous behaviour),
+              or every query word is a word of it (token inverted index)
+3. phonetic - every query word sounds like a word of the biller (Metaphone keys),
+              which absorbs transcription misspellings such as "Eddison" / "Edison"
+4. fuzzy    - trigram similarity of the whole query against names and nicknames,
+              or of each query word against the biller's words ("citty powr")
+
+The first tier with candidates decides; several candidates in it are reported as
+ambiguous. Only exact and partial matches are safe to act on directly: phonetic and
+fuzzy matches (CONFIRM_MATCH_TYPES) can land on a biller the user did not mean
+("dad phone" -> "Mom Phone"), so callers must confirm them with the user. Indexes
+are built from list_registered_billers results, expire after
+BILLER_INDEX_TTL_SECONDS and are invalidated by bigquery_functions whenever a
+biller is registered, updated or removed.
+"""
+import os
+import re
+
+from user_registry import UserRegistry
+
+BILLER_INDEX_TTL_SECONDS = float(os.getenv("BILLER_INDEX_TTL_SECONDS", "300"))
+BILLER_INDEX_MAX_USERS = int(os.getenv("BILLER_INDEX_MAX_USERS", "1024"))
+# Minimum trigram (Dice) similarity for a fuzzy match, and how close a runner-up must be to count as ambiguous.
+BILLER_FUZZY_MIN_SIMILARITY = float(os.getenv("BILLER_FUZZY_MIN_SIMILARITY", "0.5"))
+BILLER_FUZZY_AMBIGUITY_MARGIN = 0.05
+# Match types that are only a guess and need the user's confirmation before any payment
+CONFIRM_MATCH_TYPES = frozenset({"phonetic", "fuzzy"})
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_VOWELS = set("AEIOU")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, '&' spelled out, punctuation collapsed to single spaces."""
+    if not text:
+        return ""
+    return _NON_ALNUM.sub(" ", text.lower().replace("&", " and ")).strip()
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a: set, b: set) -> float:
+    return 2.0 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def metaphone(word: str) -> str:
+    """Phonetic key of a single word (original Metaphone rules, digits kept as-is)."""
+    word = "".join(ch for ch in word.upper() if ch.isalnum())
+    if not word:
+        return ""
+    if word[:2] in ("AE", "GN", "KN", "PN", "WR"):
+        word = word[1:]
+    if word[0] == "X":
+        word = "S" + word[1:]
+    elif word[:2] == "WH":
+        word = "W" + word[2:]
+
+    key = []
+    length = len(word)
+    for i, ch in enumerate(word):
+        prev = word[i - 1] if i > 0 else ""
+        nxt = word[i + 1] if i + 1 < length else ""
+        nxt2 = word[i + 2] if i + 2 < length else ""
+        if ch == prev and ch != "C":
+            continue
+        if ch.isdigit():
+            key.append(ch)
+        elif ch in _VOWELS:
+            if i == 0:
+                key.append(ch)
+        elif ch == "B":
+            if not (prev == "M" and i == length - 1):
+                key.append("B")
+        elif ch == "C":
+            if nxt == "I" and nxt2 == "A":
+                key.append("X")
+            elif nxt == "H":
+                key.append("K" if prev == "S" else "X")
+            elif nxt in ("I", "E", "Y"):
+                if prev != "S":
+                    key.append("S")
+            else:
+                key.append("K")
+        elif ch == "D":
+            key.append("J" if nxt == "G" and nxt2 in ("E", "I", "Y") else "T")
+        elif ch == "G":
+            if nxt == "H" and not (i + 2 >= length or nxt2 in _VOWELS):
+                continue # Silent, as in "light"
+            if nxt == "N" and (i + 2 == length or word[i + 2:] == "ED"):
+                continue # Silent, as in "sign"
+            key.append("J" if nxt in ("I", "E", "Y") and prev != "G" else "K")
+        elif ch == "H":
+            if prev in ("C", "S", "P", "T", "G"):
+                continue
+            if prev in _VOWELS and nxt not in _VOWELS:
+                continue
+            key.append("H")
+        elif ch == "K":
+            if prev != "C":
+                key.append("K")
+        elif ch == "P":
+            key.append("F" if nxt == "H" else "P")
+        elif ch == "Q":
+            key.append("K")
+        elif ch == "S":
+            key.append("X" if nxt == "H" or (nxt == "I" and nxt2 in ("O", "A")) else "S")
+        elif ch == "T":
+            if nxt == "I" and nxt2 in ("O", "A"):
+                key.append("X")
+            elif nxt == "H":
+                key.append("0") # "th"
+            elif not (nxt == "C" and nxt2 == "H"):
+                key.append("T")
+        elif ch == "V":
+            key.append("F")
+        elif ch in ("W", "Y"):
+            if nxt in _VOWELS:
+                key.append(ch)
+        elif ch == "X":
+            key.append("KS")
+        elif ch == "Z":
+            key.append("S")
+        else: # F, J, L, M, N, R
+            key.append(ch)
+    return "".join(key)
+
+
+class BillerIndex:
+    """Lookup structures over one user's billers (biller_id, biller_name, payee_nickname)."""
+
+    def __init__(self, billers: list):
+        self.billers = {} # biller_id -> biller row
+        self._names = {} # biller_id -> normalized names (biller_name and nickname)
+        self._exact = {} # normalized name -> {biller_id}
+        self._tokens = {} # token -> {biller_id}
+        self._phonetic = {} # metaphone key -> {biller_id}
+        self._trigrams = {} # biller_id -> [trigram set per name]
+        self._token_trigrams = {} # biller_id -> [trigram set per word of any name]
+        for biller in billers:
+            self._add(biller)
+
+    def _add(self, biller: dict) -> None:
+        biller_id = biller["biller_id"]
+        self.billers[biller_id] = biller
+        names = [name for name in (normalize(biller.get("biller_name")), normalize(biller.get("payee_nickname"))) if name]
+        self._names[biller_id] = names
+        self._trigrams[biller_id] = [trigrams(name) for name in names]
+        self._token_trigrams[biller_id] = [trigrams(token) for name in names for token in name.split()]
+        for name in names:
+            self._exact.setdefault(name, set()).add(biller_id)
+            for token in name.split():
+                self._tokens.setdefault(token, set()).add(biller_id)
+                self._phonetic.setdefault(metaphone(token), set()).add(biller_id)
+
+    def __len__(self) -> int:
+        return len(self.billers)
+
+    def _ordered(self, biller_ids) -> list:
+        # Keep the list_registered_billers order (name, nickname) so ambiguity options are stable
+        return [biller for biller_id, biller in self.billers.items() if biller_id in biller_ids]
+
+    @staticmethod
+    def _intersect(index: dict, keys: list) -> set:
+        candidates = None
+        for key in keys:
+            ids = index.get(key, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+        return candidates or set()
+
+    def lookup(self, query: str) -> tuple:
+        """Returns (match_type, [biller rows]) for the first tier with candidates, or (None, [])."""
+        normalized = normalize(query)
+        if not normalized:
+            return None, []
+
+        exact = self._exact.get(normalized)
+        if exact:
+            return "exact", self._ordered(exact)
+
+        tokens = normalized.split()
+        # Substrings as before ("city pow"), plus all query words in any order ("light city power")
+        partial = {biller_id for biller_id, names in self._names.items() if any(normalized in name for name in names)}
+        partial |= self._intersect(self._tokens, tokens)
+        if partial:
+            return "partial", self._ordered(partial)
+
+        phonetic = self._intersect(self._phonetic, [metaphone(token) for token in tokens])
+        if phonetic:
+            return "phonetic", self._ordered(phonetic)
+
+        query_grams = trigrams(normalized)
+        token_grams = [trigrams(token) for token in tokens]
+        scores = {}
+        for biller_id, name_grams in self._trigrams.items():
+            best = max((dice(query_grams, grams) for grams in name_grams), default=0.0)
+            word_grams = self._token_trigrams[biller_id]
+            if word_grams:
+                per_word = sum(max(dice(grams, word) for word in word_grams) for grams in token_grams) / len(token_grams)
+                best = max(best, per_word)
+            if best >= BILLER_FUZZY_MIN_SIMILARITY:
+                scores[biller_id] = best
+        if scores:
+            top = max(scores.values())
+            return "fuzzy", self._ordered({biller_id for biller_id, score in scores.items() if top - score <= BILLER_FUZZY_AMBIGUITY_MARGIN})
+        return None, []
+
+
+class BillerIndexRegistry(UserRegistry):
+    """Thread-safe TTL + LRU map of user_id -> BillerIndex, built from the user's complete biller list."""
+
+    def __init__(self, max_users: int = BILLER_INDEX_MAX_USERS, ttl_seconds: float = BILLER_INDEX_TTL_SECONDS):
+        super().__init__(BillerIndex, max_users, ttl_seconds)
+
+
+# Process-wide instance used by bigquery_functions and gemini_tools.
+BILLER_INDEX = BillerIndexRegistry()
@@ -0,0 +1,115 @@
+"""
+In-process publish/subscribe bus for structured log events.
+
+Tool events used to travel as text: _log_tool_event printed json.dumps(...) and the
+StdoutTee in main.py json.loads'ed every stdout write to get the dict back, so each
+debug print on the receive loop paid a failed JSON parse as well. Producers now
+publish plain dicts to EVENT_BUS and subscribers receive the same dict:
+
+- GLOBAL_LOG_STORE (bigquery_functions) keeps them for /api/logs,
+- the ConsoleWriter prints them as JSON lines from a background thread, so
+  serialization and console I/O never run on the event loop,
+- further sinks (files, streams) subscribe the same way.
+
+Events carry at least `log_type` and `timestamp`. Subscribers run synchronously in
+the publisher's thread and must be cheap; anything slow belongs behind a queue like
+the ConsoleWriter's. A failing subscriber is logged and skipped.
+"""
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+EVENT_CONSOLE_ENABLED = os.getenv("EVENT_CONSOLE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Events waiting to be printed; beyond this the console drops events rather than block publishers.
+EVENT_CONSOLE_QUEUE_SIZE = int(os.getenv("EVENT_CONSOLE_QUEUE_SIZE", "10000"))
+
+
+class EventBus:
+    """Delivers published event dicts to every matching subscriber."""
+
+    def __init__(self):
+        self._subscribers = () # (callback, log_types or None); replaced on change, read without locking
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, log_types: set = None):
+        """Registers callback(event) for all events, or only those whose log_type is in log_types."""
+        with self._lock:
+            self._subscribers = self._subscribers + ((callback, frozenset(log_types) if log_types else None),)
+        return callback
+
+    def unsubscribe(self, callback) -> None:
+        with self._lock:
+            self._subscribers = tuple(sub for sub in self._subscribers if sub[0] is not callback)
+
+    def publish(self, event: dict) -> dict:
+        event.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+        log_type = event.get("log_type")
+        for callback, log_types in self._subscribers:
+            if log_types is not None and log_type not in log_types:
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"[publish] Event subscriber {getattr(callback, '__qualname__', callback)} failed: {e}", exc_info=True)
+        return event
+
+
+class ConsoleWriter:
+    """Prints events as JSON lines from a daemon thread, bypassing any stdout interception."""
+
+    def __init__(self, stream=None, max_queue: int = EVENT_CONSOLE_QUEUE_SIZE):
+        self._stream = stream
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def __call__(self, event: dict) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="event-console", daemon=True)
+                self._thread.start()
+
+    @staticmethod
+    def format(event: dict) -> str:
+        line = json.dumps(event, default=str)
+        status = str(event.get("status", ""))
+        if event.get("log_type") == "BQ_INTERACTION" and "ERROR" not in status.upper() and "FAIL" not in status.upper():
+            return f"\033[92m{line}\033[0m" # Successful BQ interactions in green
+        return line
+
+    def _run(self) -> None:
+        # sys.__stdout__ is the real console even while main.py's StdoutTee replaces sys.stdout
+        stream = self._stream or sys.__stdout__
+        while True:
+            event = self._queue.get()
+            try:
+                stream.write(self.format(event) + "\n")
+                if self._queue.empty():
+                    stream.flush()
+            except Exception as e:
+                stream.write(f"[event-console] Could not print event: {e}: {event!r}\n")
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "dropped": self.dropped}
+
+
+# Process-wide bus used by gemini_tools, bigquery_functions and main.
+EVENT_BUS = EventBus()
+CONSOLE_WRITER = ConsoleWriter()
+if EVENT_CONSOLE_ENABLED:
+    EVENT_BUS.subscribe(CONSOLE_WRITER)
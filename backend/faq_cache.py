@@ -0,0 +1,160 @@
+"""
+In-process cache of FAQ answers in front of the Discovery Engine search in search_faq.
+
+Bank FAQ questions repeat a lot ("what are your branch hours", "how do I reset my
+PIN"), and every utterance used to be a remote search. Answers are cached under a
+normalized form of the question (case-folded, punctuation and filler words removed)
+per language, so "Um, how do I reset my PIN, please?" and "how do I reset my pin"
+share an entry while the same words in different session languages do not.
+
+Entries expire after FAQ_CACHE_TTL_SECONDS and the least recently used are evicted
+beyond FAQ_CACHE_MAX_ENTRIES. warm() re-fetches the most frequent questions found in
+the search_faq tool events of the log store, so popular answers stay cached; main.py
+runs it every FAQ_CACHE_WARM_INTERVAL_SECONDS when that is set.
+"""
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+FAQ_CACHE_ENABLED = os.getenv("FAQ_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+FAQ_CACHE_TTL_SECONDS = float(os.getenv("FAQ_CACHE_TTL_SECONDS", "3600"))
+FAQ_CACHE_MAX_ENTRIES = int(os.getenv("FAQ_CACHE_MAX_ENTRIES", "1000"))
+FAQ_CACHE_WARM_TOP_N = int(os.getenv("FAQ_CACHE_WARM_TOP_N", "20"))
+FAQ_CACHE_WARM_INTERVAL_SECONDS = float(os.getenv("FAQ_CACHE_WARM_INTERVAL_SECONDS", "0")) # 0 disables warming
+
+# Words that do not change what is being asked, per language prefix
+_FILLER_WORDS = {
+    "en": frozenset({"um", "uh", "er", "erm", "ah", "hmm", "hey", "hi", "hello", "ok", "okay", "so", "well", "like",
+                     "just", "actually", "basically", "please", "pls", "kindly", "a", "an", "the", "can", "could",
+                     "would", "you", "tell", "me", "i", "want", "wanted", "to", "know", "do"}),
+    "id": frozenset({"eh", "hmm", "tolong", "mohon", "dong", "sih", "ya", "nih", "deh", "kak", "saya", "mau", "ingin",
+                     "tahu", "bisa"}),
+}
+# Thai is written without spaces; only polite particles at the end of the question are dropped
+_TRAILING_PARTICLES = {
+    "th": ("ครับ", "ค่ะ", "คะ", "นะ", "จ้ะ", "จ้า"),
+}
+
+
+def normalize_query(query: str, language: str = None) -> str:
+    """Case-folded question without punctuation and filler words, whitespace collapsed."""
+    prefix = (language or "en").split("-")[0].lower()
+    text = "".join(" " if unicodedata.category(ch).startswith(("P", "S")) else ch for ch in query.casefold())
+    fillers = _FILLER_WORDS.get(prefix, frozenset())
+    words = [word for word in text.split() if word not in fillers]
+    text = " ".join(words)
+    particles = _TRAILING_PARTICLES.get(prefix)
+    if particles:
+        stripped = True
+        while stripped:
+            stripped = False
+            for particle in particles:
+                if text.endswith(particle) and len(text) > len(particle):
+                    text = text[:-len(particle)].rstrip()
+                    stripped = True
+    return text or " ".join(query.casefold().split()) # Never collapse a question to an empty key
+
+
+class FaqAnswerCache:
+    """Thread-safe TTL + LRU cache of FAQ answers keyed by (language, normalized question)."""
+
+    def __init__(self, max_entries: int = FAQ_CACHE_MAX_ENTRIES, ttl_seconds: float = FAQ_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # (language, key) -> (expires_at, answer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.warmed = 0
+
+    @staticmethod
+    def _key(query: str, language: str) -> tuple:
+        return ((language or "").lower(), normalize_query(query, language))
+
+    def get(self, query: str, language: str = None) -> str | None:
+        key = self._key(query, language)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query: str, language: str, answer: str) -> None:
+        if not answer: # Empty summaries are not worth serving again
+            return
+        key = self._key(query, language)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def expires_in(self, query: str, language: str = None) -> float | None:
+        """Seconds until the entry expires, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(self._key(query, language))
+        return entry[0] - time.monotonic() if entry else None
+
+    async def warm(self, store, search, top_n: int = FAQ_CACHE_WARM_TOP_N) -> int:
+        """
+        Re-fetches, with `search(query)`, the top_n most frequent successful search_faq questions
+        in the log store that are missing or within 10% of the TTL of expiring. Returns the count.
+        """
+        counts = Counter()
+        examples = {}
+        for entry in store.query(log_types={"TOOL_EVENT"}):
+            if entry.get("tool_function_name") != "search_faq" or entry.get("event_subtype") != "INVOCATION_END":
+                continue
+            if (entry.get("response_received") or {}).get("status") != "success":
+                continue
+            params = entry.get("parameters_sent") or {}
+            query, language = params.get("search_query"), params.get("language")
+            if not query:
+                continue
+            key = self._key(query, language)
+            counts[key] += 1
+            examples[key] = (query, language)
+        warmed = 0
+        for key, _count in counts.most_common(top_n):
+            query, language = examples[key]
+            remaining = self.expires_in(query, language)
+            if remaining is not None and remaining > self.ttl_seconds * 0.1:
+                continue
+            try:
+                self.put(query, language, await search(query))
+                warmed += 1
+            except Exception as e:
+                logger.warning(f"[warm] Could not refresh FAQ answer for '{query}': {e}")
+        with self._lock:
+            self.warmed += warmed
+        return warmed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                    "evictions": self.evictions, "expirations": self.expirations, "warmed": self.warmed}
+
+
+# Process-wide instance used by gemini_tools.search_faq
+FAQ_CACHE = FaqAnswerCache() if FAQ_CACHE_ENABLED else None
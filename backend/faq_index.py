@@ -0,0 +1,297 @@
+"""
+Local BM25 retrieval over an approved FAQ corpus (FAQ_CORPUS_PATH).
+
+search_faq used to depend entirely on the remote Discovery Engine. This module keeps
+a small inverted index of the corpus on disk (FAQ_INDEX_PATH) and memory-maps it, so
+a lookup is a few binary searches and posting-list reads: sub-millisecond, no
+network and no warm-up. gemini_tools uses it according to FAQ_LOCAL_MODE:
+
+  primary   answer locally when the best match scores at least FAQ_LOCAL_MIN_SCORE,
+            otherwise ask the remote engine
+  fallback  ask the remote engine; answer locally if it fails or times out
+  off       remote only (default)
+
+The local tier answers customers directly, so it is opt-in: it needs FAQ_LOCAL_MODE
+and a FAQ_CORPUS_PATH pointing at content the bank has approved. The corpus is only
+used for sessions whose language is in FAQ_CORPUS_LANGUAGES (language prefixes, e.g.
+"en"); other sessions always go to the remote engine. faq_corpus.sample.json is
+made-up sample data for development and the offline check below, not bank policy.
+
+The index is rebuilt automatically when it is missing or was built from a different
+corpus (its header stores the corpus SHA-256). If the file cannot be written, the
+index is kept in memory instead. File layout (little-endian):
+
+  header    magic, version, doc/term counts, average document length, corpus hash,
+            section offsets
+  terms     fixed-size records sorted by term bytes: string offset/length, df, postings offset
+  strings   UTF-8 term bytes
+  postings  (doc_id u32, tf u16) per term, in term order
+  doclens   u32 weighted token count per document
+  docs      (offset u32, length u32) per document, then the JSON documents
+
+Offline check (uses the sample corpus unless FAQ_CORPUS_PATH or --corpus is given):
+    python faq_index.py --rebuild "how do i reset my pin"
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+FAQ_SAMPLE_CORPUS_PATH = os.path.join(_HERE, "faq_corpus.sample.json") # Made-up entries, never loaded by default
+FAQ_CORPUS_PATH = os.getenv("FAQ_CORPUS_PATH", "") # Unset disables the local tier
+FAQ_CORPUS_LANGUAGES = frozenset(lang.strip().split("-")[0].lower()
+                                 for lang in os.getenv("FAQ_CORPUS_LANGUAGES", "en").split(",") if lang.strip())
+FAQ_INDEX_PATH = os.getenv("FAQ_INDEX_PATH", os.path.join(_HERE, "faq_index.bin"))
+FAQ_LOCAL_MODE = os.getenv("FAQ_LOCAL_MODE", "off").lower() # primary | fallback | off
+FAQ_LOCAL_MIN_SCORE = float(os.getenv("FAQ_LOCAL_MIN_SCORE", "4.5"))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+QUESTION_WEIGHT = 2 # Question tokens count twice: questions are short and on topic
+
+_MAGIC = b"FAQBM25\x00"
+_VERSION = 1
+_HEADER = struct.Struct("<8sHHIIf32sIIIII") # magic, version, reserved, docs, terms, avgdl, sha256, 5 section offsets
+_TERM = struct.Struct("<IIII") # string offset, string length, df, postings offset
+_POSTING = struct.Struct("<IH") # doc id, term frequency
+_DOCLEN = struct.Struct("<I")
+_DOC = struct.Struct("<II") # offset, length into the documents blob
+
+_STOP_WORDS = frozenset({
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "at", "by", "from", "as", "is", "are",
+    "was", "be", "been", "it", "its", "this", "that", "these", "i", "me", "my", "we", "our", "you", "your", "do",
+    "does", "did", "can", "could", "would", "should", "will", "how", "what", "when", "where", "which", "who",
+    "there", "if", "so", "please", "any", "some", "all", "also", "then", "than", "up", "into", "about",
+})
+_WORD_RE = re.compile(r"\w+")
+
+
+def _stem(word: str) -> str:
+    """Light English suffix stripping, applied identically to documents and queries."""
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list:
+    return [_stem(word) for word in _WORD_RE.findall(text.casefold()) if word not in _STOP_WORDS]
+
+
+def _corpus_digest(corpus_bytes: bytes) -> bytes:
+    return hashlib.sha256(corpus_bytes).digest()
+
+
+def build_index_bytes(corpus_bytes: bytes) -> bytes:
+    """Serializes the index of a JSON corpus (list of {"id", "question", "answer"})."""
+    documents = json.loads(corpus_bytes)
+    postings = {} # term -> [(doc_id, tf)]
+    doc_lengths = []
+    for doc_id, doc in enumerate(documents):
+        counts = Counter()
+        for token in tokenize(doc["question"]):
+            counts[token] += QUESTION_WEIGHT
+        counts.update(tokenize(doc["answer"]))
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, min(tf, 0xFFFF)))
+
+    terms = sorted(postings, key=lambda term: term.encode("utf-8"))
+    strings, term_records, posting_blob = bytearray(), bytearray(), bytearray()
+    for term in terms:
+        encoded = term.encode("utf-8")
+        term_records += _TERM.pack(len(strings), len(encoded), len(postings[term]), len(posting_blob))
+        strings += encoded
+        for doc_id, tf in postings[term]:
+            posting_blob += _POSTING.pack(doc_id, tf)
+    doc_blob, doc_records = bytearray(), bytearray()
+    for doc in documents:
+        encoded = json.dumps({"id": doc["id"], "question": doc["question"], "answer": doc["answer"]},
+                             ensure_ascii=False).encode("utf-8")
+        doc_records += _DOC.pack(len(doc_blob), len(encoded))
+        doc_blob += encoded
+
+    terms_off = _HEADER.size
+    strings_off = terms_off + len(term_records)
+    postings_off = strings_off + len(strings)
+    doclen_off = postings_off + len(posting_blob)
+    docs_off = doclen_off + _DOCLEN.size * len(documents)
+    avgdl = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+    header = _HEADER.pack(_MAGIC, _VERSION, 0, len(documents), len(terms), avgdl, _corpus_digest(corpus_bytes),
+                          terms_off, strings_off, postings_off, doclen_off, docs_off)
+    doclens = b"".join(_DOCLEN.pack(length) for length in doc_lengths)
+    return bytes(header + term_records + strings + posting_blob + doclens + doc_records + doc_blob)
+
+
+class FaqIndex:
+    """Read-only BM25 index over a memory-mapped (or in-memory) index buffer."""
+
+    def __init__(self, buffer, source: str, mapping: mmap.mmap = None):
+        self._buf = buffer
+        self._mmap = mapping
+        self.source = source
+        (magic, version, _reserved, self.num_docs, self.num_terms, self.avgdl, self.corpus_digest,
+         self._terms_off, self._strings_off, self._postings_off, self._doclen_off, self._docs_off) = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a FAQ index file (or an incompatible version).")
+        self._doc_blob_off = self._docs_off + _DOC.size * self.num_docs
+        self.searches = 0
+
+    @classmethod
+    def open(cls, path: str) -> "FaqIndex":
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapping, source=path, mapping=mapping)
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def _term(self, index: int) -> tuple:
+        return _TERM.unpack_from(self._buf, self._terms_off + index * _TERM.size)
+
+    def _find_term(self, term: str):
+        """Binary search over the sorted term records; returns (df, postings offset) or None."""
+        target = term.encode("utf-8")
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            str_off, str_len, df, post_off = self._term(mid)
+            start = self._strings_off + str_off
+            candidate = self._buf[start:start + str_len]
+            if candidate == target:
+                return df, post_off
+            if candidate < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _doc_length(self, doc_id: int) -> int:
+        return _DOCLEN.unpack_from(self._buf, self._doclen_off + doc_id * _DOCLEN.size)[0]
+
+    def document(self, doc_id: int) -> dict:
+        offset, length = _DOC.unpack_from(self._buf, self._docs_off + doc_id * _DOC.size)
+        start = self._doc_blob_off + offset
+        return json.loads(bytes(self._buf[start:start + length]).decode("utf-8"))
+
+    def search(self, query: str, top_k: int = 3) -> list:
+        """Best matches as dicts (id, question, answer, score), highest score first."""
+        self.searches += 1
+        scores = {}
+        for term in set(tokenize(query)):
+            found = self._find_term(term)
+            if found is None:
+                continue
+            df, post_off = found
+            idf = math.log(1.0 + (self.num_docs - df + 0.5) / (df + 0.5))
+            base = self._postings_off + post_off
+            for i in range(df):
+                doc_id, tf = _POSTING.unpack_from(self._buf, base + i * _POSTING.size)
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._doc_length(doc_id) / self.avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [{**self.document(doc_id), "score": round(score, 3)} for doc_id, score in best]
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def stats(self) -> dict:
+        return {"documents": self.num_docs, "terms": self.num_terms, "bytes": len(self._buf),
+                "source": self.source, "searches": self.searches}
+
+
+def load_faq_index(corpus_path: str = FAQ_CORPUS_PATH, index_path: str = FAQ_INDEX_PATH,
+                   rebuild: bool = False) -> FaqIndex | None:
+    """Opens the index, (re)building it first if it is missing or stale. None if there is no corpus."""
+    if not corpus_path:
+        logger.warning("[load_faq_index] FAQ_CORPUS_PATH is not set; local FAQ search disabled.")
+        return None
+    try:
+        with open(corpus_path, "rb") as f:
+            corpus_bytes = f.read()
+    except FileNotFoundError:
+        logger.warning(f"[load_faq_index] FAQ corpus {corpus_path} not found; local FAQ search disabled.")
+        return None
+    digest = _corpus_digest(corpus_bytes)
+    if not rebuild:
+        try:
+            index = FaqIndex.open(index_path)
+            if index.corpus_digest == digest:
+                return index
+            index.close()
+        except (OSError, ValueError, struct.error):
+            pass # Missing or unreadable: rebuild below
+    started = time.perf_counter()
+    data = build_index_bytes(corpus_bytes)
+    try:
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, index_path) # Atomic, so concurrent workers never map a partial file
+        index = FaqIndex.open(index_path)
+    except OSError as e:
+        logger.warning(f"[load_faq_index] Could not write {index_path} ({e}); keeping the FAQ index in memory.")
+        index = FaqIndex(data, source="memory")
+    logger.info(f"[load_faq_index] Built FAQ index: {index.num_docs} documents, {index.num_terms} terms, "
+                f"{len(data)} bytes in {(time.perf_counter() - started) * 1000.0:.1f} ms.")
+    return index
+
+
+_faq_index = None
+_faq_index_lock = threading.Lock()
+
+
+def covers_language(language: str | None) -> bool:
+    """Whether the corpus is written in the session language (FAQ_CORPUS_LANGUAGES)."""
+    return (language or "en").split("-")[0].lower() in FAQ_CORPUS_LANGUAGES
+
+
+def get_faq_index() -> FaqIndex | None:
+    """The process-wide index, loaded on first use (main.py loads it in before_serving)."""
+    global _faq_index
+    if _faq_index is None and FAQ_LOCAL_MODE != "off" and FAQ_CORPUS_PATH:
+        with _faq_index_lock:
+            if _faq_index is None:
+                _faq_index = load_faq_index()
+    return _faq_index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", nargs="*", help="Question to look up")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index file from the corpus")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--corpus", default=FAQ_CORPUS_PATH or FAQ_SAMPLE_CORPUS_PATH,
+                        help="Corpus to index (default: FAQ_CORPUS_PATH, else the sample corpus)")
+    args = parser.parse_args()
+    faq_index = load_faq_index(corpus_path=args.corpus, rebuild=args.rebuild)
+    if faq_index is None:
+        raise SystemExit(1)
+    print(faq_index.stats())
+    if args.query:
+        query = " ".join(args.query)
+        started = time.perf_counter()
+        results = faq_index.search(query, args.top_k)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        print(f"{len(results)} result(s) for '{query}' in {elapsed_ms:.3f} ms")
+        for result in results:
+            print(f"{result['score']:>8.3f}  {result['id']:<28}{result['question']}")
@@ -1,10 +1,15 @@
 from google.genai import types
 from google.cloud import discoveryengine
 from google.api_core.client_options import ClientOptions
-import asyncio # For potential future use with to_thread
-import bigquery_functions # Use absolute import
+import asyncio
+import bigquery_async # Awaitable variants that keep BigQuery jobs off the event loop
 from bigquery_functions import USER_ID # Import USER_ID
-import json
+from session_context import current_session, invalidate_user_sessions, ACCOUNTS, BILLERS, TRANSACTIONS # Session-scoped prefetch cache
+from biller_index import BILLER_INDEX, CONFIRM_MATCH_TYPES # Per-user biller name index
+from event_bus import EVENT_BUS # Structured log events
+from faq_cache import FAQ_CACHE # Answers to repeated FAQ questions
+from faq_index import get_faq_index, covers_language, FAQ_LOCAL_MODE, FAQ_LOCAL_MIN_SCORE # Local BM25 FAQ retrieval
+import os
 from datetime import datetime, timezone
 import logging
 
@@ -20,7 +25,7 @@ logger = logging.getLogger(__name__)
 YOUR_DATASTORE_ID = "bank-faq-demo-ds_1747707296437"
 SEARCH_ENGINE_ID = "bank-faq-demo_1747707209997"
 def _log_tool_event(event_type: str, tool_name: str, parameters: dict, response: dict = None):
-    """Helper function to create and print a structured log entry for tool events."""
+    """Helper function to publish a structured log entry for tool events (stored and printed by subscribers)."""
     log_payload = {
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "log_type": "TOOL_EVENT",
@@ -30,7 +35,11 @@ def _log_tool_event(event_type: str, tool_name: str, parameters: dict, response:
     }
     if response is not None:
         log_payload["response_received"] = response
-    print(json.dumps(log_payload))
+    EVENT_BUS.publish(log_payload)
+
+def _invalidate_session_cache(*keys):
+    """Drops data that a mutating tool may have changed from every open session of the user."""
+    invalidate_user_sessions(USER_ID, *keys)
 
 # Function Declaration for getBalance
 getBalance_declaration = types.FunctionDeclaration(
@@ -48,12 +57,17 @@ getBalance_declaration = types.FunctionDeclaration(
 # Function Declaration for getTransactionHistory
 getTransactionHistory_declaration = types.FunctionDeclaration(
     name="getTransactionHistory",
-    description="Fetches the last N transactions for a specified bank account type.",
+    description="Fetches transactions for a specified bank account type, newest first, one page at a time. If the response contains a 'next_cursor', more transactions are available: call again with that cursor (and the same filters) to get the next page.",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
             "account_type": types.Schema(type=types.Type.STRING, description="The type of account (e.g., 'checking', 'savings')."),
-            "limit": types.Schema(type=types.Type.INTEGER, description="The number of transactions to retrieve (defaults to 5).")
+            "limit": types.Schema(type=types.Type.INTEGER, description="The number of transactions per page (defaults to 5)."),
+            "cursor": types.Schema(type=types.Type.STRING, description="Optional. The 'next_cursor' from a previous response, to fetch the next page."),
+            "start_date": types.Schema(type=types.Type.STRING, description="Optional. Only transactions on or after this date (YYYY-MM-DD)."),
+            "end_date": types.Schema(type=types.Type.STRING, description="Optional. Only transactions on or before this date (YYYY-MM-DD)."),
+            "min_amount": types.Schema(type=types.Type.NUMBER, description="Optional. Only transactions of at least this amount (debits and credits alike)."),
+            "max_amount": types.Schema(type=types.Type.NUMBER, description="Optional. Only transactions of at most this amount (debits and credits alike).")
         },
         required=["account_type"] # 'limit' is optional as it's not in required and has a default
     )
@@ -201,8 +215,15 @@ async def getBalance(account_type: str):
     logger.info(f"[{tool_name}] Attempting to call bigquery_functions.get_account_balance with account_type: {account_type}")
     api_response = {}
     try:
-        bq_result = bigquery_functions.get_account_balance(account_type)
-        logger.info(f"[{tool_name}] Received from bigquery_functions.get_account_balance: {bq_result}")
+        session = current_session()
+        cached_account = await session.get_account_by_type(account_type) if session else None
+        if cached_account:
+            bq_result = {"account_type": account_type, "balance": cached_account["balance"],
+                         "currency": cached_account["currency"], "account_id": cached_account["account_id"]}
+            logger.info(f"[{tool_name}] Served from session cache: {bq_result}")
+        else:
+            bq_result = await bigquery_async.get_account_balance(account_type)
+            logger.info(f"[{tool_name}] Received from bigquery_functions.get_account_balance: {bq_result}")
     
         # Ensure the result aligns with the expected schema for Gemini (status, account_type, balance, currency)
         # bigquery_functions.get_account_balance returns:
@@ -230,45 +251,48 @@ async def getBalance(account_type: str):
     return api_response
 
 
-async def getTransactionHistory(account_type: str, limit: int = 5):
+async def getTransactionHistory(account_type: str, limit: int = 5, cursor: str = None, start_date: str = None,
+                                end_date: str = None, min_amount: float = None, max_amount: float = None):
     tool_name = "getTransactionHistory"
-    params_sent = {"account_type": account_type, "limit": limit}
+    params_sent = {"account_type": account_type, "limit": limit, "cursor": cursor, "start_date": start_date,
+                   "end_date": end_date, "min_amount": min_amount, "max_amount": max_amount}
     _log_tool_event("INVOCATION_START", tool_name, params_sent)
-    logger.info(f"[{tool_name}] Attempting to call bigquery_functions.get_transaction_history with account_type: {account_type}, limit: {limit}")
+    logger.info(f"[{tool_name}] Attempting to call bigquery_functions.get_transaction_history_page with params: {params_sent}")
     api_response = {}
     try:
-        bq_transactions = bigquery_functions.get_transaction_history(account_type, limit)
-        logger.info(f"[{tool_name}] Received from bigquery_functions.get_transaction_history: {bq_transactions}")
-        # bq_transactions returns a list of transactions or a list containing an error dict.
-        # Example success: [{"transaction_id": ..., "date": ..., "description": ..., "amount": ..., ...}]
-        # Example error: [{"status": "ERROR_ACCOUNT_NOT_FOUND", "message": "..."}]
-        # Example no_transactions: [{"status": "NO_TRANSACTIONS_FOUND", "message": "..."}]
-
-        if bq_transactions and isinstance(bq_transactions, list) and len(bq_transactions) > 0:
-            first_item = bq_transactions[0]
-            if isinstance(first_item, dict) and first_item.get("status") and "ERROR" in first_item.get("status"):
-                api_response = {"status": "error", "message": first_item.get("message", "Error fetching transaction history.")}
-            elif isinstance(first_item, dict) and first_item.get("status") == "NO_TRANSACTIONS_FOUND":
-                 api_response = {"status": "success", "account_type": account_type, "transactions": []} # Return empty list for no transactions
-            else:
-                # Assuming success if no error status, map to expected format if needed
-                # The BQ function already returns transactions in a good list format.
-                # The original static response had "id" instead of "transaction_id". Let's align.
-                formatted_transactions = []
-                for t in bq_transactions:
-                    formatted_transactions.append({
-                        "id": t.get("transaction_id"),
-                        "date": t.get("date"),
-                        "description": t.get("description"),
-                        "amount": t.get("amount"),
-                        "currency": t.get("currency")
-                        # Add other fields if the Gemini schema expects them (e.g., type, status from BQ)
-                    })
-                api_response = {"status": "success", "account_type": account_type, "transactions": formatted_transactions}
-        elif isinstance(bq_transactions, list) and not bq_transactions: # Empty list means success with no transactions
-            api_response = {"status": "success", "account_type": account_type, "transactions": []}
+        page_size = int(limit) if limit else 5
+        page = None
+        session = current_session()
+        if session and page_size > 0 and not any((cursor, start_date, end_date, min_amount, max_amount)):
+            # First unfiltered page: usually already prefetched for this session
+            page = await session.get_transaction_page(account_type, page_size)
+            if page:
+                logger.info(f"[{tool_name}] Served from session cache: {page}")
+        if page is None:
+            page = await bigquery_async.get_transaction_history_page(
+                account_type, page_size=page_size, cursor=cursor, start_date=start_date,
+                end_date=end_date, min_amount=min_amount, max_amount=max_amount)
+            logger.info(f"[{tool_name}] Received from bigquery_functions.get_transaction_history_page: {page}")
+        # page is {"status": "SUCCESS" | "NO_TRANSACTIONS_FOUND", "transactions": [...], "next_cursor": ...}
+        # or an error dict such as {"status": "ERROR_ACCOUNT_NOT_FOUND", "message": "..."}
+
+        if page.get("status") in ("SUCCESS", "NO_TRANSACTIONS_FOUND"):
+            # The original static response had "id" instead of "transaction_id". Keep that shape.
+            formatted_transactions = []
+            for t in page.get("transactions", []):
+                formatted_transactions.append({
+                    "id": t.get("transaction_id"),
+                    "date": t.get("date"),
+                    "description": t.get("description"),
+                    "amount": t.get("amount"),
+                    "currency": t.get("currency")
+                })
+            api_response = {"status": "success", "account_type": account_type, "transactions": formatted_transactions,
+                            "has_more": bool(page.get("next_cursor"))}
+            if page.get("next_cursor"):
+                api_response["next_cursor"] = page["next_cursor"]
         else:
-            api_response = {"status": "error", "message": "Failed to retrieve transaction history in expected format."}
+            api_response = {"status": "error", "message": page.get("message", "Error fetching transaction history.")}
     except Exception as e:
         logger.error(f"[{tool_name}] Error calling BQ or processing result for getTransactionHistory: {e}", exc_info=True)
         api_response = {"status": "error", "message": f"An internal error occurred while fetching transaction history for {account_type}."}
@@ -285,7 +309,7 @@ async def initiateFundTransfer(amount: float, currency: str, from_account_type:
     api_response = {}
     try:
         # This function in gemini_tools is for initiating, the BQ one is for checking
-        check_result = bigquery_functions.initiate_fund_transfer_check(from_account_type, to_account_type, amount)
+        check_result = await bigquery_async.initiate_fund_transfer_check(from_account_type, to_account_type, amount)
         logger.info(f"[{tool_name}] Received from bigquery_functions.initiate_fund_transfer_check: {check_result}")
     
         # Expected by Gemini: "status": "requires_confirmation", "message": ..., "transfer_details": {...}
@@ -328,7 +352,7 @@ async def executeFundTransfer(amount: float, currency: str, from_account_id: str
     api_response = {}
     try:
         # The BQ function `execute_fund_transfer` simulates the transfer and logs.
-        bq_result = bigquery_functions.execute_fund_transfer(from_account_id, to_account_id, amount, currency, memo)
+        bq_result = await bigquery_async.execute_fund_transfer(from_account_id, to_account_id, amount, currency, memo)
         logger.info(f"[{tool_name}] Received from bigquery_functions.execute_fund_transfer: {bq_result}")
         # BQ result: {"status": "SUCCESS", "transaction_id": ..., "message": ...}
         # or error: {"status": "ERROR_CLIENT_NOT_INITIALIZED", ...}
@@ -347,6 +371,7 @@ async def executeFundTransfer(amount: float, currency: str, from_account_id: str
     except Exception as e:
         logger.error(f"[{tool_name}] Error calling BQ or processing result for executeFundTransfer: {e}", exc_info=True)
         api_response = {"status": "error", "message": "An internal error occurred while executing fund transfer."}
+    _invalidate_session_cache(ACCOUNTS, TRANSACTIONS)
     
     _log_tool_event("INVOCATION_END", tool_name, params_sent, api_response)
     return api_response
@@ -358,7 +383,7 @@ async def getBillDetails(bill_type: str, payee_nickname: str = None):
     logger.info(f"[{tool_name}] Attempting to call bigquery_functions.get_bill_details with bill_type: {bill_type}, payee_nickname: {payee_nickname}")
     api_response = {}
     try:
-        bq_result = bigquery_functions.get_bill_details(bill_type, payee_nickname)
+        bq_result = await bigquery_async.get_bill_details(bill_type, payee_nickname)
         logger.info(f"[{tool_name}] Received from bigquery_functions.get_bill_details: {bq_result}")
         # BQ Success: {"status": "SUCCESS", "payee_id": ..., "payee_name": ..., "due_amount": ..., ...}
         # BQ Error: {"status": "ERROR_BILLER_NOT_FOUND", ...} or {"status": "AMBIGUOUS_BILLER_FOUND", ...}
@@ -398,7 +423,7 @@ async def resolve_account_by_name(user_id: str, natural_language_name: str) -> d
     logger.info(f"[{tool_name}] Attempting to call bigquery_functions.find_account_by_natural_language for user {user_id} with name '{natural_language_name}'")
     
     try:
-        resolution_result = bigquery_functions.find_account_by_natural_language(user_id, natural_language_name)
+        resolution_result = await bigquery_async.find_account_by_natural_language(user_id, natural_language_name)
         logger.info(f"[{tool_name}] Received from bigquery_functions.find_account_by_natural_language: {resolution_result}")
         
         # Directly return the result from BQ function as it already has status, message, account_id etc.
@@ -419,11 +444,18 @@ async def resolve_biller_by_name(user_id: str, biller_name: str) -> dict:
     logger.info(f"[{tool_name}] Attempting to find biller by name for user {user_id} with name '{biller_name}'")
     
     try:
-        # Get list of all billers for the user
-        all_billers_result = bigquery_functions.list_registered_billers(user_id)
-        logger.info(f"[{tool_name}] Retrieved billers: {all_billers_result}")
-        
-        if all_billers_result.get("status") != "SUCCESS" or not all_billers_result.get("billers"):
+        index = BILLER_INDEX.get(user_id)
+        if index is None:
+            # Build the index from the user's billers (prefetched for the session when possible)
+            session = current_session()
+            all_billers_result = await session.get_billers() if session and session.user_id == user_id else None
+            if all_billers_result is None:
+                all_billers_result = await bigquery_async.list_registered_billers(user_id)
+            logger.info(f"[{tool_name}] Retrieved billers: {all_billers_result}")
+            if all_billers_result.get("status") in ("SUCCESS", "NO_BILLERS_FOUND"):
+                index = BILLER_INDEX.put(user_id, all_billers_result.get("billers", []))
+
+        if not index:
             error_response = {
                 "status": "ERROR_NO_BILLERS_FOUND", 
                 "message": f"No billers found for user {user_id}"
@@ -431,67 +463,44 @@ async def resolve_biller_by_name(user_id: str, biller_name: str) -> dict:
             _log_tool_event("INVOCATION_END", tool_name, params_sent, error_response)
             return error_response
         
-        # Lowercase the input for case-insensitive comparison
-        biller_name_lower = biller_name.lower()
-        
-        # First try exact match on biller_name or biller_nickname
-        exact_matches = []
-        partial_matches = []
-        
-        for biller in all_billers_result["billers"]:
-            # Check for exact matches
-            if (biller.get("biller_name", "").lower() == biller_name_lower or 
-                    biller.get("payee_nickname", "").lower() == biller_name_lower):
-                exact_matches.append(biller)
-            
-            # Check for partial matches
-            elif (biller_name_lower in biller.get("biller_name", "").lower() or
-                  (biller.get("payee_nickname") and biller_name_lower in biller.get("payee_nickname", "").lower())):
-                partial_matches.append(biller)
-        
-        # Return the first exact match if found
-        if exact_matches:
-            if len(exact_matches) == 1:
-                biller = exact_matches[0]
-                result = {
-                    "status": "SUCCESS",
-                    "biller_id": biller["biller_id"],
-                    "biller_name": biller["biller_name"]
-                }
-                _log_tool_event("INVOCATION_END", tool_name, params_sent, result)
-                return result
-            else:
-                # Multiple exact matches, return ambiguity error
-                ambiguous_options = [{"biller_id": b["biller_id"], "biller_name": b["biller_name"]} for b in exact_matches]
-                error_response = {
-                    "status": "ERROR_AMBIGUOUS_BILLER",
-                    "message": f"Multiple billers match '{biller_name}'. Please specify which one.",
-                    "options": ambiguous_options
-                }
-                _log_tool_event("INVOCATION_END", tool_name, params_sent, error_response)
-                return error_response
-        
-        # If no exact match, try partial matches
-        if partial_matches:
-            if len(partial_matches) == 1:
-                biller = partial_matches[0]
-                result = {
-                    "status": "SUCCESS",
-                    "biller_id": biller["biller_id"],
-                    "biller_name": biller["biller_name"]
-                }
-                _log_tool_event("INVOCATION_END", tool_name, params_sent, result)
-                return result
-            else:
-                # Multiple partial matches, return ambiguity error
-                ambiguous_options = [{"biller_id": b["biller_id"], "biller_name": b["biller_name"]} for b in partial_matches]
-                error_response = {
-                    "status": "ERROR_AMBIGUOUS_BILLER",
-                    "message": f"Multiple billers contain '{biller_name}'. Please specify which one.",
-                    "options": ambiguous_options
-                }
-                _log_tool_event("INVOCATION_END", tool_name, params_sent, error_response)
-                return error_response
+        match_type, matches = index.lookup(biller_name)
+        logger.info(f"[{tool_name}] Index lookup for '{biller_name}': {match_type} -> {[b['biller_id'] for b in matches]}")
+
+        if len(matches) == 1 and match_type in CONFIRM_MATCH_TYPES:
+            # Only sounds like / resembles the name: never pay it without the user's confirmation
+            biller = matches[0]
+            error_response = {
+                "status": "ERROR_BILLER_NEEDS_CONFIRMATION",
+                "message": f"No biller is named '{biller_name}'. The closest match is '{biller['biller_name']}'. "
+                           f"Ask the user to confirm it before paying with its biller_id.",
+                "match_type": match_type,
+                "candidate": {"biller_id": biller["biller_id"], "biller_name": biller["biller_name"],
+                              "payee_nickname": biller.get("payee_nickname")}
+            }
+            _log_tool_event("INVOCATION_END", tool_name, params_sent, error_response)
+            return error_response
+
+        if len(matches) == 1:
+            biller = matches[0]
+            result = {
+                "status": "SUCCESS",
+                "biller_id": biller["biller_id"],
+                "biller_name": biller["biller_name"]
+            }
+            _log_tool_event("INVOCATION_END", tool_name, params_sent, result)
+            return result
+
+        if matches:
+            # Multiple billers in the best matching tier, return ambiguity error
+            ambiguous_options = [{"biller_id": b["biller_id"], "biller_name": b["biller_name"]} for b in matches]
+            verb = "match" if match_type == "exact" else "contain" if match_type == "partial" else "sound like"
+            error_response = {
+                "status": "ERROR_AMBIGUOUS_BILLER",
+                "message": f"Multiple billers {verb} '{biller_name}'. Please specify which one.",
+                "options": ambiguous_options
+            }
+            _log_tool_event("INVOCATION_END", tool_name, params_sent, error_response)
+            return error_response
         
         # No matches found
         error_response = {
@@ -516,11 +525,23 @@ async def payBill(payee_id: str, amount: float, from_account_id: str):
     
     resolved_from_account_id = from_account_id
     resolved_payee_id = payee_id
-    
-    # Attempt to resolve if from_account_id doesn't look like a direct ID
-    if not from_account_id.startswith("acc_"):
+    resolved_payee_name = payee_id
+    needs_account_resolution = not from_account_id.startswith("acc_")
+    needs_biller_resolution = not payee_id.startswith("biller_")
+
+    # Account and biller names are independent lookups, so resolve them concurrently
+    resolution_tasks = []
+    if needs_account_resolution:
         logger.info(f"[{tool_name}] '{from_account_id}' doesn't look like a direct account ID. Attempting natural language resolution for user {USER_ID}.")
-        resolution_result = await resolve_account_by_name(USER_ID, from_account_id)
+        resolution_tasks.append(resolve_account_by_name(USER_ID, from_account_id))
+    if needs_biller_resolution:
+        logger.info(f"[{tool_name}] '{payee_id}' doesn't look like a direct biller ID. Attempting biller name resolution for user {USER_ID}.")
+        resolution_tasks.append(resolve_biller_by_name(USER_ID, payee_id))
+    resolution_results = list(await asyncio.gather(*resolution_tasks))
+
+    # Attempt to resolve if from_account_id doesn't look like a direct ID
+    if needs_account_resolution:
+        resolution_result = resolution_results.pop(0)
         
         if resolution_result.get("status") == "SUCCESS":
             resolved_from_account_id = resolution_result["account_id"]
@@ -532,12 +553,12 @@ async def payBill(payee_id: str, amount: float, from_account_id: str):
             return resolution_result # Return the error from resolver
     
     # Attempt to resolve if payee_id doesn't look like a direct biller ID
-    if not payee_id.startswith("biller_"):
-        logger.info(f"[{tool_name}] '{payee_id}' doesn't look like a direct biller ID. Attempting biller name resolution for user {USER_ID}.")
-        biller_resolution_result = await resolve_biller_by_name(USER_ID, payee_id)
+    if needs_biller_resolution:
+        biller_resolution_result = resolution_results.pop(0)
         
         if biller_resolution_result.get("status") == "SUCCESS":
             resolved_payee_id = biller_resolution_result["biller_id"]
+            resolved_payee_name = biller_resolution_result["biller_name"]
             logger.info(f"[{tool_name}] Resolved biller name '{payee_id}' to biller ID '{resolved_payee_id}'.")
         else:
             # If resolution fails, return the error message from resolution
@@ -548,7 +569,7 @@ async def payBill(payee_id: str, amount: float, from_account_id: str):
     logger.info(f"[{tool_name}] Attempting to call bigquery_functions.pay_bill with payee_id: {resolved_payee_id}, amount: {amount}, resolved_from_account_id: {resolved_from_account_id}, user_id: {USER_ID}")
     api_response = {}
     try:
-        bq_result = bigquery_functions.pay_bill(payee_id=resolved_payee_id, amount=amount, from_account_id=resolved_from_account_id, user_id=USER_ID)
+        bq_result = await bigquery_async.pay_bill(payee_id=resolved_payee_id, amount=amount, from_account_id=resolved_from_account_id, user_id=USER_ID)
         logger.info(f"[{tool_name}] Received from bigquery_functions.pay_bill: {bq_result}")
         # BQ Success: {"status": "SUCCESS", "confirmation_number": ..., "message": ...}
         # BQ Error: {"status": "INSUFFICIENT_FUNDS", ...} or {"status": "ERROR_PAYEE_NOT_FOUND", ...}
@@ -556,7 +577,7 @@ async def payBill(payee_id: str, amount: float, from_account_id: str):
         if bq_result.get("status") == "SUCCESS":
             api_response = {
                 "status": "success",
-                "message": bq_result.get("message", f"Bill payment to {payee_id} processed."),
+                "message": bq_result.get("message", f"Bill payment to {resolved_payee_name} processed."),
                 "payment_confirmation_id": bq_result.get("confirmation_number", "N/A")
             }
         else:
@@ -567,6 +588,7 @@ async def payBill(payee_id: str, amount: float, from_account_id: str):
     except Exception as e:
         logger.error(f"[{tool_name}] Error calling BQ or processing result for payBill: {e}", exc_info=True)
         api_response = {"status": "error", "message": "An internal error occurred while processing bill payment."}
+    _invalidate_session_cache(ACCOUNTS, TRANSACTIONS, BILLERS) # Balance, history and due amount change
 
     _log_tool_event("INVOCATION_END", tool_name, params_sent, api_response) # Log with original params
     return api_response
@@ -582,7 +604,7 @@ async def registerBiller(biller_name: str, biller_type: str, account_number: str
     logger.info(f"[{tool_name}] Attempting to call bigquery_functions.register_biller for user {USER_ID}")
     api_response = {}
     try:
-        bq_result = bigquery_functions.register_biller(
+        bq_result = await bigquery_async.register_biller(
             user_id=USER_ID, # Using the imported USER_ID
             biller_name=biller_name,
             biller_type=biller_type,
@@ -598,6 +620,7 @@ async def registerBiller(biller_name: str, biller_type: str, account_number: str
     except Exception as e:
         logger.error(f"[{tool_name}] Error calling BQ or processing result: {e}", exc_info=True)
         api_response = {"status": "error", "message": f"An internal error occurred: {str(e)}"}
+    _invalidate_session_cache(BILLERS)
     _log_tool_event("INVOCATION_END", tool_name, params_sent, api_response)
     return api_response
 
@@ -608,7 +631,7 @@ async def updateBillerDetails(payee_id: str, updates: dict):
     logger.info(f"[{tool_name}] Attempting to call bigquery_functions.update_biller_details for user {USER_ID}, payee_id {payee_id}")
     api_response = {}
     try:
-        bq_result = bigquery_functions.update_biller_details(
+        bq_result = await bigquery_async.update_biller_details(
             user_id=USER_ID, # Using the imported USER_ID
             payee_id=payee_id,
             updates=updates
@@ -618,6 +641,7 @@ async def updateBillerDetails(payee_id: str, updates: dict):
     except Exception as e:
         logger.error(f"[{tool_name}] Error calling BQ or processing result: {e}", exc_info=True)
         api_response = {"status": "error", "message": f"An internal error occurred: {str(e)}"}
+    _invalidate_session_cache(BILLERS)
     _log_tool_event("INVOCATION_END", tool_name, params_sent, api_response)
     return api_response
 
@@ -628,7 +652,7 @@ async def removeBiller(payee_id: str):
     logger.info(f"[{tool_name}] Attempting to call bigquery_functions.remove_biller for user {USER_ID}, payee_id {payee_id}")
     api_response = {}
     try:
-        bq_result = bigquery_functions.remove_biller(
+        bq_result = await bigquery_async.remove_biller(
             user_id=USER_ID, # Using the imported USER_ID
             payee_id=payee_id
         )
@@ -637,6 +661,7 @@ async def removeBiller(payee_id: str):
     except Exception as e:
         logger.error(f"[{tool_name}] Error calling BQ or processing result: {e}", exc_info=True)
         api_response = {"status": "error", "message": f"An internal error occurred: {str(e)}"}
+    _invalidate_session_cache(BILLERS)
     _log_tool_event("INVOCATION_END", tool_name, params_sent, api_response)
     return api_response
 
@@ -647,11 +672,16 @@ async def listRegisteredBillers():
     logger.info(f"[{tool_name}] Attempting to call bigquery_functions.list_registered_billers for user {USER_ID}") # Status removed from log
     api_response = {}
     try:
-        bq_result = bigquery_functions.list_registered_billers(
-            user_id=USER_ID # Using the imported USER_ID
-            # status parameter removed from BQ call
-        )
-        logger.info(f"[{tool_name}] Received from bigquery_functions.list_registered_billers: {bq_result}")
+        session = current_session()
+        bq_result = await session.get_billers() if session and session.user_id == USER_ID else None
+        if bq_result is not None:
+            logger.info(f"[{tool_name}] Served from session cache: {bq_result}")
+        else:
+            bq_result = await bigquery_async.list_registered_billers(
+                user_id=USER_ID # Using the imported USER_ID
+                # status parameter removed from BQ call
+            )
+            logger.info(f"[{tool_name}] Received from bigquery_functions.list_registered_billers: {bq_result}")
         # Expected: {"status": "SUCCESS", "billers": [...]} or error
         if bq_result.get("status") == "SUCCESS":
             api_response = {
@@ -676,6 +706,14 @@ async def listRegisteredBillers():
     _log_tool_event("INVOCATION_END", tool_name, params_sent, api_response)
     return api_response
 
+# --- FAQ search (Discovery Engine) ---
+FAQ_PROJECT_ID = "account-pocs"
+FAQ_LOCATION = "global"
+FAQ_MAX_CONCURRENCY = int(os.getenv("FAQ_MAX_CONCURRENCY", "8")) # Searches in flight per process
+FAQ_SEARCH_TIMEOUT_SECONDS = float(os.getenv("FAQ_SEARCH_TIMEOUT_SECONDS", "8"))
+FAQ_SERVING_CONFIG = (f"projects/{FAQ_PROJECT_ID}/locations/{FAQ_LOCATION}/collections/default_collection"
+                      f"/engines/{SEARCH_ENGINE_ID}/servingConfigs/default_config")
+
 def search_spec():
     content_search_spec = discoveryengine.SearchRequest.ContentSearchSpec(
         snippet_spec=discoveryengine.SearchRequest.ContentSearchSpec.SnippetSpec(
@@ -688,6 +726,39 @@ def search_spec():
     )
     return content_search_spec
 
+# The request options never change, so they are built once
+_FAQ_CONTENT_SEARCH_SPEC = search_spec()
+_FAQ_QUERY_EXPANSION_SPEC = discoveryengine.SearchRequest.QueryExpansionSpec(
+    condition=discoveryengine.SearchRequest.QueryExpansionSpec.Condition.AUTO,
+)
+_FAQ_SPELL_CORRECTION_SPEC = discoveryengine.SearchRequest.SpellCorrectionSpec(
+    mode=discoveryengine.SearchRequest.SpellCorrectionSpec.Mode.AUTO
+)
+
+# One async client (one gRPC channel, reused across calls) and concurrency limit per event
+# loop; grpc.aio channels are bound to the loop they were created on.
+_faq_clients = {} # loop -> (SearchServiceAsyncClient, asyncio.Semaphore)
+
+def _faq_search_client():
+    loop = asyncio.get_running_loop()
+    entry = _faq_clients.get(loop)
+    if entry is None:
+        client_options = (
+            ClientOptions(api_endpoint=f"{FAQ_LOCATION}-discoveryengine.googleapis.com")
+            if FAQ_LOCATION != "global"
+            else None
+        )
+        entry = (discoveryengine.SearchServiceAsyncClient(client_options=client_options), asyncio.Semaphore(FAQ_MAX_CONCURRENCY))
+        _faq_clients[loop] = entry
+        logger.info(f"[_faq_search_client] Created Discovery Engine search client (max {FAQ_MAX_CONCURRENCY} concurrent searches).")
+    return entry
+
+async def close_faq_search_client():
+    """Closes the current loop's FAQ search client (called when the server stops)."""
+    entry = _faq_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[0].transport.close()
+
 async def search_faq(search_query: str) -> str:
     """Searches and provides answers to bank-related Frequently Asked Questions (FAQs).
 
@@ -696,12 +767,22 @@ async def search_faq(search_query: str) -> str:
     questions a user might have for the bank.
 
     The underlying search is configured with:
-    - A specific project ID ("account-pocs") and location ("global").
+    - A specific project ID (FAQ_PROJECT_ID) and location (FAQ_LOCATION).
     - A predefined search engine ID (SEARCH_ENGINE_ID).
     - Content search specifications for snippets and summaries.
     - Automatic query expansion.
     - Automatic spell correction.
 
+    Answers are cached per session language under a normalized form of the
+    question (faq_cache.FAQ_CACHE), so repeated questions skip the search. The
+    local FAQ corpus (faq_index), when configured and written in the session
+    language, answers first or when the remote search fails, depending on
+    FAQ_LOCAL_MODE.
+
+    The search client is shared by all calls on the event loop. At most
+    FAQ_MAX_CONCURRENCY searches run at once and each one is bounded by
+    FAQ_SEARCH_TIMEOUT_SECONDS.
+
     Args:
         search_query: The string containing the user's question or search query.
 
@@ -709,35 +790,62 @@ async def search_faq(search_query: str) -> str:
         A string containing the summary text from the search response, aiming to
         answer the user's FAQ.
     """
-    location = "global"
-    project_id = "account-pocs"
-    engine_id = SEARCH_ENGINE_ID
-
-    client_options = (
-        ClientOptions(api_endpoint=f"{location}-discoveryengine.googleapis.com")
-        if location != "global"
-        else None
-    )
-
-    client = discoveryengine.SearchServiceClient(client_options=client_options)
-
-    serving_config = f"projects/{project_id}/locations/{location}/collections/default_collection/engines/{engine_id}/servingConfigs/default_config"
+    tool_name = "search_faq"
+    session = current_session()
+    language = session.language if session else None
+    params_sent = {"search_query": search_query, "language": language}
+    _log_tool_event("INVOCATION_START", tool_name, params_sent)
 
-    content_search_spec_config = search_spec()
+    cached = FAQ_CACHE.get(search_query, language) if FAQ_CACHE else None
+    if cached is not None:
+        _log_tool_event("INVOCATION_END", tool_name, params_sent, {"status": "success", "source": "cache", "answer": cached})
+        return cached
+    if FAQ_LOCAL_MODE == "primary":
+        local = _search_faq_local(search_query, language)
+        if local is not None:
+            _log_tool_event("INVOCATION_END", tool_name, params_sent, {"status": "success", "source": "local_index", **local})
+            return local["answer"]
+    try:
+        answer = await _search_faq_remote(search_query)
+    except Exception as e:
+        logger.error(f"[{tool_name}] FAQ search failed for '{search_query}': {e}")
+        local = _search_faq_local(search_query, language) if FAQ_LOCAL_MODE == "fallback" else None
+        if local is not None: # Not cached, so the remote answer is used again once the search recovers
+            _log_tool_event("INVOCATION_END", tool_name, params_sent, {"status": "success", "source": "local_index_fallback", **local})
+            return local["answer"]
+        _log_tool_event("INVOCATION_END", tool_name, params_sent, {"status": "error", "message": str(e)})
+        raise
+    if FAQ_CACHE:
+        FAQ_CACHE.put(search_query, language, answer)
+    _log_tool_event("INVOCATION_END", tool_name, params_sent, {"status": "success", "source": "discovery_engine", "answer": answer})
+    return answer
+
+def _search_faq_local(search_query: str, language: str | None) -> dict | None:
+    """Best local FAQ entry scoring at least FAQ_LOCAL_MIN_SCORE ({"faq_id", "score", "answer"}), or None."""
+    if not covers_language(language): # An English entry is no answer to an id-ID or th-TH question
+        return None
+    index = get_faq_index()
+    if index is None:
+        return None
+    matches = index.search(search_query, top_k=1)
+    if not matches or matches[0]["score"] < FAQ_LOCAL_MIN_SCORE:
+        return None
+    return {"faq_id": matches[0]["id"], "score": matches[0]["score"], "answer": matches[0]["answer"]}
+
+async def _search_faq_remote(search_query: str) -> str:
+    """The Discovery Engine search behind search_faq (no cache); also used to warm FAQ_CACHE."""
+    client, limit = _faq_search_client()
 
     request = discoveryengine.SearchRequest(
-        serving_config=serving_config,
+        serving_config=FAQ_SERVING_CONFIG,
         query=search_query,
         page_size=10,
-        content_search_spec=content_search_spec_config,
-        query_expansion_spec=discoveryengine.SearchRequest.QueryExpansionSpec(
-            condition=discoveryengine.SearchRequest.QueryExpansionSpec.Condition.AUTO,
-        ),
-        spell_correction_spec=discoveryengine.SearchRequest.SpellCorrectionSpec(
-            mode=discoveryengine.SearchRequest.SpellCorrectionSpec.Mode.AUTO
-        ),
+        content_search_spec=_FAQ_CONTENT_SEARCH_SPEC,
+        query_expansion_spec=_FAQ_QUERY_EXPANSION_SPEC,
+        spell_correction_spec=_FAQ_SPELL_CORRECTION_SPEC,
     )
-    response = await asyncio.to_thread(client.search, request)
+    async with limit:
+        response = await client.search(request, timeout=FAQ_SEARCH_TIMEOUT_SECONDS)
     return response.summary.summary_text
 # Function Declaration for search_faq
 search_faq_declaration = types.FunctionDeclaration(
@@ -0,0 +1,219 @@
+"""
+Pool of pre-connected Gemini Live sessions per language.
+
+Every /listen connection used to await gemini_client.aio.live.connect (websocket
+handshake plus session setup) before it could forward any audio, so the connect time
+added directly to the time to first response. LiveSessionPool keeps a few sessions
+per language already connected with the same config the endpoint would use
+(main.build_live_config), and a connection takes one if it is available. Sessions are
+single-use: a taken session is never returned to the pool.
+
+A background task maintains the pool:
+- idle sessions whose websocket is no longer open, or that have been idle longer than
+  LIVE_POOL_MAX_IDLE_SECONDS, are closed and replaced,
+- the target size per language follows the recent connection rate: the number of
+  connections expected within LIVE_POOL_HORIZON_SECONDS, based on the connections of
+  the last LIVE_POOL_RATE_WINDOW_SECONDS, clamped to LIVE_POOL_MIN_SIZE..LIVE_POOL_MAX_SIZE,
+- failed connects back off exponentially (per language) so an outage is not hammered.
+
+Idle sessions use Live API quota and count against the session's connection lifetime,
+so the pool only holds sessions after recent demand (LIVE_POOL_MIN_SIZE defaults to 0)
+and recycles them quickly: a session handed out has been idle at most
+LIVE_POOL_MAX_IDLE_SECONDS. A worker with no traffic in the last
+LIVE_POOL_RATE_WINDOW_SECONDS keeps no sessions open.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+LIVE_POOL_ENABLED = os.getenv("LIVE_POOL_ENABLED", "true").lower() in ("1", "true", "yes")
+LIVE_POOL_LANGUAGES = [lang.strip() for lang in os.getenv("LIVE_POOL_LANGUAGES", "en-IN,en-US,th-TH,id-ID").split(",") if lang.strip()]
+LIVE_POOL_MIN_SIZE = int(os.getenv("LIVE_POOL_MIN_SIZE", "0"))
+LIVE_POOL_MAX_SIZE = int(os.getenv("LIVE_POOL_MAX_SIZE", "4"))
+LIVE_POOL_MAX_IDLE_SECONDS = float(os.getenv("LIVE_POOL_MAX_IDLE_SECONDS", "30"))
+LIVE_POOL_CHECK_INTERVAL_SECONDS = float(os.getenv("LIVE_POOL_CHECK_INTERVAL_SECONDS", "5"))
+LIVE_POOL_RATE_WINDOW_SECONDS = float(os.getenv("LIVE_POOL_RATE_WINDOW_SECONDS", "120"))
+LIVE_POOL_HORIZON_SECONDS = float(os.getenv("LIVE_POOL_HORIZON_SECONDS", "30"))
+LIVE_POOL_MAX_BACKOFF_SECONDS = 60.0
+
+
+def _is_open(session) -> bool:
+    """Whether the session's websocket is still open (True when it cannot be told)."""
+    ws = getattr(session, "_ws", None)
+    if ws is None:
+        return True
+    state = getattr(ws, "state", None)
+    if state is not None:
+        return getattr(state, "name", "OPEN") == "OPEN"
+    return not getattr(ws, "closed", False)
+
+
+class PooledSession:
+    """A connected session taken from the pool; `async with` yields it and closes it on exit."""
+
+    def __init__(self, context_manager, session, language: str):
+        self._context_manager = context_manager # The entered live.connect(...) context
+        self.session = session
+        self.language = language
+        self.connected_at = time.monotonic()
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.connected_at
+
+    async def __aenter__(self):
+        return self.session
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._context_manager.__aexit__(exc_type, exc, tb)
+
+    async def close(self) -> None:
+        try:
+            await self._context_manager.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"[close] Error closing pooled {self.language} Live session: {e}")
+
+
+class LiveSessionPool:
+    """Pre-connected Live sessions per language, kept healthy and sized by demand."""
+
+    def __init__(self, connect, languages: list = LIVE_POOL_LANGUAGES, min_size: int = LIVE_POOL_MIN_SIZE,
+                 max_size: int = LIVE_POOL_MAX_SIZE, max_idle_seconds: float = LIVE_POOL_MAX_IDLE_SECONDS,
+                 check_interval: float = LIVE_POOL_CHECK_INTERVAL_SECONDS,
+                 rate_window: float = LIVE_POOL_RATE_WINDOW_SECONDS, horizon: float = LIVE_POOL_HORIZON_SECONDS):
+        self._connect = connect # language -> async context manager yielding a connected session
+        self.languages = list(languages)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.check_interval = check_interval
+        self.rate_window = rate_window
+        self.horizon = horizon
+        self._idle = {lang: deque() for lang in self.languages} # Oldest first
+        self._demand = {lang: deque() for lang in self.languages} # Acquire timestamps within rate_window
+        self._connecting = {lang: 0 for lang in self.languages}
+        self._retry_at = {lang: 0.0 for lang in self.languages}
+        self._failures = {lang: 0 for lang in self.languages}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._background = set() # Connect/close tasks (strong references until they finish)
+        self.hits = 0
+        self.misses = 0
+        self.connects = 0
+        self.connect_errors = 0
+        self.discarded = 0
+
+    # --- Connection side ---
+    def acquire(self, language: str) -> PooledSession | None:
+        """A healthy pre-connected session for the language, or None (caller connects itself)."""
+        if language not in self._idle:
+            return None
+        self._demand[language].append(time.monotonic())
+        idle = self._idle[language]
+        pooled = None
+        while idle:
+            candidate = idle.pop() # Newest first: least likely to have been dropped
+            if _is_open(candidate.session) and candidate.idle_seconds < self.max_idle_seconds:
+                pooled = candidate
+                break
+            self._discard(candidate)
+        if pooled is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._wakeup.set() # Replenish right away
+        return pooled
+
+    # --- Maintenance ---
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintain(), name="LiveSessionPool")
+
+    def target_size(self, language: str) -> int:
+        """Connections expected within the horizon at the recent rate, within min/max size."""
+        demand = self._demand[language]
+        cutoff = time.monotonic() - self.rate_window
+        while demand and demand[0] < cutoff:
+            demand.popleft()
+        expected = math.ceil(len(demand) / self.rate_window * self.horizon)
+        return max(self.min_size, min(self.max_size, expected))
+
+    async def _maintain(self) -> None:
+        while True:
+            for language in self.languages:
+                self._evict_stale(language)
+                missing = self.target_size(language) - len(self._idle[language]) - self._connecting[language]
+                if missing > 0 and time.monotonic() >= self._retry_at[language]:
+                    for _ in range(missing):
+                        self._connecting[language] += 1
+                        self._spawn(self._add_session(language), f"LiveSessionPoolConnect-{language}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _evict_stale(self, language: str) -> None:
+        idle = self._idle[language]
+        target = self.target_size(language)
+        for pooled in list(idle):
+            if not _is_open(pooled.session) or pooled.idle_seconds >= self.max_idle_seconds:
+                idle.remove(pooled)
+                self._discard(pooled)
+        while len(idle) > target: # Demand dropped: release the oldest extra sessions
+            self._discard(idle.popleft())
+
+    def _discard(self, pooled: PooledSession) -> None:
+        self.discarded += 1
+        self._spawn(pooled.close(), f"LiveSessionPoolClose-{pooled.language}")
+
+    def _spawn(self, coro, name: str) -> None:
+        task = asyncio.create_task(coro, name=name)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _add_session(self, language: str) -> None:
+        started = time.perf_counter()
+        try:
+            context_manager = self._connect(language)
+            session = await context_manager.__aenter__()
+        except Exception as e:
+            self.connect_errors += 1
+            self._failures[language] += 1
+            backoff = min(LIVE_POOL_MAX_BACKOFF_SECONDS, self.check_interval * 2 ** (self._failures[language] - 1))
+            self._retry_at[language] = time.monotonic() + backoff
+            logger.warning(f"[_add_session] Could not pre-connect a {language} Live session: {e}; retrying in {backoff:.0f}s.")
+            return
+        finally:
+            self._connecting[language] -= 1
+        self.connects += 1
+        self._failures[language] = 0
+        pooled = PooledSession(context_manager, session, language)
+        if self._task is None: # Pool closed while connecting
+            await pooled.close()
+            return
+        self._idle[language].append(pooled)
+        logger.info(f"[_add_session] Pre-connected a {language} Live session in {(time.perf_counter() - started) * 1000.0:.0f} ms "
+                    f"({len(self._idle[language])} idle).")
+
+    async def close(self) -> None:
+        """Stops maintenance and closes every idle session."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        idle = [pooled for sessions in self._idle.values() for pooled in sessions]
+        for sessions in self._idle.values():
+            sessions.clear()
+        await asyncio.gather(*(pooled.close() for pooled in idle), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"enabled": True, "hits": self.hits, "misses": self.misses, "connects": self.connects,
+                "connect_errors": self.connect_errors, "discarded": self.discarded,
+                "languages": {lang: {"idle": len(self._idle[lang]), "connecting": self._connecting[lang],
+                                     "target": self.target_size(lang)} for lang in self.languages}}
@@ -0,0 +1,208 @@
+"""
+Background NDJSON file sink for structured log events.
+
+Subscribed to event_bus.EVENT_BUS by main.py. Publishing only puts the event on a
+bounded queue, so a tool call or an audio frame never waits for formatting or disk
+I/O; when the queue is full the event is dropped and counted instead of blocking.
+A daemon thread drains the queue in batches, serializes each event as one JSON line
+and appends the batch to the current segment file in LOG_SINK_DIR.
+
+Segments rotate when they reach LOG_SINK_MAX_SEGMENT_BYTES or are older than
+LOG_SINK_MAX_SEGMENT_SECONDS. Closed segments are gzip-compressed (unless
+LOG_SINK_COMPRESS=false) and only the newest LOG_SINK_MAX_SEGMENTS are kept.
+"""
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+from log_store import log_session_id
+
+logger = logging.getLogger(__name__)
+
+LOG_SINK_ENABLED = os.getenv("LOG_SINK_ENABLED", "true").lower() in ("1", "true", "yes")
+LOG_SINK_DIR = os.getenv("LOG_SINK_DIR", "logs")
+LOG_SINK_QUEUE_SIZE = int(os.getenv("LOG_SINK_QUEUE_SIZE", "10000"))
+LOG_SINK_BATCH_SIZE = int(os.getenv("LOG_SINK_BATCH_SIZE", "500"))
+LOG_SINK_FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_SINK_FLUSH_INTERVAL_SECONDS", "1.0"))
+LOG_SINK_MAX_SEGMENT_BYTES = int(os.getenv("LOG_SINK_MAX_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+LOG_SINK_MAX_SEGMENT_SECONDS = float(os.getenv("LOG_SINK_MAX_SEGMENT_SECONDS", "3600"))
+LOG_SINK_COMPRESS = os.getenv("LOG_SINK_COMPRESS", "true").lower() in ("1", "true", "yes")
+LOG_SINK_MAX_SEGMENTS = int(os.getenv("LOG_SINK_MAX_SEGMENTS", "48"))
+
+_STOP = object() # Queue sentinel for close()
+
+
+class NdjsonLogSink:
+    """Event subscriber that batches events into rotating NDJSON segment files."""
+
+    def __init__(self, directory: str = LOG_SINK_DIR, max_queue: int = LOG_SINK_QUEUE_SIZE,
+                 batch_size: int = LOG_SINK_BATCH_SIZE, flush_interval: float = LOG_SINK_FLUSH_INTERVAL_SECONDS,
+                 max_segment_bytes: int = LOG_SINK_MAX_SEGMENT_BYTES, max_segment_seconds: float = LOG_SINK_MAX_SEGMENT_SECONDS,
+                 compress: bool = LOG_SINK_COMPRESS, max_segments: int = LOG_SINK_MAX_SEGMENTS):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.compress = compress
+        self.max_segments = max_segments
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        # Current segment, touched only by the writer thread
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._segment_bytes = 0
+        self._segment_counter = 0
+        # Counters
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+
+    # --- Publisher side (any thread, must stay cheap) ---
+    def __call__(self, event: dict) -> None:
+        if self._closed:
+            return
+        if self._thread is None:
+            self._start()
+        entry = dict(event) # Top-level snapshot; serialized later on the writer thread
+        if "session_id" not in entry:
+            session_id = log_session_id.get()
+            if session_id:
+                entry["session_id"] = session_id
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+                self._thread.start()
+
+    # --- Writer thread ---
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_rotate() # Time-based rotation even when idle
+                continue
+            batch = []
+            for item in self._next_items(first):
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write_batch(batch)
+        self._close_segment()
+
+    def _next_items(self, first):
+        yield first
+        for _ in range(self.batch_size - 1):
+            try:
+                yield self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _write_batch(self, batch: list) -> None:
+        lines = []
+        for entry in batch:
+            try:
+                lines.append(json.dumps(entry, default=str))
+            except Exception as e: # e.g. the payload was mutated while serializing
+                self.errors += 1
+                lines.append(json.dumps({"log_type": "LOG_SINK_ERROR", "error": str(e), "entry": repr(entry)}))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        try:
+            self._maybe_rotate()
+            if self._file is None:
+                self._open_segment()
+            self._file.write(data)
+            self._file.flush()
+            self._segment_bytes += len(data)
+            self.written += len(batch)
+            self.batches += 1
+        except OSError as e:
+            self.errors += 1
+            self.dropped += len(batch)
+            logger.error(f"[_write_batch] Could not write {len(batch)} log events to {self._path}: {e}")
+            self._close_segment()
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._segment_counter += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self._path = os.path.join(self.directory, f"events-{stamp}-{os.getpid()}-{self._segment_counter:04d}.ndjson")
+        self._file = open(self._path, "ab")
+        self._opened_at = time.monotonic()
+        self._segment_bytes = 0
+
+    def _maybe_rotate(self) -> None:
+        if self._file is None:
+            return
+        if self._segment_bytes >= self.max_segment_bytes or time.monotonic() - self._opened_at >= self.max_segment_seconds:
+            self._close_segment()
+            self.rotations += 1
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        path = self._path
+        try:
+            self._file.close()
+            if self.compress:
+                with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(path)
+            self._prune()
+        except OSError as e:
+            self.errors += 1
+            logger.error(f"[_close_segment] Could not finalize log segment {path}: {e}")
+        finally:
+            self._file = None
+            self._path = None
+            self._segment_bytes = 0
+
+    def _prune(self) -> None:
+        """Deletes the oldest closed segments beyond max_segments."""
+        closed = sorted(glob.glob(os.path.join(self.directory, "events-*.ndjson.gz" if self.compress else "events-*.ndjson")),
+                        key=os.path.getmtime)
+        for path in closed[:max(0, len(closed) - self.max_segments)]:
+            os.remove(path)
+
+    # --- Lifecycle ---
+    def close(self, timeout: float = 5.0) -> None:
+        """Writes what is queued, closes (and compresses) the current segment and stops the thread."""
+        self._closed = True
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("[close] Log sink queue still full at shutdown; pending events are lost.")
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {"enabled": True, "directory": self.directory, "queued": self._queue.qsize(), "written": self.written,
+                "dropped": self.dropped, "batches": self.batches, "rotations": self.rotations, "errors": self.errors,
+                "current_segment": self._path, "current_segment_bytes": self._segment_bytes}
+
+
+# Process-wide instance; main.py subscribes it to EVENT_BUS.
+LOG_SINK = NdjsonLogSink() if LOG_SINK_ENABLED else None
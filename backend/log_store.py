@@ -0,0 +1,116 @@
+"""
+Bounded, sequence-numbered in-memory log stores served by /api/logs.
+
+GLOBAL_LOG_STORE (structured BigQuery and tool events) and CAPTURED_STDOUT_LOGS (raw
+stdout) used to be plain lists: they grew for the lifetime of the worker and
+/api/logs copied both in full on every poll. Each store is now a ring buffer holding
+the newest LOG_STORE_CAPACITY entries. Every entry gets a `seq` from one counter shared
+by all stores, so merged results are in arrival order and clients can poll
+incrementally with `since=<last seq seen>`.
+
+Entries are also stamped with `timestamp`, `log_type` (when missing) and the
+`session_id` of the websocket session that produced them, if any.
+"""
+import heapq
+import itertools
+import os
+import threading
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+LOG_STORE_CAPACITY = int(os.getenv("LOG_STORE_CAPACITY", "5000"))
+
+# Shared by all stores so entries from different stores can be merged in arrival order.
+_sequence = itertools.count(1)
+
+# Session the current task/thread is working for; set by session_context.bind_session.
+log_session_id: ContextVar[str | None] = ContextVar("log_session_id", default=None)
+
+
+class RingLogStore:
+    """Thread-safe ring buffer of log entry dicts, oldest first."""
+
+    def __init__(self, default_log_type: str, capacity: int = LOG_STORE_CAPACITY):
+        self.default_log_type = default_log_type
+        self.capacity = capacity
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.RLock()
+        self._listeners = () # Called with each stored entry (including seq), e.g. live streams
+        self.dropped = 0 # Entries evicted because the buffer was full
+
+    def add_listener(self, callback) -> None:
+        with self._lock:
+            self._listeners = self._listeners + (callback,)
+
+    def remove_listener(self, callback) -> None:
+        with self._lock:
+            self._listeners = tuple(listener for listener in self._listeners if listener is not callback)
+
+    def append(self, entry: dict) -> int:
+        """Stores a copy of the entry and returns its sequence number."""
+        entry = dict(entry)
+        entry.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+        entry.setdefault("log_type", self.default_log_type)
+        if "session_id" not in entry:
+            session_id = log_session_id.get()
+            if session_id:
+                entry["session_id"] = session_id
+        with self._lock:
+            entry["seq"] = next(_sequence)
+            if len(self._entries) == self.capacity:
+                self.dropped += 1
+            self._entries.append(entry)
+            # Under the lock so listeners see each store's entries in seq order; they must be cheap
+            for listener in self._listeners:
+                listener(entry)
+        return entry["seq"]
+
+    def query(self, since: int = None, limit: int = None, log_types: set = None, session_id: str = None) -> list:
+        """
+        Entries with seq > since that match the filters, oldest first. With `since` the oldest
+        `limit` matches are returned (so a poller can page forward); without it, the newest.
+        """
+        with self._lock:
+            if since is None:
+                candidates = list(self._entries)
+            else:
+                # Entries are in seq order: walk back from the newest until `since` is reached
+                newer = []
+                for entry in reversed(self._entries):
+                    if entry["seq"] <= since:
+                        break
+                    newer.append(entry)
+                newer.reverse()
+                candidates = newer
+        matches = [entry for entry in candidates
+                   if (not log_types or entry.get("log_type") in log_types)
+                   and (session_id is None or entry.get("session_id") == session_id)]
+        if limit is not None:
+            matches = matches[:limit] if since is not None else matches[-limit:] if limit else []
+        return matches
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            last_seq = self._entries[-1]["seq"] if self._entries else None
+            return {"size": len(self._entries), "capacity": self.capacity, "dropped": self.dropped, "last_seq": last_seq}
+
+
+def query_stores(stores: list, since: int = None, limit: int = None, log_types: set = None, session_id: str = None) -> list:
+    """Runs the same query on several stores and merges the results by seq (limit applied overall)."""
+    merged = list(heapq.merge(*(store.query(since, limit, log_types, session_id) for store in stores),
+                              key=lambda entry: entry["seq"]))
+    if limit is not None:
+        merged = merged[:limit] if since is not None else merged[-limit:] if limit else []
+    return merged
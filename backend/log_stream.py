@@ -0,0 +1,109 @@
+"""
+Live push of log entries to dashboard clients (Server-Sent Events on /api/logs/stream).
+
+Instead of polling /api/logs and re-downloading the log array, a client keeps one
+streaming response open and receives every entry as it is stored. Each
+subscriber has its own bounded asyncio.Queue on the event loop. Log stores call
+the broker from whatever thread produced the entry, and the broker hands the entry to
+each subscriber's loop with call_soon_threadsafe. A subscriber that cannot keep up
+loses entries (counted and reported in the stream) instead of slowing producers.
+"""
+import asyncio
+import json
+import os
+import threading
+
+LOG_STREAM_QUEUE_SIZE = int(os.getenv("LOG_STREAM_QUEUE_SIZE", "1000"))
+# Comment line sent when nothing happened for this long, so proxies keep the connection open.
+LOG_STREAM_KEEPALIVE_SECONDS = float(os.getenv("LOG_STREAM_KEEPALIVE_SECONDS", "15"))
+
+
+class LogStreamSubscriber:
+    """One streaming client: filters plus a bounded queue owned by its event loop."""
+
+    def __init__(self, loop, log_types: set = None, session_id: str = None, max_queue: int = LOG_STREAM_QUEUE_SIZE):
+        self.loop = loop
+        self.log_types = log_types
+        self.session_id = session_id
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0 # Entries lost since the client was last told
+
+    def matches(self, entry: dict) -> bool:
+        return ((not self.log_types or entry.get("log_type") in self.log_types)
+                and (self.session_id is None or entry.get("session_id") == self.session_id))
+
+    def offer(self, entry: dict) -> None:
+        """Runs on the subscriber's loop."""
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class LogStreamBroker:
+    """Fans stored log entries out to the live stream subscribers."""
+
+    def __init__(self):
+        self._subscribers = () # Replaced on change, read without locking
+        self._lock = threading.Lock()
+
+    def attach(self, store) -> None:
+        store.add_listener(self.publish)
+
+    def subscribe(self, log_types: set = None, session_id: str = None) -> LogStreamSubscriber:
+        subscriber = LogStreamSubscriber(asyncio.get_running_loop(), log_types, session_id)
+        with self._lock:
+            self._subscribers = self._subscribers + (subscriber,)
+        return subscriber
+
+    def unsubscribe(self, subscriber: LogStreamSubscriber) -> None:
+        with self._lock:
+            self._subscribers = tuple(sub for sub in self._subscribers if sub is not subscriber)
+
+    def publish(self, entry: dict) -> None:
+        """Store listener; may run on any thread."""
+        for subscriber in self._subscribers:
+            if not subscriber.matches(entry):
+                continue
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, entry)
+            except RuntimeError: # The subscriber's loop is closed
+                self.unsubscribe(subscriber)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+
+def format_sse(entry: dict) -> str:
+    return f"id: {entry['seq']}\nevent: log\ndata: {json.dumps(entry, default=str)}\n\n"
+
+
+async def stream_entries(broker: LogStreamBroker, backfill, log_types: set = None, session_id: str = None):
+    """
+    Async generator of SSE frames: first `backfill()` (entries already stored, oldest first),
+    then live entries. Subscribes before backfilling so nothing is missed in between.
+    """
+    subscriber = broker.subscribe(log_types, session_id)
+    try:
+        last_seq = 0
+        for entry in backfill():
+            last_seq = entry["seq"]
+            yield format_sse(entry)
+        while True:
+            try:
+                entry = await asyncio.wait_for(subscriber.queue.get(), LOG_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if subscriber.dropped:
+                yield f"event: dropped\ndata: {json.dumps({'dropped': subscriber.dropped})}\n\n"
+                subscriber.dropped = 0
+            if entry["seq"] <= last_seq:
+                continue # Already sent by the backfill
+            yield format_sse(entry)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+# Process-wide broker; main.py attaches the log stores to it.
+LOG_STREAM_BROKER = LogStreamBroker()
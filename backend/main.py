@@ -1,16 +1,13 @@
 import asyncio
 import os
 import traceback
-import uuid # Added for generating unique IDs
 import sys # Added for stdout redirection
 import io  # Added for stdout redirection
-import json # Added for parsing log strings
-from quart import Quart, websocket, jsonify
+from quart import Quart, websocket, jsonify, request, make_response
 from quart_cors import cors
 import google.genai as genai
 from google.genai import types # Crucial for Content, Part, Blob
 from dotenv import load_dotenv
-from datetime import datetime, timezone # For timestamping raw stdout logs
 
 from gemini_tools import (
     banking_tool,
@@ -24,14 +21,35 @@ from gemini_tools import (
     updateBillerDetails,
     removeBiller,
     listRegisteredBillers,
-    search_faq
+    search_faq,
+    close_faq_search_client,
+    _search_faq_remote
 )
-from bigquery_functions import GLOBAL_LOG_STORE # Import the global log store
+from bigquery_functions import GLOBAL_LOG_STORE, USER_ID # Import the global log store
+import bigquery_async
+from session_context import SessionContext, bind_session, unbind_session
+from log_store import RingLogStore, query_stores
+from event_bus import EVENT_BUS, CONSOLE_WRITER
+from log_sink import LOG_SINK
+from log_stream import LOG_STREAM_BROKER, stream_entries
+from account_cache import ACCOUNT_CACHE
+from account_matcher import ACCOUNT_MATCHER
+from biller_index import BILLER_INDEX
+from faq_cache import FAQ_CACHE, FAQ_CACHE_WARM_INTERVAL_SECONDS
+from faq_index import get_faq_index
+from live_session_pool import LiveSessionPool, LIVE_POOL_ENABLED
+from tool_executor import ToolExecutor
+from tool_memo import ToolMemo, TOOL_MEMO_ENABLED, TOOL_MEMO_TOTALS
+from transcript_stream import TranscriptAccumulator, TRANSCRIPT_MODE_FULL
+from audio_pipeline import AudioFrameCoalescer, OutboundAudioQueue, AUDIO_INPUT_TOTALS, AUDIO_OUTPUT_TOTALS
 
 load_dotenv()
 
 # --- Log Capturing Setup ---
-CAPTURED_STDOUT_LOGS = []
+# Tool and BigQuery events reach the log store through event_bus; intercepting stdout only
+# adds plain print() output (RAW_STDOUT) to /api/logs and can be switched off.
+CAPTURE_STDOUT = os.getenv("CAPTURE_STDOUT", "true").lower() in ("1", "true", "yes")
+CAPTURED_STDOUT_LOGS = RingLogStore("RAW_STDOUT") # Newest LOG_STORE_CAPACITY stdout lines
 _original_stdout = sys.stdout
 
 class StdoutTee(io.TextIOBase):
@@ -43,32 +61,22 @@ class StdoutTee(io.TextIOBase):
         self._original_stdout.write(s) # Write to original stdout (console)
         s_stripped = s.strip()
         if s_stripped: # Avoid empty lines
-            try:
-                # Attempt to parse as JSON, assuming logs from gemini_tools are JSON strings
-                log_entry = json.loads(s_stripped)
-                # Ensure it has the expected structure for frontend if it's a TOOL_EVENT
-                if isinstance(log_entry, dict) and log_entry.get("log_type") == "TOOL_EVENT":
-                    self._log_list.append(log_entry)
-                else: # Not a TOOL_EVENT or not a dict, store as raw with context
-                    self._log_list.append({
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        "log_type": "RAW_STDOUT",
-                        "message": s_stripped,
-                        "parsed_json": log_entry if isinstance(log_entry, dict) else None
-                    })
-            except json.JSONDecodeError:
-                # If it's not JSON, store it as a raw string entry
-                self._log_list.append({
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                    "log_type": "RAW_STDOUT",
-                    "message": s_stripped
-                })
+            self._log_list.append({"log_type": "RAW_STDOUT", "message": s_stripped})
         return len(s)
 
     def flush(self):
         self._original_stdout.flush()
 
-sys.stdout = StdoutTee(_original_stdout, CAPTURED_STDOUT_LOGS)
+if CAPTURE_STDOUT:
+    sys.stdout = StdoutTee(_original_stdout, CAPTURED_STDOUT_LOGS)
+
+# Everything stored for /api/logs is also pushed to /api/logs/stream clients
+LOG_STREAM_BROKER.attach(GLOBAL_LOG_STORE)
+LOG_STREAM_BROKER.attach(CAPTURED_STDOUT_LOGS)
+
+# Tool and BigQuery events are also appended to NDJSON files by a background thread
+if LOG_SINK:
+    EVENT_BUS.subscribe(LOG_SINK)
 # --- End Log Capturing Setup ---
 
 GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -83,6 +91,40 @@ gemini_client = genai.Client(api_key=GOOGLE_API_KEY)
 GEMINI_MODEL_NAME = "gemini-2.0-flash-live-001"
 INPUT_SAMPLE_RATE = 16000
 
+def build_live_config(language: str, session_handle: str = None) -> types.LiveConnectConfig:
+    """Live session config for a /listen connection; the same for every session of a language."""
+    return types.LiveConnectConfig(
+        response_modalities=["AUDIO"], # Matched to reference
+        system_instruction="You are helpful assistant for banking services. You are currently interacting with a user who is using a voice-based interface to interact with you. You should respond to the user's voice commands in a natural and conversational manner.You should use the same language as the user, and you should not use any emojis or special characters.\
+            Your `user_id` is `user_krishnan_001` and your `biller_id` is `biller_k_elec_001`.",
+        speech_config=types.SpeechConfig(
+            language_code=language
+        ),
+        input_audio_transcription={},
+        output_audio_transcription={},
+        session_resumption=types.SessionResumptionConfig(handle=session_handle), # Added from reference
+        context_window_compression=types.ContextWindowCompressionConfig( # Added from reference
+            sliding_window=types.SlidingWindow(),
+        ),
+        # realtime_input_config=types.RealtimeInputConfig( # Added from reference
+        #     automatic_activity_detection=types.AutomaticActivityDetection(
+        #         disabled=False,
+        #         # start_of_speech_sensitivity=types.StartSensitivity.START_SENSITIVITY_HIGH,
+        #         # end_of_speech_sensitivity=types.EndSensitivity.END_SENSITIVITY_LOW,
+        #         # prefix_padding_ms=20,
+        #         # silence_duration_ms=100,
+        #     )
+        # ),
+        tools=[banking_tool] # Added banking_tool here
+    )
+
+def connect_live_session(language: str, session_handle: str = None):
+    """Async context manager that connects a Live session (used directly and by the session pool)."""
+    return gemini_client.aio.live.connect(model=GEMINI_MODEL_NAME, config=build_live_config(language, session_handle))
+
+# Pre-connected sessions per language, started in before_serving
+LIVE_SESSION_POOL = LiveSessionPool(connect_live_session) if LIVE_POOL_ENABLED else None
+
 app = Quart(__name__)
 app = cors(app, allow_origin="*")
 
@@ -91,6 +133,15 @@ async def websocket_endpoint():
     # print("Quart WebSocket: Connection accepted from client.")
     current_session_handle = None # Initialize session handle
 
+    # Load the user's accounts, billers and recent transactions while the Live session connects,
+    # so the first tool call is answered from memory. Tools find the context via a ContextVar.
+    session_ctx = SessionContext(USER_ID)
+    session_ctx_token = bind_session(session_ctx)
+    session_ctx.start_prefetch()
+
+    # "delta" clients get only the new text of each transcription chunk (see transcript_stream)
+    transcript_mode = websocket.args.get("transcript_mode", TRANSCRIPT_MODE_FULL)
+
     # Determine language code based on query parameter
     requested_lang = websocket.args.get("lang")
     supported_new_languages = ["en-US", "th-TH", "id-ID"]
@@ -104,47 +155,40 @@ async def websocket_endpoint():
             # print(f"Quart WebSocket: Requested language '{requested_lang}' not supported or invalid, defaulting to {language_code_to_use}")
         # else:
             # print(f"Quart WebSocket: No language specified, defaulting to {language_code_to_use}")
+    session_ctx.language = language_code_to_use # Tools that answer per language (search_faq) read it
 
-    gemini_live_config = types.LiveConnectConfig(
-        response_modalities=["AUDIO"], # Matched to reference
-        system_instruction="You are helpful assistant for banking services. You are currently interacting with a user who is using a voice-based interface to interact with you. You should respond to the user's voice commands in a natural and conversational manner.You should use the same language as the user, and you should not use any emojis or special characters.\
-            Your `user_id` is `user_krishnan_001` and your `biller_id` is `biller_k_elec_001`.",
-        speech_config=types.SpeechConfig(
-            language_code=language_code_to_use
-        ),
-        input_audio_transcription={},
-        output_audio_transcription={},
-        session_resumption=types.SessionResumptionConfig(handle=current_session_handle), # Added from reference
-        context_window_compression=types.ContextWindowCompressionConfig( # Added from reference
-            sliding_window=types.SlidingWindow(),
-        ),
-        # realtime_input_config=types.RealtimeInputConfig( # Added from reference
-        #     automatic_activity_detection=types.AutomaticActivityDetection(
-        #         disabled=False,
-        #         # start_of_speech_sensitivity=types.StartSensitivity.START_SENSITIVITY_HIGH,
-        #         # end_of_speech_sensitivity=types.EndSensitivity.END_SENSITIVITY_LOW,
-        #         # prefix_padding_ms=20,
-        #         # silence_duration_ms=100,
-        #     )
-        # ),
-        tools=[banking_tool] # Added banking_tool here
-    )
+    # A pre-connected session from the pool skips the connect round trip; otherwise connect now
+    live_session = LIVE_SESSION_POOL.acquire(language_code_to_use) if LIVE_SESSION_POOL else None
+    if live_session is None:
+        live_session = connect_live_session(language_code_to_use, current_session_handle)
 
     try:
-        async with gemini_client.aio.live.connect(
-            model=GEMINI_MODEL_NAME,
-            config=gemini_live_config
-        ) as session:
+        async with live_session as session:
             # print(f"Quart Backend: Gemini session connected for model {GEMINI_MODEL_NAME} with tools.")
-            active_processing = True
+            # Each direction runs as its own task and simply returns when it is done (client gone,
+            # Gemini error, ...). The session ends as soon as either task finishes and the other one
+            # is cancelled, so both loops only ever wait on real I/O: no timeouts, no sleeps.
+
+            async def send_audio_frame(frame: bytes):
+                await session.send_realtime_input(
+                    audio=types.Blob(
+                        mime_type=f"audio/pcm;rate={INPUT_SAMPLE_RATE}",
+                        data=frame
+                    )
+                )
+
+            # Mic chunks are re-framed to AUDIO_FRAME_MS and sent upstream by their own task
+            audio_input = AudioFrameCoalescer(send_audio_frame, INPUT_SAMPLE_RATE)
+            # Model audio is sent to the client by its own task so a slow client never stalls the
+            # Gemini receive loop, and an interrupt can drop whatever has not been sent yet
+            audio_output = OutboundAudioQueue(websocket.send)
 
             async def handle_client_input_and_forward():
-                nonlocal active_processing
                 # print("Quart Backend: Starting handle_client_input_and_forward task.")
                 try:
-                    while active_processing:
+                    while True:
                         try:
-                            client_data = await asyncio.wait_for(websocket.receive(), timeout=0.2) 
+                            client_data = await websocket.receive()
 
                             if isinstance(client_data, str):
                                 message_text = client_data
@@ -158,6 +202,7 @@ async def websocket_endpoint():
                                     role="user",
                                     parts=[types.Part(text=prompt_for_gemini)]
                                 )
+                                await audio_input.drain() # Speech that preceded the prompt reaches Gemini first
                                 await session.send_client_content(turns=user_content_for_text)
                                 # print(f"Quart Backend: Prompt '{prompt_for_gemini}' sent to Gemini.")
                             
@@ -165,36 +210,25 @@ async def websocket_endpoint():
                                 audio_chunk = client_data
                                 if audio_chunk:
                                     # print(f"Quart Backend: Received mic audio chunk: {len(audio_chunk)} bytes")
-                                    # print(f"Quart Backend: Sending audio chunk ({len(audio_chunk)} bytes) to Gemini via send_realtime_input...")
-                                    await session.send_realtime_input(
-                                        audio=types.Blob(
-                                            mime_type=f"audio/pcm;rate={INPUT_SAMPLE_RATE}",
-                                            data=audio_chunk
-                                        )
-                                    )
-                                    # print(f"Quart Backend: Successfully sent mic audio to Gemini via send_realtime_input.")
+                                    audio_input.feed(audio_chunk) # Queued; sent by AudioUpstreamSender
                             else:
                                 print(f"Quart Backend: Received unexpected data type from client: {type(client_data)}, content: {client_data[:100] if isinstance(client_data, bytes) else client_data}")
 
-                        except asyncio.TimeoutError:
-                            if not active_processing:
-                                break
-                            continue # Normal timeout, continue listening
+                        except asyncio.CancelledError:
+                            raise # Session shutdown
                         except Exception as e_fwd_inner:
                             print(f"Quart Backend: Error during client data handling/sending to Gemini: {type(e_fwd_inner).__name__}: {e_fwd_inner}")
                             traceback.print_exc()
-                            active_processing = False
-                            break # Exit while loop on error
+                            return # Ends the session
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e_fwd_outer:
                     print(f"Quart Backend: Outer error in handle_client_input_and_forward: {type(e_fwd_outer).__name__}: {e_fwd_outer}")
                     traceback.print_exc()
-                    active_processing = False # Ensure outer errors also stop processing
-                finally:
-                    # print("Quart Backend: Stopped handling client input.")
-                    active_processing = False # Ensure graceful shutdown of the other task
+                # print("Quart Backend: Stopped handling client input.")
 
             async def receive_from_gemini_and_forward_to_client():
-                nonlocal active_processing, current_session_handle 
+                nonlocal current_session_handle 
                 # print("Quart Backend: Starting receive_from_gemini_and_forward_to_client task.")
 
                 available_functions = {
@@ -210,17 +244,17 @@ async def websocket_endpoint():
                     "listRegisteredBillers": listRegisteredBillers,
                     "search_faq": search_faq
                 }
-                current_user_utterance_id = None
-                accumulated_user_speech_text = "" # Renamed from latest_user_speech_text and initialized
-                current_model_utterance_id = None
-                accumulated_model_speech_text = ""
+                # Repeated read calls of this session are answered from its memo
+                tool_executor = ToolExecutor(available_functions, memo=ToolMemo(USER_ID) if TOOL_MEMO_ENABLED else None)
+                user_transcript = TranscriptAccumulator('user', 'user_transcription_update', transcript_mode)
+                model_transcript = TranscriptAccumulator('model', 'model_response_update', transcript_mode)
 
                 try:
-                    while active_processing:
+                    while True:
                         had_gemini_activity_in_this_iteration = False
+                        # receive() blocks until the next message and ends after each complete turn
                         async for response in session.receive():
                             had_gemini_activity_in_this_iteration = True
-                            if not active_processing: break
 
                             if response.session_resumption_update:
                                 update = response.session_resumption_update
@@ -235,24 +269,20 @@ async def websocket_endpoint():
                                     # print(f"Quart Backend: Updated session handle from direct response.session_handle: {current_session_handle}")
 
                             if response.data is not None:
-                                try:
-                                    await websocket.send(response.data)
-                                except Exception as send_exc:
-                                    print(f"Quart Backend: Error sending audio data to client WebSocket: {type(send_exc).__name__}: {send_exc}")
-                                    active_processing = False
-                                    break
+                                audio_output.put(response.data) # Sent by ClientAudioSender
 
                             elif response.server_content:
                                 if response.server_content.interrupted:
                                     print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
                                     print("Quart Backend: Gemini server sent INTERRUPTED signal.")
                                     print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+                                    audio_output.purge() # Buffered audio of the interrupted answer never reaches the client
                                     try:
                                         await websocket.send_json({"type": "interrupt_playback"})
                                         # print("Quart Backend: Sent interrupt_playback signal to client.")
                                     except Exception as send_exc:
                                         print(f"Quart Backend: Error sending interrupt_playback signal to client: {type(send_exc).__name__}: {send_exc}")
-                                        active_processing = False; break
+                                        return
 
                                 # User Input Processing
                                 if response.server_content and hasattr(response.server_content, 'input_transcription') and \
@@ -261,27 +291,14 @@ async def websocket_endpoint():
                                    response.server_content.input_transcription.text: # Ensure text is not empty
                                     
                                     user_speech_chunk = response.server_content.input_transcription.text
-
-                                    if current_user_utterance_id is None: # Start of a new user utterance
-                                        current_user_utterance_id = str(uuid.uuid4())
-                                        accumulated_user_speech_text = "" # Reset accumulator for new utterance
-                                    
-                                    accumulated_user_speech_text += user_speech_chunk
-                                    
-                                    if accumulated_user_speech_text: # Only send if there's actual accumulated text
-                                        payload = {
-                                            'id': current_user_utterance_id,
-                                            'text': accumulated_user_speech_text, # Send accumulated text
-                                            'sender': 'user',
-                                            'type': 'user_transcription_update',
-                                            'is_final': False
-                                        }
+                                    payload = user_transcript.append(user_speech_chunk)
+                                    if payload: # Only send if there's actual text
                                         try:
                                             await websocket.send_json(payload)
-                                            print(f"Backend - Streaming User Input (accumulated): \033[92m{accumulated_user_speech_text}\033[0m")
+                                            print(f"Backend - Streaming User Input ({transcript_mode}): \033[92m{payload.get('text', user_speech_chunk)}\033[0m")
                                         except Exception as send_exc:
                                             print(f"Quart Backend: Error sending user transcription update to client: {type(send_exc).__name__}: {send_exc}")
-                                            active_processing = False; break
+                                            return
 
                                 # Model Output Processing
                                 if response.server_content and hasattr(response.server_content, 'output_transcription') and \
@@ -289,69 +306,43 @@ async def websocket_endpoint():
                                    hasattr(response.server_content.output_transcription, 'text') and \
                                    response.server_content.output_transcription.text:
                                     
-                                    if current_model_utterance_id is None:
-                                        current_model_utterance_id = str(uuid.uuid4())
-                                        accumulated_model_speech_text = "" # Ensure accumulator is clear
-
                                     chunk = response.server_content.output_transcription.text
-                                    if chunk: # Only process if chunk has content
-                                        accumulated_model_speech_text += chunk
-                                        payload = {
-                                            'id': current_model_utterance_id,
-                                            'text': accumulated_model_speech_text, # Send accumulated text
-                                            'sender': 'model',
-                                            'type': 'model_response_update',
-                                            'is_final': False
-                                        }
+                                    payload = model_transcript.append(chunk)
+                                    if payload: # Only process if chunk has content
                                         try:
                                             await websocket.send_json(payload)
-                                            print(f"Backend - Streaming Model Output (accumulated): \033[92m{accumulated_model_speech_text}\033[0m")
+                                            print(f"Backend - Streaming Model Output ({transcript_mode}): \033[92m{payload.get('text', chunk)}\033[0m")
                                         except Exception as send_exc:
                                             print(f"Quart Backend: Error sending model response update to client: {type(send_exc).__name__}: {send_exc}")
-                                            active_processing = False; break
+                                            return
 
                                 # Handling Model Generation Completion
                                 if response.server_content and hasattr(response.server_content, 'generation_complete') and \
                                    response.server_content.generation_complete == True:
-                                    if current_model_utterance_id and accumulated_model_speech_text: # Ensure there was a model utterance
-                                        payload = {
-                                            'id': current_model_utterance_id,
-                                            'text': accumulated_model_speech_text,
-                                            'sender': 'model',
-                                            'type': 'model_response_update',
-                                            'is_final': True
-                                        }
+                                    payload = model_transcript.final()
+                                    if payload: # Ensure there was a model utterance
                                         try:
                                             await websocket.send_json(payload)
-                                            print(f"Backend - Final Model Output Sent: \033[92m{accumulated_model_speech_text}\033[0m")
+                                            print(f"Backend - Final Model Output Sent: \033[92m{payload['text']}\033[0m")
                                         except Exception as send_exc:
                                             print(f"Quart Backend: Error sending final model response to client: {type(send_exc).__name__}: {send_exc}")
-                                            active_processing = False; break
-                                    current_model_utterance_id = None # Reset for next model utterance
-                                    accumulated_model_speech_text = ""
+                                            return
+                                    model_transcript.reset() # Reset for next model utterance
 
                                 # Handling Turn Completion (Finalizing User Speech)
                                 if response.server_content and hasattr(response.server_content, 'turn_complete') and \
                                    response.server_content.turn_complete == True:
-                                    if current_user_utterance_id and accumulated_user_speech_text: # Ensure there was a user utterance
-                                        payload = {
-                                            'id': current_user_utterance_id,
-                                            'text': accumulated_user_speech_text, # Send final accumulated text
-                                            'sender': 'user',
-                                            'type': 'user_transcription_update',
-                                            'is_final': True
-                                        }
+                                    payload = user_transcript.final()
+                                    if payload: # Ensure there was a user utterance
                                         try:
                                             await websocket.send_json(payload)
-                                            print(f"Backend - Final User Input Sent: \033[92m{accumulated_user_speech_text}\033[0m")
+                                            print(f"Backend - Final User Input Sent: \033[92m{payload['text']}\033[0m")
                                         except Exception as send_exc:
                                             print(f"Quart Backend: Error sending final user transcription to client: {type(send_exc).__name__}: {send_exc}")
-                                            active_processing = False; break
-                                    current_user_utterance_id = None # Reset for next user utterance
-                                    accumulated_user_speech_text = "" # Reset accumulator
+                                            return
+                                    user_transcript.reset() # Reset for next user utterance
                                     # Also reset model states
-                                    current_model_utterance_id = None
-                                    accumulated_model_speech_text = ""
+                                    model_transcript.reset()
                                     print("Backend - Turn complete. User speech states reset.")
                                 
                                 # Fallback for other potential text or error structures (simplified)
@@ -380,39 +371,13 @@ async def websocket_endpoint():
 
                             elif response.tool_call:
                                 print(f"\033[92mQuart Backend: Received tool_call from Gemini: {response.tool_call}\033[0m")
-                                function_responses = []
-                                for fc in response.tool_call.function_calls:
-                                    print(f"\033[92mQuart Backend: Gemini requests function call: {fc.name} with args: {dict(fc.args)}\033[0m")
-                                    
-                                    function_to_call = available_functions.get(fc.name)
-                                    function_response_content = None
- 
-                                    if function_to_call:
-                                        try:
-                                            # Execute the actual local function
-                                            function_args = dict(fc.args)
-                                            print(f"\033[92mQuart Backend: Calling function {fc.name} with args: {function_args}\033[0m")
-                                            # Await the async function call
-                                            result = await function_to_call(**function_args)
-                                            if isinstance(result, str):
-                                                function_response_content = {"content": result}
-                                            else:
-                                                function_response_content = result # Assumes result is already a dict if not a string
-                                            print(f"\033[92mQuart Backend: Function {fc.name} executed. Result: {result}\033[0m")
-                                        except Exception as e:
-                                            print(f"Quart Backend: Error executing function {fc.name}: {e}")
-                                            traceback.print_exc() # Add if not already there
-                                            function_response_content = {"status": "error", "message": str(e)}
-                                    else:
-                                        print(f"Quart Backend: Function {fc.name} not found.")
-                                        function_response_content = {"status": "error", "message": f"Function {fc.name} not implemented or available."}
- 
-                                    function_response = types.FunctionResponse(
-                                        id=fc.id,
-                                        name=fc.name,
-                                        response=function_response_content
-                                    )
-                                    function_responses.append(function_response)
+                                # Read-only calls run concurrently; mutations run in order (see tool_executor)
+                                function_calls = response.tool_call.function_calls or []
+                                results = await tool_executor.execute(function_calls)
+                                function_responses = [
+                                    types.FunctionResponse(id=fc.id, name=fc.name, response=result)
+                                    for fc, result in zip(function_calls, results)
+                                ]
                                 
                                 if function_responses:
                                     print(f"\033[92mQuart Backend: Sending {len(function_responses)} function response(s) to Gemini.\033[0m")
@@ -428,58 +393,44 @@ async def websocket_endpoint():
                                      await websocket.send(f"[ERROR_FROM_GEMINI]: {str(error_details)}")
                                  except Exception as send_exc:
                                      print(f"Quart Backend: Error sending Gemini error to client WebSocket: {type(send_exc).__name__}: {send_exc}")
-                                 active_processing = False
-                                 break
+                                 return
  
                             # Removed the separate turn_complete log here as it's handled above with user speech sending.
                         
-                        if not active_processing:
-                            break
- 
-                        if not had_gemini_activity_in_this_iteration and active_processing:
-                            await asyncio.sleep(0.1)
-                        elif had_gemini_activity_in_this_iteration and active_processing:
-                            pass
-
+                        if not had_gemini_activity_in_this_iteration:
+                            # receive() only returns empty-handed when the Live session has ended
+                            print("Quart Backend: Gemini session closed.")
+                            return
 
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e_rcv:
                     print(f"Quart Backend: Error in Gemini receive processing task: {type(e_rcv).__name__}: {e_rcv}")
                     traceback.print_exc()
-                    active_processing = False
-                finally:
-                    # print("Quart Backend: Stopped receiving from Gemini.")
-                    active_processing = False # Ensure graceful shutdown of the other task
+                # print("Quart Backend: Stopped receiving from Gemini.")
             
             forward_task = asyncio.create_task(handle_client_input_and_forward(), name="ClientInputForwarder")
             receive_task = asyncio.create_task(receive_from_gemini_and_forward_to_client(), name="GeminiReceiver")
+            audio_send_task = asyncio.create_task(audio_input.run(), name="AudioUpstreamSender")
+            client_audio_task = asyncio.create_task(audio_output.run(), name="ClientAudioSender")
+            session_tasks = (forward_task, receive_task, audio_send_task, client_audio_task)
             
             try:
-                await asyncio.gather(forward_task, receive_task)
-            except Exception as e_gather:
-                print(f"Quart Backend: Exception during asyncio.gather: {type(e_gather).__name__}: {e_gather}")
-                traceback.print_exc() # Added traceback
+                # Whichever task ends first (including an audio send error) ends the session
+                await asyncio.wait(session_tasks, return_when=asyncio.FIRST_COMPLETED)
             finally:
-                active_processing = False 
-                if not forward_task.done():
-                    forward_task.cancel()
-                if not receive_task.done():
-                    receive_task.cancel()
-                try:
-                    await forward_task
-                except asyncio.CancelledError:
-                    # print(f"Quart Backend: Task {forward_task.get_name()} was cancelled during cleanup.")
-                    pass # Task cancellation is an expected part of shutdown
-                except Exception as e_fwd_cleanup:
-                     print(f"Quart Backend: Error during forward_task cleanup: {e_fwd_cleanup}")
-                     traceback.print_exc() # Added traceback
-                try:
-                    await receive_task
-                except asyncio.CancelledError:
-                    # print(f"Quart Backend: Task {receive_task.get_name()} was cancelled during cleanup.")
-                    pass # Task cancellation is an expected part of shutdown
-                except Exception as e_rcv_cleanup:
-                    print(f"Quart Backend: Error during receive_task cleanup: {e_rcv_cleanup}")
-                    traceback.print_exc() # Added traceback
+                for task in session_tasks:
+                    if not task.done():
+                        task.cancel()
+                for task in session_tasks:
+                    try:
+                        await task
+                    except asyncio.CancelledError:
+                        # print(f"Quart Backend: Task {task.get_name()} was cancelled during cleanup.")
+                        pass # Task cancellation is an expected part of shutdown
+                    except Exception as e_task_cleanup:
+                        print(f"Quart Backend: Error during {task.get_name()} cleanup: {e_task_cleanup}")
+                        traceback.print_exc() # Added traceback
 
             # print("Quart Backend: Gemini interaction tasks finished.")
     except asyncio.CancelledError:
@@ -492,23 +443,115 @@ async def websocket_endpoint():
         traceback.print_exc()
     finally:
         # print("Quart Backend: WebSocket endpoint processing finished (outer finally).")
-        pass
+        session_ctx.close()
+        unbind_session(session_ctx_token)
+
+_background_tasks = set() # Long-running server tasks, cancelled in after_serving
+
+async def warm_faq_cache_periodically():
+    """Keeps the most frequently asked FAQ answers cached (see faq_cache.FaqAnswerCache.warm)."""
+    while True:
+        await asyncio.sleep(FAQ_CACHE_WARM_INTERVAL_SECONDS)
+        try:
+            warmed = await FAQ_CACHE.warm(GLOBAL_LOG_STORE, _search_faq_remote)
+            if warmed:
+                print(f"Quart Backend: Refreshed {warmed} popular FAQ answer(s) in the FAQ cache.")
+        except Exception as e_warm:
+            print(f"Quart Backend: FAQ cache warming failed: {type(e_warm).__name__}: {e_warm}")
+
+@app.before_serving
+async def start_background_tasks():
+    await asyncio.to_thread(get_faq_index) # Map (or build) the local FAQ index before the first question
+    if LIVE_SESSION_POOL:
+        LIVE_SESSION_POOL.start()
+    if FAQ_CACHE and FAQ_CACHE_WARM_INTERVAL_SECONDS > 0:
+        _background_tasks.add(asyncio.create_task(warm_faq_cache_periodically(), name="FaqCacheWarmer"))
+
+@app.after_serving
+async def shutdown_background_services():
+    """Stops background tasks and the Live session pool, then releases the BigQuery workers, log sink and FAQ client."""
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    if LIVE_SESSION_POOL:
+        await LIVE_SESSION_POOL.close()
+    # Don't block worker shutdown on in-flight BigQuery jobs.
+    bigquery_async.shutdown(wait=False)
+    if LOG_SINK:
+        await asyncio.to_thread(LOG_SINK.close) # Flush and compress the open log segment
+    await close_faq_search_client()
+
+@app.route("/api/metrics", methods=["GET"])
+async def get_metrics():
+    """Counters of the log pipeline (sizes, drops), the in-process caches, the audio stages and the session pool."""
+    return jsonify({
+        "log_store": GLOBAL_LOG_STORE.stats(),
+        "stdout_log_store": CAPTURED_STDOUT_LOGS.stats(),
+        "event_console": CONSOLE_WRITER.stats(),
+        "log_stream_subscribers": len(LOG_STREAM_BROKER),
+        "log_sink": LOG_SINK.stats() if LOG_SINK else {"enabled": False},
+        "account_cache": ACCOUNT_CACHE.stats(),
+        "account_matcher": ACCOUNT_MATCHER.stats(),
+        "biller_index": BILLER_INDEX.stats(),
+        "audio_input": AUDIO_INPUT_TOTALS,
+        "audio_output": AUDIO_OUTPUT_TOTALS,
+        "tool_memo": TOOL_MEMO_TOTALS,
+        "faq_cache": FAQ_CACHE.stats() if FAQ_CACHE else {"enabled": False},
+        "faq_index": get_faq_index().stats() if get_faq_index() else {"enabled": False},
+        "live_session_pool": LIVE_SESSION_POOL.stats() if LIVE_SESSION_POOL else {"enabled": False},
+    })
 
 @app.route("/api/logs", methods=["GET"])
 async def get_logs():
-    """API endpoint to fetch captured logs."""
-    # Combine logs from BQ's global store and our captured stdout logs
-    # Return copies to avoid issues if the lists are modified during serialization
-    combined_logs = list(GLOBAL_LOG_STORE) + list(CAPTURED_STDOUT_LOGS)
-    
-    # Optional: Sort by timestamp if all logs have a compatible timestamp field
-    # For now, just concatenating. Assuming GLOBAL_LOG_STORE entries also have a timestamp
-    # or can be ordered meaningfully with the new TOOL_EVENT logs.
-    # If sorting is needed:
-    # combined_logs.sort(key=lambda x: x.get("timestamp", ""), reverse=True) # Example sort
-    
+    """
+    API endpoint to fetch captured logs (BigQuery interactions and stdout), oldest first.
+    Optional query parameters:
+      since=<seq>       only entries after this sequence number (poll with the last `seq` seen)
+      limit=<n>         at most n entries: the oldest n after `since`, otherwise the newest n
+      log_type=<a,b>    only these log types (BQ_INTERACTION, TOOL_EVENT, RAW_STDOUT)
+      session_id=<id>   only entries produced by this websocket session
+    """
+    try:
+        since = int(request.args["since"]) if request.args.get("since") else None
+        limit = int(request.args["limit"]) if request.args.get("limit") else None
+        if limit is not None and limit < 0:
+            raise ValueError("limit must not be negative")
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid since/limit parameter: {e}"}), 400
+    log_types = {t.strip() for t in request.args.get("log_type", "").split(",") if t.strip()} or None
+    session_id = request.args.get("session_id") or None
+
+    combined_logs = query_stores([GLOBAL_LOG_STORE, CAPTURED_STDOUT_LOGS], since, limit, log_types, session_id)
     return jsonify(combined_logs)
 
+@app.route("/api/logs/stream", methods=["GET"])
+async def stream_logs():
+    """
+    Server-Sent Events stream of log entries as they are stored (event "log", id = seq).
+    Accepts the log_type and session_id filters of /api/logs. since=<seq> (or the
+    Last-Event-ID header on reconnect) first replays the stored entries after that seq.
+    """
+    # A reconnecting EventSource resends its original URL, so Last-Event-ID takes precedence
+    since_arg = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        since = int(since_arg) if since_arg else None
+    except ValueError:
+        return jsonify({"status": "error", "message": f"Invalid since parameter: {since_arg}"}), 400
+    log_types = {t.strip() for t in request.args.get("log_type", "").split(",") if t.strip()} or None
+    session_id = request.args.get("session_id") or None
+
+    def backfill():
+        if since is None:
+            return []
+        return query_stores([GLOBAL_LOG_STORE, CAPTURED_STDOUT_LOGS], since, None, log_types, session_id)
+
+    response = await make_response(stream_entries(LOG_STREAM_BROKER, backfill, log_types, session_id),
+                                   {"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                    "X-Accel-Buffering": "no"})
+    response.timeout = None # Stream for as long as the client stays connected
+    return response
+
 # To run this Quart application:
 # 1. Install dependencies: pip install quart quart-cors google-generativeai python-dotenv hypercorn
 # 2. Set your GEMINI_API_KEY environment variable in a .env file or your system environment.
@@ -0,0 +1,202 @@
+"""
+Per-websocket-session data cache, filled while the Gemini Live session connects.
+
+Opening a Live session takes a noticeable round trip, and the first tool call of a
+conversation ("what's my balance?") used to pay a cold BigQuery round trip on top
+of it. When `/listen` accepts a client it now binds a SessionContext and starts a
+prefetch of the user's accounts, registered billers and latest transactions
+concurrently with `gemini_client.aio.live.connect`. The tools in gemini_tools read
+this cache first and fall back to bigquery_async on a miss.
+
+The context is bound through a ContextVar, so it is visible to the tasks the
+websocket handler spawns (they copy the context when created) and never leaks
+between sessions. Entries expire after SESSION_CACHE_TTL_SECONDS, and tools that
+change data invalidate the entries they affect in every open session of the user
+(invalidate_user_sessions), since all of them show the same accounts. Balances can change from other
+sessions of the same user, so account lookups read the process-wide ACCOUNT_CACHE
+(write-through, ACCOUNT_CACHE_TTL_SECONDS) first, and the prefetched accounts expire
+with the same TTL.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+import weakref
+from contextvars import ContextVar
+
+import bigquery_async
+from account_cache import ACCOUNT_CACHE, ACCOUNT_CACHE_TTL_SECONDS
+from bigquery_functions import encode_transaction_cursor
+from log_store import log_session_id
+
+logger = logging.getLogger(__name__)
+
+SESSION_PREFETCH_ENABLED = os.getenv("SESSION_PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+# Transactions prefetched per account; getTransactionHistory requests up to this size are served from memory.
+SESSION_PREFETCH_TRANSACTIONS = int(os.getenv("SESSION_PREFETCH_TRANSACTIONS", "10"))
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+# How long a tool waits for a prefetch that is still running before querying on its own.
+SESSION_PREFETCH_WAIT_SECONDS = float(os.getenv("SESSION_PREFETCH_WAIT_SECONDS", "5"))
+
+# Open sessions, so a mutation in one session also invalidates the others of the same user
+_open_sessions = weakref.WeakSet()
+
+# Cache keys
+ACCOUNTS = "accounts"
+BILLERS = "billers"
+TRANSACTIONS = "transactions" # Stored per account type as (TRANSACTIONS, account_type)
+
+
+class SessionContext:
+    """Data prefetched for one websocket session. Values are the bigquery_functions results."""
+
+    def __init__(self, user_id: str, ttl_seconds: float = SESSION_CACHE_TTL_SECONDS):
+        self.user_id = user_id
+        self.session_id = str(uuid.uuid4())
+        self.language = None # Session language code (e.g. "en-IN"), set by /listen
+        self.ttl_seconds = ttl_seconds
+        self._entries = {} # key -> (expires_at, value)
+        self._prefetch_task = None
+        self.hits = 0
+        self.misses = 0
+        _open_sessions.add(self)
+
+    # --- Cache ---
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value, ttl_seconds: float = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, *keys) -> None:
+        """Drops the given keys; TRANSACTIONS drops the cached history of every account."""
+        for key in keys:
+            if key == TRANSACTIONS:
+                for cached_key in [k for k in self._entries if isinstance(k, tuple) and k[0] == TRANSACTIONS]:
+                    del self._entries[cached_key]
+            else:
+                self._entries.pop(key, None)
+
+    # --- Typed reads used by the tools ---
+    async def get_account_by_type(self, account_type: str) -> dict | None:
+        await self.wait_for_prefetch()
+        shared = ACCOUNT_CACHE.get_account_by_type(self.user_id, account_type) # Sees writes from other sessions
+        if shared:
+            return shared
+        accounts = self.get(ACCOUNTS)
+        if not accounts:
+            return None
+        return next((dict(acc) for acc in accounts if acc.get("account_type") == account_type), None)
+
+    async def get_billers(self) -> dict | None:
+        """The cached list_registered_billers result ({"status", "billers"}), if any."""
+        await self.wait_for_prefetch()
+        return self.get(BILLERS)
+
+    async def get_transaction_page(self, account_type: str, limit: int) -> dict | None:
+        """
+        The first `limit` transactions of an account in get_transaction_history_page's shape,
+        or None when the prefetched page cannot answer the request.
+        """
+        await self.wait_for_prefetch()
+        page = self.get((TRANSACTIONS, account_type))
+        if page is None:
+            return None
+        rows = page.get("transactions", [])
+        if limit < len(rows):
+            return {**page, "transactions": rows[:limit], "next_cursor": encode_transaction_cursor(rows[limit - 1])}
+        if limit == len(rows) or not page.get("next_cursor"):
+            return page
+        return None # More rows requested than were prefetched
+
+    # --- Prefetch ---
+    def start_prefetch(self) -> asyncio.Task | None:
+        if SESSION_PREFETCH_ENABLED and self._prefetch_task is None:
+            self._prefetch_task = asyncio.create_task(self._prefetch(), name=f"SessionPrefetch-{self.session_id}")
+        return self._prefetch_task
+
+    async def wait_for_prefetch(self, timeout: float = SESSION_PREFETCH_WAIT_SECONDS) -> None:
+        """Waits (bounded) for a running prefetch so a tool does not duplicate its queries."""
+        task = self._prefetch_task
+        if task is None or task.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[wait_for_prefetch] Session {self.session_id} prefetch still running after {timeout}s, querying directly.")
+        except Exception:
+            pass # Failures are logged by _prefetch; tools fall back to direct queries
+
+    async def _prefetch(self) -> None:
+        started = time.perf_counter()
+        # Billers are independent of the accounts; transactions need the account types first.
+        billers_task = asyncio.create_task(bigquery_async.list_registered_billers(user_id=self.user_id))
+        try:
+            accounts = await bigquery_async.get_accounts_for_user(self.user_id)
+            accounts = [acc for acc in accounts if "account_id" in acc] # Drop error entries
+            if accounts:
+                self.put(ACCOUNTS, accounts, ttl_seconds=ACCOUNT_CACHE_TTL_SECONDS) # Balances go stale like ACCOUNT_CACHE
+                account_types = list(dict.fromkeys(acc["account_type"] for acc in accounts))
+                pages = await asyncio.gather(
+                    *(bigquery_async.get_transaction_history_page(account_type, page_size=SESSION_PREFETCH_TRANSACTIONS)
+                      for account_type in account_types),
+                    return_exceptions=True)
+                for account_type, page in zip(account_types, pages):
+                    if isinstance(page, dict) and page.get("status") in ("SUCCESS", "NO_TRANSACTIONS_FOUND"):
+                        self.put((TRANSACTIONS, account_type), page)
+
+            billers = await billers_task
+            if billers.get("status") in ("SUCCESS", "NO_BILLERS_FOUND"):
+                self.put(BILLERS, billers)
+            logger.info(f"[_prefetch] Session {self.session_id} prefetched {sorted(str(k) for k in self._entries)} "
+                        f"for user {self.user_id} in {(time.perf_counter() - started) * 1000.0:.1f} ms.")
+        except Exception as e:
+            billers_task.cancel()
+            logger.error(f"[_prefetch] Session {self.session_id} prefetch failed for user {self.user_id}: {e}", exc_info=True)
+
+    def close(self) -> None:
+        _open_sessions.discard(self)
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"session_id": self.session_id, "user_id": self.user_id, "entries": len(self._entries),
+                "hits": self.hits, "misses": self.misses}
+
+
+def invalidate_user_sessions(user_id: str, *keys) -> None:
+    """Drops the given keys from every open session of the user (see SessionContext.invalidate)."""
+    for context in list(_open_sessions):
+        if context.user_id == user_id:
+            context.invalidate(*keys)
+
+
+_current_session: ContextVar[SessionContext | None] = ContextVar("current_session", default=None)
+
+
+def current_session() -> SessionContext | None:
+    """The SessionContext bound to the running websocket session, if any."""
+    return _current_session.get()
+
+
+def bind_session(context: SessionContext):
+    """Binds the context for the current task (and tasks created from it). Returns a reset token."""
+    # Log entries written on behalf of this session are tagged with its ID
+    return _current_session.set(context), log_session_id.set(context.session_id)
+
+
+def unbind_session(token) -> None:
+    session_token, log_token = token
+    log_session_id.reset(log_token)
+    _current_session.reset(session_token)
@@ -0,0 +1,417 @@
+"""
+Embedded SQLite implementation of the BankRepository interface.
+
+Backs the same Accounts / Transactions / RegisteredBillers model as BigQuery with a
+local database (a file, or ":memory:" by default), so the voice pipeline can run and
+be load-tested without any cloud dependency. Transfers and bill payments run inside
+BEGIN IMMEDIATE transactions, which gives the same all-or-nothing behaviour as the
+BigQuery multi-statement transactions.
+"""
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from bank_repository import BankRepository, GuardViolation
+
+logger = logging.getLogger(__name__)
+
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", ":memory:")
+# Seed the demo user's accounts and billers when the database is empty
+SQLITE_SEED_DEMO_DATA = os.getenv("SQLITE_SEED_DEMO_DATA", "true").lower() in ("1", "true", "yes")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Accounts (
+    account_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    account_type TEXT NOT NULL,
+    account_nickname TEXT,
+    balance REAL NOT NULL DEFAULT 0,
+    currency TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_user ON Accounts (user_id, account_type);
+
+CREATE TABLE IF NOT EXISTS Transactions (
+    transaction_id TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT,
+    amount REAL NOT NULL,
+    currency TEXT,
+    type TEXT,
+    memo TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON Transactions (account_id, date, transaction_id);
+
+CREATE TABLE IF NOT EXISTS RegisteredBillers (
+    biller_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    biller_name TEXT NOT NULL,
+    bill_type TEXT,
+    account_number_at_biller TEXT,
+    biller_nickname TEXT,
+    default_payment_account_id TEXT,
+    last_due_amount REAL,
+    last_due_date TEXT,
+    status TEXT NOT NULL DEFAULT 'ACTIVE',
+    registration_ts TEXT,
+    last_updated_ts TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_billers_user ON RegisteredBillers (user_id, bill_type);
+"""
+
+# Logical biller field (as used by bigquery_functions) -> RegisteredBillers column
+_BILLER_COLUMNS = {
+    "biller_name": "biller_name",
+    "biller_type": "bill_type",
+    "account_number": "account_number_at_biller",
+    "payee_nickname": "biller_nickname",
+    "default_payment_account_id": "default_payment_account_id",
+    "status": "status",
+    "due_amount": "last_due_amount",
+    "due_date": "last_due_date",
+}
+
+_DEMO_USER_ID = "user_krishnan_001"
+
+
+def _to_db_value(value):
+    """SQLite has no DATE/TIMESTAMP types; dates and datetimes are stored as ISO strings."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+class SQLiteRepository(BankRepository):
+    """Single-connection SQLite repository; statements are serialised with a lock."""
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str = SQLITE_DB_PATH, seed_demo_data: bool = SQLITE_SEED_DEMO_DATA):
+        super().__init__()
+        self.db_path = db_path
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        with self._lock:
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            if seed_demo_data and self._conn.execute("SELECT COUNT(*) FROM Accounts").fetchone()[0] == 0:
+                self._seed_demo_data()
+        logger.info(f"\033[92mSQLite repository initialized at {db_path}.\033[0m")
+
+    def _execute(self, query_str: str, parameters=()) -> sqlite3.Cursor:
+        self._remember_query(query_str)
+        with self._lock, self._timed("sqlite"):
+            return self._conn.execute(query_str, parameters)
+
+    def _fetchone(self, query_str: str, parameters=()):
+        with self._lock, self._timed("sqlite"):
+            return self._execute(query_str, parameters).fetchone()
+
+    def _fetchall(self, query_str: str, parameters=()) -> list:
+        with self._lock, self._timed("sqlite"):
+            return self._execute(query_str, parameters).fetchall()
+
+    @contextmanager
+    def _transaction(self):
+        """Holds the write lock for the enclosed statements; commits on success, rolls back on error."""
+        with self._lock, self._timed("sqlite"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _seed_demo_data(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        accounts = [
+            ("acc_chk_krishnan_001", _DEMO_USER_ID, "checking", "Primary Checking", 5000.00, "USD"),
+            ("acc_sav_krishnan_001", _DEMO_USER_ID, "savings", "Rainy Day Savings", 12000.00, "USD"),
+        ]
+        self._conn.executemany(
+            "INSERT INTO Accounts (account_id, user_id, account_type, account_nickname, balance, currency) VALUES (?, ?, ?, ?, ?, ?)",
+            accounts)
+        transactions = [
+            ("txn_seed_001", "acc_chk_krishnan_001", _DEMO_USER_ID, (now - datetime.timedelta(days=3)).isoformat(), "Grocery Store", -82.45, "USD", "debit", None),
+            ("txn_seed_002", "acc_chk_krishnan_001", _DEMO_USER_ID, (now - datetime.timedelta(days=2)).isoformat(), "Salary", 3200.00, "USD", "credit", None),
+            ("txn_seed_003", "acc_chk_krishnan_001", _DEMO_USER_ID, (now - datetime.timedelta(days=1)).isoformat(), "Coffee Shop", -4.75, "USD", "debit", None),
+            ("txn_seed_004", "acc_sav_krishnan_001", _DEMO_USER_ID, (now - datetime.timedelta(days=5)).isoformat(), "Interest", 12.30, "USD", "credit", None),
+        ]
+        self._conn.executemany(
+            "INSERT INTO Transactions (transaction_id, account_id, user_id, date, description, amount, currency, type, memo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            transactions)
+        self._conn.execute(
+            """INSERT INTO RegisteredBillers (biller_id, user_id, biller_name, bill_type, account_number_at_biller, biller_nickname,
+                   default_payment_account_id, last_due_amount, last_due_date, status, registration_ts, last_updated_ts)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'ACTIVE', ?, ?)""",
+            ("biller_k_elec_001", _DEMO_USER_ID, "City Power & Light", "electricity", "ELEC-778899", "Electricity Bill",
+             "acc_chk_krishnan_001", 75.50, (now.date() + datetime.timedelta(days=10)).isoformat(), now.isoformat(), now.isoformat()))
+        logger.info(f"[_seed_demo_data] Seeded demo data for user {_DEMO_USER_ID}.")
+
+    @staticmethod
+    def _account_row(row) -> dict:
+        return {"account_id": row["account_id"], "account_type": row["account_type"],
+                "balance": float(row["balance"]), "currency": row["currency"]}
+
+    # --- Health ---
+    def ping(self):
+        row = self._fetchone("SELECT 1 AS test_column")
+        return row["test_column"] if row else None
+
+    # --- Accounts ---
+    def get_account_by_type(self, user_id: str, account_type: str) -> dict | None:
+        row = self._fetchone("""
+            SELECT account_id, account_type, balance, currency
+            FROM Accounts
+            WHERE user_id = ? AND account_type = ?
+            LIMIT 1
+        """, (user_id, account_type))
+        return self._account_row(row) if row else None
+
+    def get_account_by_id(self, user_id: str, account_id: str) -> dict | None:
+        row = self._fetchone("""
+            SELECT account_id, account_type, balance, currency
+            FROM Accounts
+            WHERE account_id = ? AND user_id = ?
+            LIMIT 1
+        """, (account_id, user_id))
+        return self._account_row(row) if row else None
+
+    def get_accounts(self, user_id: str, account_types: list, account_ids: list) -> list:
+        account_types, account_ids = list(account_types), list(account_ids)
+        type_marks = ", ".join("?" * len(account_types)) or "NULL"
+        id_marks = ", ".join("?" * len(account_ids)) or "NULL"
+        rows = self._fetchall(f"""
+            SELECT account_id, account_type, balance, currency
+            FROM Accounts
+            WHERE user_id = ?
+              AND (account_type IN ({type_marks}) OR account_id IN ({id_marks}))
+            ORDER BY account_id
+        """, (user_id, *account_types, *account_ids))
+        return [self._account_row(row) for row in rows]
+
+    def list_accounts(self, user_id: str) -> list:
+        rows = self._fetchall("""
+            SELECT account_id, account_type, balance, currency, account_nickname
+            FROM Accounts
+            WHERE user_id = ?
+        """, (user_id,))
+        return [{
+            "account_id": row["account_id"],
+            "account_type": row["account_type"],
+            "balance": float(row["balance"]) if row["balance"] is not None else 0.0,
+            "currency": row["currency"],
+            "account_nickname": row["account_nickname"]
+        } for row in rows]
+
+    # --- Transactions ---
+    def list_transactions(self, account_id: str, limit: int) -> list:
+        rows = self._fetchall("""
+            SELECT transaction_id, date, description, amount, currency, type
+            FROM Transactions
+            WHERE account_id = ?
+            ORDER BY date DESC
+            LIMIT ?
+        """, (account_id, limit))
+        return [{
+            "transaction_id": row["transaction_id"],
+            "date": row["date"],
+            "description": row["description"],
+            "amount": float(row["amount"]),
+            "currency": row["currency"],
+            "type": row["type"]
+        } for row in rows]
+
+    def list_transactions_page(self, account_id, page_size, after=None, start_ts=None, end_ts=None,
+                               min_amount=None, max_amount=None) -> list:
+        where_conditions = ["account_id = ?"]
+        parameters = [account_id]
+        if after:
+            # Row-value comparison lets SQLite walk idx_transactions_account_date backwards from the cursor
+            where_conditions.append("(date, transaction_id) < (?, ?)")
+            parameters.extend(after)
+        if start_ts:
+            where_conditions.append("date >= ?")
+            parameters.append(start_ts)
+        if end_ts:
+            where_conditions.append("date < ?")
+            parameters.append(end_ts)
+        if min_amount is not None:
+            where_conditions.append("ABS(amount) >= ?")
+            parameters.append(min_amount)
+        if max_amount is not None:
+            where_conditions.append("ABS(amount) <= ?")
+            parameters.append(max_amount)
+        parameters.append(page_size)
+        rows = self._fetchall(f"""
+            SELECT transaction_id, date, description, amount, currency, type
+            FROM Transactions
+            WHERE {" AND ".join(where_conditions)}
+            ORDER BY date DESC, transaction_id DESC
+            LIMIT ?
+        """, parameters)
+        return [{
+            "transaction_id": row["transaction_id"],
+            "date": row["date"],
+            "description": row["description"],
+            "amount": float(row["amount"]),
+            "currency": row["currency"],
+            "type": row["type"]
+        } for row in rows]
+
+    def _insert_transfer_rows(self, user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp):
+        insert_str = """
+            INSERT INTO Transactions (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        self._execute(insert_str, (f"{transaction_base_id}_D", from_account_id, user_id, timestamp,
+                                   f"Transfer to account {to_account_id}", -amount, currency, "transfer_debit", memo))
+        self._execute(insert_str, (f"{transaction_base_id}_C", to_account_id, user_id, timestamp,
+                                   f"Transfer from account {from_account_id}", amount, currency, "transfer_credit", memo))
+
+    def transfer_funds(self, user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp) -> None:
+        with self._transaction():
+            self._execute("UPDATE Accounts SET balance = balance - ? WHERE account_id = ? AND user_id = ?",
+                          (amount, from_account_id, user_id))
+            self._execute("UPDATE Accounts SET balance = balance + ? WHERE account_id = ? AND user_id = ?",
+                          (amount, to_account_id, user_id))
+            self._insert_transfer_rows(user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp)
+
+    def transfer_funds_guarded(self, user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp) -> dict:
+        # The write lock is held from the checks through the commit, so the checks cannot go stale
+        with self._transaction():
+            from_account = self.get_account_by_id(user_id, from_account_id)
+            to_account = self.get_account_by_id(user_id, to_account_id)
+            if from_account is None:
+                raise GuardViolation("ERROR_FROM_ACCOUNT_INVALID")
+            if to_account is None:
+                raise GuardViolation("ERROR_TO_ACCOUNT_INVALID")
+            if from_account["currency"] != currency or to_account["currency"] != currency:
+                raise GuardViolation("ERROR_CURRENCY_MISMATCH", f"{from_account['currency']}/{to_account['currency']}")
+            if from_account["balance"] < amount:
+                raise GuardViolation("ERROR_INSUFFICIENT_FUNDS", str(from_account["balance"]))
+
+            self._execute("UPDATE Accounts SET balance = balance - ? WHERE account_id = ? AND user_id = ? AND balance >= ?",
+                          (amount, from_account_id, user_id, amount))
+            self._execute("UPDATE Accounts SET balance = balance + ? WHERE account_id = ? AND user_id = ?",
+                          (amount, to_account_id, user_id))
+            self._insert_transfer_rows(user_id, from_account_id, to_account_id, amount, currency, memo, transaction_base_id, timestamp)
+        return {"from_balance": from_account["balance"] - amount, "from_account_type": from_account["account_type"],
+                "to_balance": to_account["balance"] + amount, "to_account_type": to_account["account_type"]}
+
+    # --- Billers ---
+    def find_billers(self, user_id: str, bill_type: str, payee_nickname: str = None) -> list:
+        where_conditions = ["user_id = ?", "bill_type = ?"]
+        parameters = [user_id, bill_type]
+        if payee_nickname:
+            where_conditions.append("biller_nickname = ?")
+            parameters.append(payee_nickname)
+        rows = self._fetchall(f"""
+            SELECT biller_id, biller_name, last_due_amount AS due_amount, last_due_date AS due_date, default_payment_account_id
+            FROM RegisteredBillers
+            WHERE {" AND ".join(where_conditions)}
+        """, parameters)
+        return [dict(row) for row in rows]
+
+    def get_biller_name(self, user_id: str, biller_id: str) -> str | None:
+        row = self._fetchone("""
+            SELECT biller_name
+            FROM RegisteredBillers
+            WHERE biller_id = ? AND user_id = ?
+            LIMIT 1
+        """, (biller_id, user_id))
+        return row["biller_name"] if row else None
+
+    def _insert_bill_payment(self, user_id, biller_id, from_account_id, amount, currency, description, memo, transaction_id, timestamp):
+        self._execute("""
+            INSERT INTO Transactions (transaction_id, account_id, user_id, date, description, amount, currency, type, memo)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'bill_payment', ?)
+        """, (transaction_id, from_account_id, user_id, timestamp, description, -amount, currency, memo))
+        self._execute("""
+            UPDATE RegisteredBillers
+            SET last_due_amount = 0, last_due_date = date(?)
+            WHERE biller_id = ? AND user_id = ?
+        """, (timestamp, biller_id, user_id))
+
+    def pay_bill(self, user_id, biller_id, from_account_id, amount, currency, description, memo, transaction_id, timestamp) -> None:
+        with self._transaction():
+            self._execute("UPDATE Accounts SET balance = balance - ? WHERE account_id = ? AND user_id = ?",
+                          (amount, from_account_id, user_id))
+            self._insert_bill_payment(user_id, biller_id, from_account_id, amount, currency, description, memo, transaction_id, timestamp)
+
+    def pay_bill_guarded(self, user_id, biller_id, from_account_id, amount, memo, transaction_id, timestamp) -> dict:
+        with self._transaction():
+            from_account = self.get_account_by_id(user_id, from_account_id)
+            biller_name = self.get_biller_name(user_id, biller_id)
+            if from_account is None:
+                raise GuardViolation("ERROR_ACCOUNT_NOT_FOUND")
+            if from_account["balance"] < amount:
+                raise GuardViolation("INSUFFICIENT_FUNDS", f"{from_account['balance']}/{from_account['currency']}")
+            if biller_name is None:
+                raise GuardViolation("ERROR_BILLER_NOT_FOUND")
+
+            self._execute("UPDATE Accounts SET balance = balance - ? WHERE account_id = ? AND user_id = ? AND balance >= ?",
+                          (amount, from_account_id, user_id, amount))
+            description = f"Bill Payment to {biller_name} (Biller ID: {biller_id})"
+            self._insert_bill_payment(user_id, biller_id, from_account_id, amount, from_account["currency"], description, memo, transaction_id, timestamp)
+        return {"biller_name": biller_name, "currency": from_account["currency"],
+                "balance_after": from_account["balance"] - amount, "account_type": from_account["account_type"]}
+
+    def find_active_biller(self, user_id: str, biller_type: str, account_number: str) -> str | None:
+        row = self._fetchone("""
+            SELECT biller_id FROM RegisteredBillers
+            WHERE user_id = ?
+              AND bill_type = ?
+              AND account_number_at_biller = ?
+              AND status = 'ACTIVE'
+            LIMIT 1
+        """, (user_id, biller_type, account_number))
+        return row["biller_id"] if row else None
+
+    def insert_biller(self, biller: dict) -> None:
+        timestamp = _to_db_value(biller["timestamp"])
+        self._execute("""
+            INSERT INTO RegisteredBillers (
+                biller_id, user_id, biller_name, bill_type, account_number_at_biller,
+                biller_nickname, default_payment_account_id, status,
+                last_due_amount, last_due_date, registration_ts, last_updated_ts
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, 'ACTIVE', ?, ?, ?, ?)
+        """, (biller["biller_id"], biller["user_id"], biller["biller_name"], biller["biller_type"], biller["account_number"],
+              biller.get("payee_nickname"), biller.get("default_payment_account_id"),
+              biller.get("due_amount"), _to_db_value(biller.get("due_date")), timestamp, timestamp))
+
+    def update_biller(self, user_id: str, biller_id: str, updates: dict, timestamp) -> int | None:
+        set_clauses = [f"{_BILLER_COLUMNS[field]} = ?" for field in updates]
+        parameters = [_to_db_value(value) for value in updates.values()]
+        set_clauses.append("last_updated_ts = ?")
+        parameters.extend([_to_db_value(timestamp), user_id, biller_id])
+        cursor = self._execute(f"""
+            UPDATE RegisteredBillers
+            SET {', '.join(set_clauses)}
+            WHERE user_id = ? AND biller_id = ?
+        """, parameters)
+        return cursor.rowcount
+
+    def list_billers(self, user_id: str) -> list:
+        rows = self._fetchall("""
+            SELECT biller_id,
+                   biller_name,
+                   bill_type AS biller_type,
+                   account_number_at_biller AS account_number,
+                   biller_nickname AS payee_nickname,
+                   default_payment_account_id,
+                   last_due_amount AS due_amount,
+                   last_due_date AS due_date
+            FROM RegisteredBillers
+            WHERE user_id = ?
+            ORDER BY biller_name, biller_nickname
+        """, (user_id,))
+        return [dict(row) for row in rows]
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+import gemini_tools
+from biller_index import BILLER_INDEX, CONFIRM_MATCH_TYPES, BillerIndex
+
+BILLERS = [
+    {"biller_id": "b_edison", "biller_name": "Edison Power", "payee_nickname": "Home Electric"},
+    {"biller_id": "b_city_water", "biller_name": "City Water", "payee_nickname": None},
+    {"biller_id": "b_water", "biller_name": "Water", "payee_nickname": None},
+    {"biller_id": "b_mom", "biller_name": "Mom Phone", "payee_nickname": None},
+]
+
+
+def lookup_ids(query: str) -> tuple:
+    match_type, matches = BillerIndex(BILLERS).lookup(query)
+    return match_type, [biller["biller_id"] for biller in matches]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Edison Power", ("exact", ["b_edison"])),
+    ("home electric", ("exact", ["b_edison"])), # nickname
+    ("Edison  Power!", ("exact", ["b_edison"])), # normalized
+    ("edison", ("partial", ["b_edison"])), # substring
+    ("power edison", ("partial", ["b_edison"])), # every word, any order
+    ("eddison", ("phonetic", ["b_edison"])),
+    ("citty watr", ("phonetic", ["b_city_water"])),
+    ("eddison powr", ("fuzzy", ["b_edison"])),
+    ("dad phone", ("fuzzy", ["b_mom"])),
+    ("xyz", (None, [])),
+])
+def test_lookup_tiers(query, expected):
+    assert lookup_ids(query) == expected
+
+
+def test_exact_match_wins_over_partial():
+    # "water" is also contained in "City Water", but the exact name decides
+    assert lookup_ids("water") == ("exact", ["b_water"])
+
+
+def test_several_candidates_in_a_tier_are_returned_in_biller_order():
+    assert lookup_ids("wat") == ("partial", ["b_city_water", "b_water"])
+
+
+def test_only_phonetic_and_fuzzy_matches_need_confirmation():
+    assert CONFIRM_MATCH_TYPES == {"phonetic", "fuzzy"}
+
+
+@pytest.mark.parametrize("query, match_type", [("eddison", "phonetic"), ("dad phone", "fuzzy")])
+def test_resolve_biller_by_name_asks_to_confirm_guessed_matches(query, match_type):
+    BILLER_INDEX.put("user_test", BILLERS)
+    try:
+        result = asyncio.run(gemini_tools.resolve_biller_by_name("user_test", query))
+    finally:
+        BILLER_INDEX.invalidate("user_test")
+    assert result["status"] == "ERROR_BILLER_NEEDS_CONFIRMATION"
+    assert result["match_type"] == match_type
+
+
+def test_resolve_biller_by_name_accepts_partial_matches():
+    BILLER_INDEX.put("user_test", BILLERS)
+    try:
+        result = asyncio.run(gemini_tools.resolve_biller_by_name("user_test", "edison"))
+    finally:
+        BILLER_INDEX.invalidate("user_test")
+    assert result == {"status": "SUCCESS", "biller_id": "b_edison", "biller_name": "Edison Power"}
@@ -0,0 +1,55 @@
+import pytest
+
+from faq_index import FAQ_SAMPLE_CORPUS_PATH, FaqIndex, build_index_bytes, load_faq_index, tokenize
+
+
+@pytest.fixture(scope="module")
+def sample_index():
+    with open(FAQ_SAMPLE_CORPUS_PATH, "rb") as f:
+        return FaqIndex(build_index_bytes(f.read()), source="memory")
+
+
+def test_tokenize_drops_stop_words_and_stems():
+    assert tokenize("How do I reset my cards?") == ["reset", "card"]
+
+
+@pytest.mark.parametrize("query, expected_id", [
+    ("how do i reset my pin", "faq_pin_reset"),
+    ("forgot my password", "faq_forgot_password"),
+    ("branch opening hours on saturday", "faq_branch_hours"),
+    ("lost card", "faq_lost_card"),
+])
+def test_best_match_for_sample_questions(sample_index, query, expected_id):
+    assert sample_index.search(query)[0]["id"] == expected_id
+
+
+def test_results_are_ranked_by_descending_score(sample_index):
+    results = sample_index.search("reset pin", top_k=5)
+    scores = [result["score"] for result in results]
+    assert len(results) > 1
+    assert scores == sorted(scores, reverse=True)
+    assert results[0]["score"] > results[1]["score"]
+    assert set(results[0]) == {"id", "question", "answer", "score"}
+
+
+def test_question_terms_outweigh_answer_terms(sample_index):
+    # "password" appears in other answers too, but only this question is about it
+    results = sample_index.search("password", top_k=3)
+    assert results[0]["id"] == "faq_forgot_password"
+
+
+def test_unknown_terms_match_nothing(sample_index):
+    assert sample_index.search("xyzzy") == []
+
+
+def test_load_writes_and_reuses_the_index_file(tmp_path):
+    index_path = str(tmp_path / "faq_index.bin")
+    built = load_faq_index(corpus_path=FAQ_SAMPLE_CORPUS_PATH, index_path=index_path)
+    reopened = load_faq_index(corpus_path=FAQ_SAMPLE_CORPUS_PATH, index_path=index_path)
+    try:
+        assert reopened.source == index_path
+        assert reopened.corpus_digest == built.corpus_digest
+        assert reopened.search("lost card")[0]["id"] == "faq_lost_card"
+    finally:
+        built.close()
+        reopened.close()
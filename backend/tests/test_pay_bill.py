@@ -0,0 +1,151 @@
+from types import SimpleNamespace
+
+import pytest
+
+import bigquery_functions
+from account_cache import ACCOUNT_CACHE
+from bank_repository import GuardViolation, StatementFailed
+from bigquery_functions import pay_bill
+from bigquery_repository import BigQueryRepository, _parse_guard_violation
+from sqlite_repository import SQLiteRepository
+
+USER_ID = "user_test"
+CHECKING_ID = "acc_chk_test"
+BILLER_ID = "biller_test_elec"
+
+
+@pytest.fixture(autouse=True)
+def clean_account_cache():
+    ACCOUNT_CACHE.clear()
+    yield
+    ACCOUNT_CACHE.clear()
+
+
+@pytest.fixture
+def sqlite_repo(monkeypatch):
+    repository = SQLiteRepository(":memory:", seed_demo_data=False)
+    repository._conn.execute(
+        "INSERT INTO Accounts (account_id, user_id, account_type, account_nickname, balance, currency) VALUES (?, ?, ?, ?, ?, ?)",
+        (CHECKING_ID, USER_ID, "checking", "Everyday", 100.0, "USD"))
+    repository._conn.execute(
+        "INSERT INTO RegisteredBillers (biller_id, user_id, biller_name, bill_type, last_due_amount, last_due_date) VALUES (?, ?, ?, ?, ?, ?)",
+        (BILLER_ID, USER_ID, "City Power", "electricity", 75.5, "2026-03-10"))
+    monkeypatch.setattr(bigquery_functions, "repository", repository)
+    return repository
+
+
+class StubRepository:
+    """Stands in for the storage backend: pay_bill_guarded raises or returns what it was given."""
+
+    last_query = "-- guarded bill payment script"
+    last_latency_ms = 1.0
+    last_query_mode = "job"
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def pay_bill_guarded(self, *args, **kwargs):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def pay_guarded(monkeypatch, outcome, amount=40.0):
+    monkeypatch.setattr(bigquery_functions, "BILL_PAYMENT_MODE", "guarded")
+    monkeypatch.setattr(bigquery_functions, "repository", StubRepository(outcome))
+    return pay_bill(BILLER_ID, amount, CHECKING_ID, USER_ID)
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("400 Query error: GUARD_VIOLATION:ERROR_ACCOUNT_NOT_FOUND at [11:13]", ("ERROR_ACCOUNT_NOT_FOUND", None)),
+    ("400 Query error: GUARD_VIOLATION:INSUFFICIENT_FUNDS:12.5/USD at [14:13]", ("INSUFFICIENT_FUNDS", "12.5/USD")),
+    ("400 Query error: 'GUARD_VIOLATION:INSUFFICIENT_FUNDS' at [27:13]", ("INSUFFICIENT_FUNDS", None)),
+    ("400 Query error: GUARD_VIOLATION:ERROR_BILLER_NOT_FOUND at [17:13]", ("ERROR_BILLER_NOT_FOUND", None)),
+    ("403 Access Denied: Table Accounts", None),
+])
+def test_parse_guard_violation(message, expected):
+    assert _parse_guard_violation(Exception(message)) == expected
+
+
+def fake_bigquery_client(result=None, error=None):
+    def query(query_str, job_config=None):
+        def job_result():
+            if error is not None:
+                raise error
+            return iter([result])
+        return SimpleNamespace(result=job_result, errors=None)
+    return SimpleNamespace(query=query)
+
+
+def test_bigquery_script_failure_raises_guard_violation():
+    client = fake_bigquery_client(error=Exception("400 Query error: GUARD_VIOLATION:INSUFFICIENT_FUNDS:12.5/USD at [14:13]"))
+    repository = BigQueryRepository(client, "test-project")
+    with pytest.raises(GuardViolation) as raised:
+        repository.pay_bill_guarded(USER_ID, BILLER_ID, CHECKING_ID, 40.0, "memo", "txn_bill_test", "2026-03-01T12:00:00+00:00")
+    assert (raised.value.status, raised.value.detail) == ("INSUFFICIENT_FUNDS", "12.5/USD")
+
+
+def test_bigquery_script_confirmation_row_is_returned():
+    row = SimpleNamespace(biller_name="City Power", currency="USD", balance_after=60, account_type="checking")
+    repository = BigQueryRepository(fake_bigquery_client(result=row), "test-project")
+    confirmation = repository.pay_bill_guarded(USER_ID, BILLER_ID, CHECKING_ID, 40.0, "memo", "txn_bill_test", "2026-03-01T12:00:00+00:00")
+    assert confirmation == {"biller_name": "City Power", "currency": "USD", "balance_after": 60.0, "account_type": "checking"}
+    # The balance comes from the committed row, not from the pre-transaction snapshot
+    assert "from_account.balance - @amount" not in repository.last_query
+
+
+@pytest.mark.parametrize("payee_id, from_account_id, amount", [
+    (BILLER_ID, "acc_missing", 40.0),
+    (BILLER_ID, CHECKING_ID, 100.01),
+    ("biller_missing", CHECKING_ID, 40.0),
+])
+def test_guarded_rejections_match_the_validated_path(sqlite_repo, monkeypatch, payee_id, from_account_id, amount):
+    monkeypatch.setattr(bigquery_functions, "BILL_PAYMENT_MODE", "validated")
+    validated = pay_bill(payee_id, amount, from_account_id, USER_ID)
+    ACCOUNT_CACHE.clear()
+    monkeypatch.setattr(bigquery_functions, "BILL_PAYMENT_MODE", "guarded")
+    guarded = pay_bill(payee_id, amount, from_account_id, USER_ID)
+    assert guarded["status"] != "SUCCESS"
+    assert guarded == validated
+
+
+def test_guarded_success_caches_the_committed_balance(sqlite_repo, monkeypatch):
+    monkeypatch.setattr(bigquery_functions, "BILL_PAYMENT_MODE", "guarded")
+    ACCOUNT_CACHE.put_account(USER_ID, {"account_id": CHECKING_ID, "account_type": "checking", "balance": 100.0, "currency": "USD"})
+    result = pay_bill(BILLER_ID, 40.0, CHECKING_ID, USER_ID)
+    assert result["status"] == "SUCCESS"
+    assert (result["biller_name"], result["amount_paid"], result["currency"]) == ("City Power", 40.0, "USD")
+    committed = sqlite_repo.get_account_by_id(USER_ID, CHECKING_ID)
+    assert committed["balance"] == 60.0
+    assert ACCOUNT_CACHE.get_account(USER_ID, CHECKING_ID)["balance"] == committed["balance"]
+
+
+def test_insufficient_funds_detail_is_mapped_and_evicts_the_account(monkeypatch):
+    ACCOUNT_CACHE.put_account(USER_ID, {"account_id": CHECKING_ID, "account_type": "checking", "balance": 100.0, "currency": "USD"})
+    result = pay_guarded(monkeypatch, GuardViolation("INSUFFICIENT_FUNDS", "12.5/USD"))
+    assert result["status"] == "INSUFFICIENT_FUNDS"
+    assert (result["current_balance"], result["currency"], result["requested_amount"]) == (12.5, "USD", 40.0)
+    assert ACCOUNT_CACHE.get_account(USER_ID, CHECKING_ID) is None
+
+
+def test_insufficient_funds_without_detail_has_no_balance(monkeypatch):
+    # Raised by the ASSERT after the guarded UPDATE, which does not know the balance
+    result = pay_guarded(monkeypatch, GuardViolation("INSUFFICIENT_FUNDS"))
+    assert result["status"] == "INSUFFICIENT_FUNDS"
+    assert (result["current_balance"], result["currency"]) == (None, None)
+
+
+@pytest.mark.parametrize("status", ["ERROR_ACCOUNT_NOT_FOUND", "ERROR_BILLER_NOT_FOUND"])
+def test_not_found_statuses_are_passed_through(monkeypatch, status):
+    assert pay_guarded(monkeypatch, GuardViolation(status))["status"] == status
+
+
+@pytest.mark.parametrize("outcome, status", [
+    (None, "ERROR_TRANSACTION_FAILED"),
+    (StatementFailed([{"message": "boom"}]), "ERROR_TRANSACTION_FAILED"),
+    (RuntimeError("connection reset"), "ERROR_EXCEPTION"),
+])
+def test_unknown_outcomes_evict_the_users_accounts(monkeypatch, outcome, status):
+    ACCOUNT_CACHE.put_account(USER_ID, {"account_id": CHECKING_ID, "account_type": "checking", "balance": 100.0, "currency": "USD"})
+    assert pay_guarded(monkeypatch, outcome)["status"] == status
+    assert ACCOUNT_CACHE.get_account(USER_ID, CHECKING_ID) is None
@@ -0,0 +1,113 @@
+import sqlite3
+
+import pytest
+
+from bank_repository import GuardViolation
+from sqlite_repository import SQLiteRepository
+
+USER_ID = "user_test"
+CHECKING_ID = "acc_chk_test"
+SAVINGS_ID = "acc_sav_test"
+BILLER_ID = "biller_test_elec"
+TIMESTAMP = "2026-03-01T12:00:00+00:00"
+
+
+@pytest.fixture
+def repo():
+    repository = SQLiteRepository(":memory:", seed_demo_data=False)
+    repository._conn.executemany(
+        "INSERT INTO Accounts (account_id, user_id, account_type, account_nickname, balance, currency) VALUES (?, ?, ?, ?, ?, ?)",
+        [(CHECKING_ID, USER_ID, "checking", "Everyday", 100.0, "USD"),
+         (SAVINGS_ID, USER_ID, "savings", "Rainy Day", 500.0, "USD")])
+    repository._conn.execute(
+        "INSERT INTO RegisteredBillers (biller_id, user_id, biller_name, bill_type, last_due_amount, last_due_date) VALUES (?, ?, ?, ?, ?, ?)",
+        (BILLER_ID, USER_ID, "City Power", "electricity", 75.5, "2026-03-10"))
+    return repository
+
+
+def balances(repository) -> dict:
+    return {row["account_id"]: row["balance"] for row in repository.get_accounts(USER_ID, [], [CHECKING_ID, SAVINGS_ID])}
+
+
+def transaction_count(repository) -> int:
+    return repository._conn.execute("SELECT COUNT(*) FROM Transactions").fetchone()[0]
+
+
+def transfer_guarded(repository, from_account_id=SAVINGS_ID, to_account_id=CHECKING_ID, amount=50.0):
+    return repository.transfer_funds_guarded(USER_ID, from_account_id, to_account_id, amount, "USD", "memo", "txn_test", TIMESTAMP)
+
+
+def pay_bill_guarded(repository, biller_id=BILLER_ID, from_account_id=CHECKING_ID, amount=40.0):
+    return repository.pay_bill_guarded(USER_ID, biller_id, from_account_id, amount, "memo", "txn_bill_test", TIMESTAMP)
+
+
+def test_guarded_transfer_returns_the_committed_balances(repo):
+    result = transfer_guarded(repo)
+    assert result == {"from_balance": 450.0, "from_account_type": "savings",
+                      "to_balance": 150.0, "to_account_type": "checking"}
+    assert balances(repo) == {SAVINGS_ID: result["from_balance"], CHECKING_ID: result["to_balance"]}
+    assert transaction_count(repo) == 2
+
+
+@pytest.mark.parametrize("kwargs, status, detail", [
+    ({"amount": 500.01}, "ERROR_INSUFFICIENT_FUNDS", "500.0"),
+    ({"from_account_id": "acc_missing"}, "ERROR_FROM_ACCOUNT_INVALID", None),
+    ({"to_account_id": "acc_missing"}, "ERROR_TO_ACCOUNT_INVALID", None),
+])
+def test_rejected_guarded_transfer_changes_nothing(repo, kwargs, status, detail):
+    with pytest.raises(GuardViolation) as raised:
+        transfer_guarded(repo, **kwargs)
+    assert (raised.value.status, raised.value.detail) == (status, detail)
+    assert balances(repo) == {CHECKING_ID: 100.0, SAVINGS_ID: 500.0}
+    assert transaction_count(repo) == 0
+
+
+def test_transfer_rolls_back_when_a_later_statement_fails(repo):
+    repo.transfer_funds(USER_ID, SAVINGS_ID, CHECKING_ID, 10.0, "USD", "memo", "txn_dup", TIMESTAMP)
+    # Same transaction ids: both balance updates run, then the insert fails on the primary key
+    with pytest.raises(sqlite3.IntegrityError):
+        repo.transfer_funds(USER_ID, SAVINGS_ID, CHECKING_ID, 20.0, "USD", "memo", "txn_dup", TIMESTAMP)
+    assert balances(repo) == {CHECKING_ID: 110.0, SAVINGS_ID: 490.0}
+    assert transaction_count(repo) == 2
+
+
+def test_guarded_bill_payment_returns_the_committed_balance(repo):
+    result = pay_bill_guarded(repo)
+    assert result == {"biller_name": "City Power", "currency": "USD", "balance_after": 60.0, "account_type": "checking"}
+    assert balances(repo)[CHECKING_ID] == result["balance_after"]
+    biller = repo.find_billers(USER_ID, "electricity")[0]
+    assert (biller["due_amount"], biller["due_date"]) == (0, "2026-03-01")
+    assert transaction_count(repo) == 1
+
+
+@pytest.mark.parametrize("kwargs, status, detail", [
+    ({"amount": 100.01}, "INSUFFICIENT_FUNDS", "100.0/USD"),
+    ({"from_account_id": "acc_missing"}, "ERROR_ACCOUNT_NOT_FOUND", None),
+    ({"biller_id": "biller_missing"}, "ERROR_BILLER_NOT_FOUND", None),
+])
+def test_rejected_guarded_bill_payment_changes_nothing(repo, kwargs, status, detail):
+    with pytest.raises(GuardViolation) as raised:
+        pay_bill_guarded(repo, **kwargs)
+    assert (raised.value.status, raised.value.detail) == (status, detail)
+    assert balances(repo) == {CHECKING_ID: 100.0, SAVINGS_ID: 500.0}
+    assert repo.find_billers(USER_ID, "electricity")[0]["due_amount"] == 75.5
+    assert transaction_count(repo) == 0
+
+
+def test_transaction_pages_follow_the_keyset_order(repo):
+    # Ties on date are broken by transaction_id, both descending, as in the BigQuery ORDER BY
+    rows = [(f"txn_{i:02d}", CHECKING_ID, USER_ID, f"2026-02-{1 + i // 3:02d}T09:00:00+00:00", "Test", -float(i), "USD", "debit", None)
+            for i in range(12)]
+    repo._conn.executemany(
+        "INSERT INTO Transactions (transaction_id, account_id, user_id, date, description, amount, currency, type, memo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows)
+    expected = [row[0] for row in sorted(rows, key=lambda row: (row[3], row[0]), reverse=True)]
+
+    seen, after = [], None
+    while True:
+        page = repo.list_transactions_page(CHECKING_ID, 5, after=after)
+        seen.extend(txn["transaction_id"] for txn in page)
+        if len(page) < 5:
+            break
+        after = (page[-1]["date"], page[-1]["transaction_id"])
+    assert seen == expected
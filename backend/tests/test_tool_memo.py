@@ -0,0 +1,72 @@
+import pytest
+
+import tool_memo
+from tool_memo import ToolMemo
+
+BALANCE_ARGS = {"account_type": "checking"}
+BALANCE_RESULT = {"status": "SUCCESS", "balance": 120.0, "currency": "USD"}
+BILLERS_RESULT = {"status": "SUCCESS", "billers": []}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(tool_memo.time, "monotonic", fake)
+    return fake
+
+
+def test_result_is_served_until_its_ttl_expires(clock):
+    memo = ToolMemo("user_a")
+    memo.put("getBalance", BALANCE_ARGS, BALANCE_RESULT)
+
+    clock.now += tool_memo.MEMO_POLICIES["getBalance"].ttl_seconds - 1
+    assert memo.get("getBalance", BALANCE_ARGS) == BALANCE_RESULT
+
+    clock.now += 1
+    assert memo.get("getBalance", BALANCE_ARGS) is None
+    assert memo.stats()["entries"] == 0
+
+
+def test_failed_results_and_unlisted_tools_are_not_memoized(clock):
+    memo = ToolMemo("user_a")
+    memo.put("getBalance", BALANCE_ARGS, {"status": "ERROR_ACCOUNT_NOT_FOUND"})
+    memo.put("payBill", {"biller_id": "b1"}, {"status": "SUCCESS"})
+    assert memo.get("getBalance", BALANCE_ARGS) is None
+    assert memo.get("payBill", {"biller_id": "b1"}) is None
+
+
+def test_arguments_are_not_case_folded(clock):
+    memo = ToolMemo("user_a")
+    memo.put("getBalance", BALANCE_ARGS, BALANCE_RESULT)
+    assert memo.get("getBalance", {"account_type": "Checking"}) is None
+
+
+def test_mutation_evicts_dependent_entries_in_every_session_of_the_user(clock):
+    first, second, other_user = ToolMemo("user_a"), ToolMemo("user_a"), ToolMemo("user_b")
+    for memo in (first, second, other_user):
+        memo.put("getBalance", BALANCE_ARGS, BALANCE_RESULT)
+        memo.put("listRegisteredBillers", {}, BILLERS_RESULT)
+
+    # A transfer changes accounts and transactions, not billers
+    assert first.apply_mutation("executeFundTransfer") == 2
+
+    assert first.get("getBalance", BALANCE_ARGS) is None
+    assert second.get("getBalance", BALANCE_ARGS) is None
+    assert other_user.get("getBalance", BALANCE_ARGS) == BALANCE_RESULT
+    for memo in (first, second, other_user):
+        assert memo.get("listRegisteredBillers", {}) == BILLERS_RESULT
+
+
+def test_read_tools_do_not_invalidate(clock):
+    memo = ToolMemo("user_a")
+    memo.put("getBalance", BALANCE_ARGS, BALANCE_RESULT)
+    assert memo.apply_mutation("getBalance") == 0
+    assert memo.get("getBalance", BALANCE_ARGS) == BALANCE_RESULT
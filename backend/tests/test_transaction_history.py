@@ -0,0 +1,114 @@
+import base64
+import json
+
+import pytest
+
+import bigquery_functions
+from account_cache import ACCOUNT_CACHE
+from bigquery_functions import USER_ID, get_transaction_history_page, iter_transaction_history
+from sqlite_repository import SQLiteRepository
+
+CHECKING_ID = "acc_chk_test"
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    repository = SQLiteRepository(":memory:", seed_demo_data=False)
+    repository._conn.execute(
+        "INSERT INTO Accounts (account_id, user_id, account_type, account_nickname, balance, currency) VALUES (?, ?, ?, ?, ?, ?)",
+        (CHECKING_ID, USER_ID, "checking", "Everyday", 100.0, "USD"))
+    monkeypatch.setattr(bigquery_functions, "repository", repository)
+    ACCOUNT_CACHE.clear()
+    yield repository
+    ACCOUNT_CACHE.clear()
+
+
+def add_transactions(repository, rows: list) -> None:
+    """rows: (transaction_id, ISO date, amount)."""
+    repository._conn.executemany(
+        "INSERT INTO Transactions (transaction_id, account_id, user_id, date, description, amount, currency, type, memo) VALUES (?, ?, ?, ?, ?, ?, ?, 'debit', NULL)",
+        [(txn_id, CHECKING_ID, USER_ID, date, "Test", amount, "USD") for txn_id, date, amount in rows])
+
+
+def add_tied_transactions(repository, count: int) -> list:
+    """`count` rows, five per timestamp; returns their ids in (date, transaction_id) DESC order."""
+    rows = [(f"txn_{i:02d}", f"2026-02-{1 + i // 5:02d}T09:00:00+00:00", -1.0 - i) for i in range(count)]
+    add_transactions(repository, rows)
+    return [txn_id for txn_id, _date, _amount in sorted(rows, key=lambda row: (row[1], row[0]), reverse=True)]
+
+
+def page_ids(page: dict) -> list:
+    return [txn["transaction_id"] for txn in page["transactions"]]
+
+
+def test_pages_return_every_row_once_in_order_across_date_ties(repo):
+    expected = add_tied_transactions(repo, 25)
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = get_transaction_history_page("checking", page_size=10, cursor=cursor)
+        assert page["status"] == "SUCCESS"
+        seen.extend(page_ids(page))
+        pages += 1
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == expected
+    assert pages == 3
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b"[1, 2]").decode("ascii"),
+    base64.urlsafe_b64encode(json.dumps({"d": "2026-02-01T09:00:00+00:00"}).encode("utf-8")).decode("ascii"),
+])
+def test_malformed_or_tampered_cursor_is_rejected(repo, cursor):
+    add_tied_transactions(repo, 3)
+    page = get_transaction_history_page("checking", cursor=cursor)
+    assert page["status"] == "ERROR_INVALID_CURSOR"
+
+
+def test_day_bounds_are_inclusive_utc_days(repo):
+    add_transactions(repo, [
+        ("txn_before", "2026-02-01T23:59:59+00:00", -1.0),
+        ("txn_start", "2026-02-02T00:00:00+00:00", -2.0),
+        ("txn_end", "2026-02-03T23:59:59+00:00", -3.0),
+        ("txn_after", "2026-02-04T00:00:00+00:00", -4.0),
+    ])
+    page = get_transaction_history_page("checking", start_date="2026-02-02", end_date="2026-02-03")
+    assert page_ids(page) == ["txn_end", "txn_start"]
+
+
+def test_invalid_day_bound_is_rejected(repo):
+    assert get_transaction_history_page("checking", end_date="03/02/2026")["status"] == "ERROR_INVALID_DATE_FORMAT"
+
+
+def test_amount_bounds_apply_to_absolute_amounts(repo):
+    add_transactions(repo, [
+        ("txn_small_debit", "2026-02-01T09:00:00+00:00", -5.0),
+        ("txn_debit", "2026-02-02T09:00:00+00:00", -50.0),
+        ("txn_credit", "2026-02-03T09:00:00+00:00", 60.0),
+        ("txn_large_credit", "2026-02-04T09:00:00+00:00", 500.0),
+    ])
+    page = get_transaction_history_page("checking", min_amount=50, max_amount=60)
+    assert page_ids(page) == ["txn_credit", "txn_debit"]
+    assert get_transaction_history_page("checking", min_amount=60, max_amount=50)["status"] == "ERROR_INVALID_AMOUNT_RANGE"
+
+
+@pytest.mark.parametrize("rows, expected_queries", [(25, 3), (20, 2)])
+def test_iterator_stops_when_no_more_pages(repo, monkeypatch, rows, expected_queries):
+    expected = add_tied_transactions(repo, rows)
+    queries = []
+    list_page = repo.list_transactions_page
+
+    def counting_list_page(*args, **kwargs):
+        queries.append(kwargs.get("after"))
+        return list_page(*args, **kwargs)
+
+    monkeypatch.setattr(repo, "list_transactions_page", counting_list_page)
+    assert [txn["transaction_id"] for txn in iter_transaction_history("checking", page_size=10)] == expected
+    assert len(queries) == expected_queries
+
+
+def test_iterator_honours_max_rows(repo):
+    expected = add_tied_transactions(repo, 25)
+    assert [txn["transaction_id"] for txn in iter_transaction_history("checking", page_size=10, max_rows=12)] == expected[:12]
@@ -0,0 +1,104 @@
+"""
+Runs the function calls of one Gemini tool_call.
+
+Gemini can ask for several functions in one tool_call (e.g. getBalance for two accounts,
+or listRegisteredBillers plus getTransactionHistory). They used to be awaited one after
+the other, so the turn took the sum of all calls. ToolExecutor runs consecutive read-only
+calls concurrently. A mutating call (or any tool not known to be read-only) is a barrier:
+it starts only after everything before it has finished, and nothing after it starts until
+it is done. So mutations keep their order relative to every other call. Results are
+returned in call order.
+
+Concurrent calls run in tasks that copy the current context, so the session binding
+(session_context / log_session_id) is visible to every tool. With a tool_memo.ToolMemo,
+repeated read calls are answered from the session's memo and mutations evict what they change.
+"""
+import asyncio
+import time
+import traceback
+
+# Tools that only read bank data. initiateFundTransfer only checks funds; the transfer
+# itself is executeFundTransfer.
+READ_ONLY_TOOLS = frozenset({
+    "getBalance",
+    "getTransactionHistory",
+    "initiateFundTransfer",
+    "getBillDetails",
+    "listRegisteredBillers",
+    "search_faq",
+})
+
+
+class ToolExecutor:
+    """Executes function calls against a name -> async function map."""
+
+    def __init__(self, functions: dict, read_only: frozenset = READ_ONLY_TOOLS, memo=None):
+        self.functions = functions
+        self.read_only = read_only
+        self.memo = memo # Optional tool_memo.ToolMemo of the session
+
+    def is_read_only(self, name: str) -> bool:
+        return name in self.read_only
+
+    async def execute(self, function_calls: list) -> list:
+        """Returns one response dict per call, in call order."""
+        results = [None] * len(function_calls)
+        started = time.perf_counter()
+        group = [] # Indexes of consecutive read-only calls not started yet
+        groups = 0
+
+        async def run_group():
+            nonlocal groups
+            if not group:
+                return
+            outcomes = await asyncio.gather(*(self._call(function_calls[i]) for i in group))
+            for i, outcome in zip(group, outcomes):
+                results[i] = outcome
+            groups += 1
+            group.clear()
+
+        for index, fc in enumerate(function_calls):
+            if self.is_read_only(fc.name):
+                group.append(index)
+                continue
+            await run_group() # Barrier: earlier calls finish before the mutation starts
+            results[index] = await self._call(fc)
+            groups += 1
+        await run_group()
+
+        if len(function_calls) > 1:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            print(f"\033[92mQuart Backend: Executed {len(function_calls)} function calls in {groups} step(s), {elapsed_ms:.1f} ms.\033[0m")
+        return results
+
+    async def _call(self, fc) -> dict:
+        """Runs one call; errors become an error response instead of failing the whole tool_call."""
+        print(f"\033[92mQuart Backend: Gemini requests function call: {fc.name} with args: {dict(fc.args or {})}\033[0m")
+        function_to_call = self.functions.get(fc.name)
+        if not function_to_call:
+            print(f"Quart Backend: Function {fc.name} not found.")
+            return {"status": "error", "message": f"Function {fc.name} not implemented or available."}
+        try:
+            # Execute the actual local function
+            function_args = dict(fc.args or {})
+            if self.memo is not None:
+                memoized = self.memo.get(fc.name, function_args)
+                if memoized is not None:
+                    print(f"\033[92mQuart Backend: Function {fc.name} answered from session memo. Result: {memoized}\033[0m")
+                    return memoized
+            print(f"\033[92mQuart Backend: Calling function {fc.name} with args: {function_args}\033[0m")
+            try:
+                result = await function_to_call(**function_args)
+            finally:
+                if self.memo is not None:
+                    self.memo.apply_mutation(fc.name) # Also on failure: the change may have gone through
+            print(f"\033[92mQuart Backend: Function {fc.name} executed. Result: {result}\033[0m")
+            if self.memo is not None:
+                self.memo.put(fc.name, function_args, result)
+            if isinstance(result, str):
+                return {"content": result}
+            return result # Assumes result is already a dict if not a string
+        except Exception as e:
+            print(f"Quart Backend: Error executing function {fc.name}: {e}")
+            traceback.print_exc()
+            return {"status": "error", "message": str(e)}
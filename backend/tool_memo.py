@@ -0,0 +1,140 @@
+"""
+Per-session memoization of tool results, applied by tool_executor around the function dispatch.
+
+The model often repeats a read call with the same arguments within one conversation
+("what's my checking balance?" ... "and checking again?"), and each call used to run
+the tool again. ToolMemo keys results by (user, tool name, normalized arguments) and
+serves repeats from memory for a per-tool TTL (MEMO_POLICIES).
+
+Each memoized tool declares which data it depends on (the session_context keys
+ACCOUNTS, BILLERS, TRANSACTIONS), and each mutating tool declares which data it
+changes (MEMO_INVALIDATIONS). A mutation evicts every entry that depends on what it
+changed, in the memo of every open session of the same user. Only successful
+results are memoized.
+"""
+import copy
+import json
+import os
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+
+from event_bus import EVENT_BUS
+from session_context import ACCOUNTS, BILLERS, TRANSACTIONS
+
+TOOL_MEMO_ENABLED = os.getenv("TOOL_MEMO_ENABLED", "true").lower() in ("1", "true", "yes")
+TOOL_MEMO_MAX_ENTRIES = int(os.getenv("TOOL_MEMO_MAX_ENTRIES", "256"))
+
+MemoPolicy = namedtuple("MemoPolicy", ["ttl_seconds", "depends_on"])
+
+# Read tools that are memoized. Tools not listed here are never memoized.
+MEMO_POLICIES = {
+    "getBalance": MemoPolicy(30.0, frozenset({ACCOUNTS})),
+    "getTransactionHistory": MemoPolicy(60.0, frozenset({TRANSACTIONS})),
+    "getBillDetails": MemoPolicy(120.0, frozenset({BILLERS})),
+    "listRegisteredBillers": MemoPolicy(120.0, frozenset({BILLERS})),
+}
+
+# What each mutating tool changes (same as the session cache invalidation in gemini_tools)
+MEMO_INVALIDATIONS = {
+    "executeFundTransfer": frozenset({ACCOUNTS, TRANSACTIONS}),
+    "payBill": frozenset({ACCOUNTS, TRANSACTIONS, BILLERS}),
+    "registerBiller": frozenset({BILLERS}),
+    "updateBillerDetails": frozenset({BILLERS}),
+    "removeBiller": frozenset({BILLERS}),
+}
+
+# Process-wide counters over all sessions (updated on the event loop thread only)
+TOOL_MEMO_TOTALS = {"hits": 0, "misses": 0, "stores": 0, "invalidated": 0}
+# Memos of the open sessions; a mutation in one session also evicts from the others of the user
+_live_memos = weakref.WeakSet()
+
+
+def normalize_args(args: dict) -> str:
+    """Canonical form of tool arguments: None dropped, keys sorted, values exactly as given."""
+    # No case folding: the lookups behind the tools compare values exactly, so "Checking" may fail
+    # where "checking" succeeds, and the memo must not answer one with the other's result.
+    def norm(value):
+        if isinstance(value, dict):
+            return {k: norm(v) for k, v in value.items() if v is not None}
+        if isinstance(value, (list, tuple)):
+            return [norm(v) for v in value]
+        return value
+    return json.dumps(norm(args or {}), sort_keys=True, default=str)
+
+
+def _is_success(result) -> bool:
+    return isinstance(result, dict) and str(result.get("status", "")).lower() == "success"
+
+
+class ToolMemo:
+    """Memoized tool results of one websocket session (LRU bounded, TTL per tool)."""
+
+    def __init__(self, user_id: str, policies: dict = MEMO_POLICIES, invalidations: dict = MEMO_INVALIDATIONS,
+                 max_entries: int = TOOL_MEMO_MAX_ENTRIES):
+        self.user_id = user_id
+        self.policies = policies
+        self.invalidations = invalidations
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (expires_at, depends_on, result)
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        _live_memos.add(self)
+
+    def _key(self, tool_name: str, args: dict) -> tuple:
+        return (self.user_id, tool_name, normalize_args(args))
+
+    def get(self, tool_name: str, args: dict):
+        """A copy of the memoized result, or None (also for tools that are not memoized)."""
+        if tool_name not in self.policies:
+            return None
+        key = self._key(tool_name, args)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            TOOL_MEMO_TOTALS["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        TOOL_MEMO_TOTALS["hits"] += 1
+        EVENT_BUS.publish({"log_type": "TOOL_EVENT", "event_subtype": "MEMO_HIT", "tool_function_name": tool_name,
+                           "parameters_sent": args, "response_received": entry[2]})
+        return copy.deepcopy(entry[2])
+
+    def put(self, tool_name: str, args: dict, result) -> None:
+        """Memoizes the result if the tool is memoized and the call succeeded."""
+        policy = self.policies.get(tool_name)
+        if policy is None or not _is_success(result):
+            return
+        key = self._key(tool_name, args)
+        self._entries[key] = (time.monotonic() + policy.ttl_seconds, policy.depends_on, copy.deepcopy(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        TOOL_MEMO_TOTALS["stores"] += 1
+
+    def apply_mutation(self, tool_name: str) -> int:
+        """Evicts what the tool changes (MEMO_INVALIDATIONS) from every memo of this user. No-op for read tools."""
+        changed = self.invalidations.get(tool_name)
+        if not changed:
+            return 0
+        return sum(memo.invalidate(changed) for memo in list(_live_memos) if memo.user_id == self.user_id)
+
+    def invalidate(self, changed: frozenset) -> int:
+        """Evicts every entry that depends on any of the changed data. Returns the number evicted."""
+        stale = [key for key, (_expires, depends_on, _result) in self._entries.items() if depends_on & changed]
+        for key in stale:
+            del self._entries[key]
+        self.invalidated += len(stale)
+        TOOL_MEMO_TOTALS["invalidated"] += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "invalidated": self.invalidated}
@@ -0,0 +1,67 @@
+"""
+Transcription updates sent to the /listen client (user_transcription_update / model_response_update).
+
+In the original ("full") protocol every chunk re-sends the whole utterance so far, so
+bytes on the wire and JSON encoding grow quadratically with utterance length. Clients
+that connect with `?transcript_mode=delta` instead get only the new text of each chunk:
+
+    {"id", "sender", "type", "is_final": false, "delta": "...", "seq": n, "offset": chars_before}
+
+`seq` counts the updates of one utterance from 1 and `offset` is the length of the
+text before this delta, so a client can detect a gap or a duplicate. The final message
+is the same in both modes and carries the full text (`is_final: true`, plus `seq` in
+delta mode). Full mode stays the default for old clients.
+"""
+import uuid
+
+TRANSCRIPT_MODE_FULL = "full"
+TRANSCRIPT_MODE_DELTA = "delta"
+TRANSCRIPT_MODES = (TRANSCRIPT_MODE_FULL, TRANSCRIPT_MODE_DELTA)
+
+
+class TranscriptAccumulator:
+    """One speaker's current utterance: collects chunks and builds the client messages."""
+
+    def __init__(self, sender: str, message_type: str, mode: str = TRANSCRIPT_MODE_FULL):
+        self.sender = sender
+        self.message_type = message_type
+        self.mode = mode if mode in TRANSCRIPT_MODES else TRANSCRIPT_MODE_FULL
+        self.reset()
+
+    def reset(self) -> None:
+        """Ends the utterance; the next chunk starts a new one with a new id."""
+        self.utterance_id = None
+        self._parts = [] # Joined only when the full text is needed
+        self.length = 0
+        self.seq = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def append(self, chunk: str) -> dict | None:
+        """Adds a chunk and returns the update message to send (None for an empty chunk)."""
+        if not chunk:
+            return None
+        if self.utterance_id is None: # Start of a new utterance
+            self.utterance_id = str(uuid.uuid4())
+        offset = self.length
+        self._parts.append(chunk)
+        self.length += len(chunk)
+        self.seq += 1
+        payload = {'id': self.utterance_id, 'sender': self.sender, 'type': self.message_type, 'is_final': False}
+        if self.mode == TRANSCRIPT_MODE_DELTA:
+            payload.update({'delta': chunk, 'seq': self.seq, 'offset': offset})
+        else:
+            payload['text'] = self.text # Send accumulated text
+        return payload
+
+    def final(self) -> dict | None:
+        """The final message with the full text, or None if nothing was transcribed."""
+        if self.utterance_id is None or not self.length:
+            return None
+        payload = {'id': self.utterance_id, 'text': self.text, 'sender': self.sender,
+                   'type': self.message_type, 'is_final': True}
+        if self.mode == TRANSCRIPT_MODE_DELTA:
+            payload['seq'] = self.seq + 1
+        return payload
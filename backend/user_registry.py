@@ -0,0 +1,60 @@
+"""
+Per-user TTL + LRU registry shared by the in-memory lookup structures built from a
+user's rows (biller_index, account_matcher).
+
+Each entry is built from the user's complete row list by the registry's `build`
+callable, expires after `ttl_seconds`, and the least recently used user is evicted
+once more than `max_users` are held.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserRegistry:
+    """Thread-safe TTL + LRU map of user_id -> structure built from that user's rows."""
+
+    def __init__(self, build, max_users: int, ttl_seconds: float):
+        self._build = build
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # user_id -> (expires_at, built value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id: str, rows: list):
+        """Builds and stores the structure for the user's complete row list."""
+        value = self._build(rows)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"users": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "max_users": self.max_users, "ttl_seconds": self.ttl_seconds}
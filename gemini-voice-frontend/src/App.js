@@ -64,44 +64,64 @@ const App = () => {
     setMessages(prev => [...prev, newEntry]);
   }, []);
 
-  const fetchBigQueryLogs = useCallback(async () => {
-    setIsLoading(true);
-    try {
-      const response = await fetch(`https://${BACKEND_HOST}/api/logs`);
-      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const data = await response.json();
-      const newLogEntries = data.map(log => ({
-        id: generateUniqueId(),
-        type: 'bigquery',
-        content: typeof log === 'string' ? log : log.message || JSON.stringify(log),
-        timestamp: log.timestamp ? new Date(log.timestamp).toLocaleTimeString() : new Date().toLocaleTimeString()
-      }));
-      newLogEntries.forEach(logEntry => {
-        const logContentString = String(logEntry.content);
-        const contentLowerCase = logContentString.toLowerCase();
-        const errorKeywords = ['error', 'failed', 'exception', 'traceback', 'critical', 'err:', 'warn:', 'warning'];
-        let isError = (logEntry.status && String(logEntry.status).toLowerCase().includes('error')) || errorKeywords.some(keyword => contentLowerCase.includes(keyword));
-        console.log(`%c[BigQuery ${isError ? 'ERROR' : 'Log'}] ${logEntry.timestamp}: ${logContentString}`, isError ? 'color: #FF3131; font-weight: bold;' : 'color: #39FF14;');
+  const handleBackendLogs = useCallback((data) => {
+    const newLogEntries = data.map(log => ({
+      id: generateUniqueId(),
+      type: 'bigquery',
+      content: typeof log === 'string' ? log : log.message || JSON.stringify(log),
+      timestamp: log.timestamp ? new Date(log.timestamp).toLocaleTimeString() : new Date().toLocaleTimeString()
+    }));
+    newLogEntries.forEach(logEntry => {
+      const logContentString = String(logEntry.content);
+      const contentLowerCase = logContentString.toLowerCase();
+      const errorKeywords = ['error', 'failed', 'exception', 'traceback', 'critical', 'err:', 'warn:', 'warning'];
+      let isError = (logEntry.status && String(logEntry.status).toLowerCase().includes('error')) || errorKeywords.some(keyword => contentLowerCase.includes(keyword));
+      console.log(`%c[BigQuery ${isError ? 'ERROR' : 'Log'}] ${logEntry.timestamp}: ${logContentString}`, isError ? 'color: #FF3131; font-weight: bold;' : 'color: #39FF14;');
+    });
+    setMessages(prevMessages => {
+      const existingLogContents = new Set(prevMessages.filter(m => m.type === 'bigquery').map(m => m.content));
+      const uniqueNewEntries = newLogEntries.filter(newLog => {
+        if (existingLogContents.has(newLog.content)) return false;
+        existingLogContents.add(newLog.content); // Also drop repeats within the batch
+        return true;
       });
-      setMessages(prevMessages => {
-        const existingLogContents = new Set(prevMessages.filter(m => m.type === 'bigquery').map(m => m.content));
-        const uniqueNewEntries = newLogEntries.filter(newLog => !existingLogContents.has(newLog.content));
-        return [...prevMessages, ...uniqueNewEntries].sort((a, b) => new Date('1970/01/01 ' + a.timestamp) - new Date('1970/01/01 ' + b.timestamp));
-      });
-      setBigQueryLogs(prevLogs => [...prevLogs, ...newLogEntries]);
-    } catch (error) {
-      console.error("Failed to fetch BigQuery logs:", error);
-      addLogEntry('error', `Failed to fetch BigQuery logs: ${error.message}`);
-    } finally {
-      setIsLoading(false);
-    }
-  }, [addLogEntry]);
+      return [...prevMessages, ...uniqueNewEntries].sort((a, b) => new Date('1970/01/01 ' + a.timestamp) - new Date('1970/01/01 ' + b.timestamp));
+    });
+    setBigQueryLogs(prevLogs => [...prevLogs, ...newLogEntries]);
+  }, []);
 
   useEffect(() => {
-    fetchBigQueryLogs();
-    const intervalId = setInterval(fetchBigQueryLogs, 15000);
-    return () => clearInterval(intervalId);
-  }, [fetchBigQueryLogs]);
+    // Server push instead of polling /api/logs: replay the stored entries (since=0), then receive
+    // each new entry as it is logged. EventSource reconnects by itself, resuming from the last id.
+    // Entries are buffered and applied once per animation frame: the replay can be thousands of
+    // events, and a state update (dedupe + sort of all messages) per event is quadratic.
+    setIsLoading(true);
+    let pendingLogs = [];
+    let flushFrame = null;
+    const flushLogs = () => {
+      flushFrame = null;
+      const batch = pendingLogs;
+      pendingLogs = [];
+      if (batch.length) handleBackendLogs(batch);
+    };
+    const logStream = new EventSource(`https://${BACKEND_HOST}/api/logs/stream?since=0`);
+    logStream.onopen = () => setIsLoading(false);
+    logStream.addEventListener('log', (event) => {
+      pendingLogs.push(JSON.parse(event.data));
+      if (flushFrame === null) flushFrame = requestAnimationFrame(flushLogs);
+    });
+    logStream.addEventListener('dropped', (event) => {
+      addLogEntry('error', `Log stream skipped ${JSON.parse(event.data).dropped} entries (client too slow).`);
+    });
+    logStream.onerror = () => {
+      setIsLoading(false);
+      console.error("BigQuery log stream interrupted, reconnecting...");
+    };
+    return () => {
+      logStream.close();
+      if (flushFrame !== null) cancelAnimationFrame(flushFrame);
+    };
+  }, [handleBackendLogs, addLogEntry]);
 
   useEffect(() => { if (logsAreaRef.current) logsAreaRef.current.scrollTop = logsAreaRef.current.scrollHeight; }, [messages]);
   useEffect(() => { if (chatAreaRef.current) chatAreaRef.current.scrollTop = chatAreaRef.current.scrollHeight; }, [transcriptionMessages]);
@@ -330,7 +350,7 @@ const App = () => {
 
     addLogEntry('ws', `Attempting to connect to WebSocket with language: ${language}...`);
     setWebSocketStatus('Connecting...');
-    socketRef.current = new WebSocket(`wss://${BACKEND_HOST}/listen?lang=${language}`);
+    socketRef.current = new WebSocket(`wss://${BACKEND_HOST}/listen?lang=${language}&transcript_mode=delta`);
     socketRef.current.binaryType = 'arraybuffer';
 
     socketRef.current.onopen = () => {
@@ -350,16 +370,18 @@ const App = () => {
         try {
           const receivedData = JSON.parse(event.data);
           if (receivedData.type && receivedData.type.endsWith('_update')) {
-            addLogEntry(receivedData.type, `${receivedData.sender}: ${receivedData.text} (Final: ${receivedData.is_final})`);
+            // transcript_mode=delta: partial updates carry only the new text at `offset`; the final one carries the full text
+            const isDelta = receivedData.delta !== undefined;
+            addLogEntry(receivedData.type, `${receivedData.sender}: ${isDelta ? receivedData.delta : receivedData.text} (Final: ${receivedData.is_final})`);
             setTranscriptionMessages(prevMessages => {
               const existingMessageIndex = prevMessages.findIndex(msg => msg.id === receivedData.id);
               if (existingMessageIndex !== -1) {
                 return prevMessages.map(msg =>
                   msg.id === receivedData.id
-                    ? { ...msg, text: receivedData.text, is_final: receivedData.is_final }
+                    ? { ...msg, text: isDelta ? msg.text.slice(0, receivedData.offset) + receivedData.delta : receivedData.text, is_final: receivedData.is_final }
                     : msg
                 );
-              } else { return [...prevMessages, { id: receivedData.id, text: receivedData.text, sender: receivedData.sender, is_final: receivedData.is_final }]; }
+              } else { return [...prevMessages, { id: receivedData.id, text: isDelta ? receivedData.delta : receivedData.text, sender: receivedData.sender, is_final: receivedData.is_final }]; }
             });
           } else if (receivedData.type === 'error') {
             addLogEntry('error', `Server Error via WS: ${receivedData.message}`);